@@ -0,0 +1,151 @@
+# agents/gazetteer.py
+import os
+import csv
+import unicodedata
+from collections import deque
+from typing import NamedTuple
+
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", os.path.join(os.path.dirname(__file__), "data", "cities.csv"))
+
+class City(NamedTuple):
+    name: str
+    country: str
+
+    @property
+    def query(self) -> str:
+        """OpenWeather `q` value; the country code keeps e.g. Cork, IE from resolving elsewhere"""
+        return f"{self.name},{self.country}"
+
+# After a case-sensitive name that opens a sentence ("Nice weekend in Rome", "Male traveller"),
+# the capital proves nothing; the name only counts when one of these words or punctuation follows
+PLACE_CONTEXT_WORDS = {"and", "or", "then", "in", "to", "from", "for", "via", "with", "trip", "itinerary", "getaway", "holiday", "vacation"}
+
+def _opens_sentence(text: str, start: int) -> bool:
+    before = text[:start].rstrip(" \t\"'(")
+    return not before or before[-1] in ".!?\n"
+
+def _place_context_follows(text: str, end: int) -> bool:
+    rest = text[end:].lstrip(" \t")
+    if not rest or not rest[0].isalnum():
+        return True  # end of text, or punctuation such as "Nice, then Monaco"
+    word = rest.split(None, 1)[0].strip(".,;:!?").lower()
+    return word in PLACE_CONTEXT_WORDS
+
+def _fold(char: str) -> str:
+    """Lowercase and strip accents one character at a time, so match offsets line up with the text"""
+    base = unicodedata.normalize("NFD", char)[0].lower()
+    return base if len(base) == 1 else char
+
+def fold_text(text: str) -> str:
+    return "".join(_fold(char) for char in text)
+
+def load_entries(path: str = GAZETTEER_PATH) -> list:
+    """(City, [spellings]) per row of the CSV; spellings keep their trailing * flag"""
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = csv.DictReader(line for line in f if not line.startswith("#"))
+        entries = []
+        for row in rows:
+            name = row["name"].strip()
+            aliases = [alias.strip() for alias in (row.get("aliases") or "").split("|") if alias.strip()]
+            entries.append((City(name.rstrip("*"), row["country"].strip()), [name] + aliases))
+    return entries
+
+class Gazetteer:
+    """Aho-Corasick automaton over city names and aliases.
+
+    `find` scans a goal once, whatever the number of names, and returns every city it mentions.
+    Matches must sit on word boundaries; overlapping ones resolve to the leftmost, then longest
+    ("New York" over "York"). Patterns flagged case-sensitive (names that are also everyday words,
+    like Nice or Split, and abbreviations like NYC) only match as written; such a name opening a
+    sentence only counts when place context follows it.
+    """
+
+    def __init__(self, entries):
+        self._goto = [{}]     # node -> {char: node}
+        self._fail = [0]
+        self._output = [[]]   # node -> pattern ids ending here, including via fail links
+        self._patterns = []   # (length, case-sensitive original or None, City)
+        for city, spellings in entries:
+            for spelling in spellings:
+                self._add(spelling, city)
+        self._link()
+
+    @classmethod
+    def from_csv(cls, path: str = GAZETTEER_PATH) -> "Gazetteer":
+        return cls(load_entries(path))
+
+    def _add(self, spelling: str, city: City):
+        case_sensitive = spelling.endswith("*")
+        spelling = spelling.rstrip("*")
+        node = 0
+        for char in fold_text(spelling):
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._output[node].append(len(self._patterns))
+        self._patterns.append((len(spelling), spelling if case_sensitive else None, city))
+
+    def _link(self):
+        """Breadth-first fail links; each node's output also gets what its fail node matches"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def matches(self, text: str):
+        """(start, end, City) for every boundary-respecting mention, overlaps included"""
+        node = 0
+        for end, char in enumerate(fold_text(text), 1):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for pattern_id in self._output[node]:
+                length, exact, city = self._patterns[pattern_id]
+                start = end - length
+                if start > 0 and text[start - 1].isalnum() or end < len(text) and text[end].isalnum():
+                    continue
+                if exact is not None and text[start:end] != exact:
+                    continue
+                if exact is not None and not exact.isupper() and _opens_sentence(text, start) and not _place_context_follows(text, end):
+                    continue  # abbreviations such as NYC are never ordinary words, wherever they stand
+                yield start, end, city
+
+    def mentions(self, text: str) -> list:
+        """(start, end, City) for each mention in order, overlaps resolved to the leftmost, then longest"""
+        mentions = []
+        covered_until = 0
+        for start, end, city in sorted(self.matches(text), key=lambda match: (match[0], -match[1])):
+            if start < covered_until:
+                continue  # inside a longer, earlier match
+            covered_until = end
+            mentions.append((start, end, city))
+        return mentions
+
+    def find(self, text: str) -> list:
+        """Cities mentioned in `text`, in order of first mention and without repeats"""
+        cities = []
+        for _, _, city in self.mentions(text):
+            if city not in cities:
+                cities.append(city)
+        return cities
+
+_gazetteer = None
+
+def get_gazetteer() -> Gazetteer:
+    """The process-wide gazetteer, built from GAZETTEER_PATH on first use"""
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer.from_csv()
+    return _gazetteer
+
+def find_cities(text: str) -> list:
+    return get_gazetteer().find(text)
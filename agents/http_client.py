@@ -0,0 +1,139 @@
+# agents/http_client.py
+import os
+import asyncio
+import threading
+import weakref
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+from agents.rate_limit import rate_limiters
+from agents.resilience import upstream_guards
+
+load_dotenv()
+
+# ------------------ CONFIG ------------------ #
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))   # distinct hosts kept warm
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))           # keep-alive sockets per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", os.getenv("REQUEST_TIMEOUT", "10")))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.3"))
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+HTTP_BACKOFF_MAX = 120  # seconds; same cap urllib3 applies
+
+# ------------------ SESSION ------------------ #
+_session = None
+_session_lock = threading.Lock()
+
+def _build_session() -> requests.Session:
+    """Create a keep-alive session with pooled connections, bounded retries and gzip"""
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    return session
+
+def get_session() -> requests.Session:
+    """Return the process-wide session shared by all tools"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def get(url: str, params: dict = None, timeout=None, upstream: str = None, **kwargs) -> requests.Response:
+    """GET through the shared pool with (connect, read) timeouts applied by default.
+
+    `upstream` names the rate limit bucket and the breaker/concurrency guard (e.g. "serpapi");
+    raises UpstreamUnavailable while that upstream's breaker is open. A lookup that outlasts the
+    upstream's usual latency is hedged with a second identical request, as in `aget`.
+    """
+    if upstream:
+        rate_limiters.acquire(upstream)
+
+    def send():
+        # urllib3 retries inside the guarded call, so the breaker sees one outcome per lookup
+        with upstream_guards.call(upstream) as attempt:
+            response = get_session().get(url, params=params, timeout=timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), **kwargs)
+            attempt.failed = response.status_code in RETRY_STATUS_CODES
+            return response
+
+    return upstream_guards.hedged(upstream, send)
+
+def close():
+    """Drop pooled connections (e.g. on shutdown or after a fork)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+# ------------------ ASYNC CLIENT ------------------ #
+# httpx connections belong to the event loop that opened them, so every loop gets its own pooled client
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the pooled client of the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        limits = httpx.Limits(max_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_MAXSIZE)
+        client = _async_clients[loop] = httpx.AsyncClient(
+            # The transport retries connection failures; status codes are retried in aget
+            transport=httpx.AsyncHTTPTransport(retries=HTTP_MAX_RETRIES, limits=limits),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            headers={"Accept-Encoding": "gzip, deflate"}
+        )
+    return client
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Retry-After when the upstream sends one in seconds, else urllib3's exponential backoff"""
+    retry_after = response.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return min(float(retry_after), HTTP_BACKOFF_MAX)
+    return 0.0 if attempt == 0 else min(HTTP_BACKOFF_FACTOR * (2 ** attempt), HTTP_BACKOFF_MAX)
+
+async def aget(url: str, params: dict = None, timeout: float = None, upstream: str = None, **kwargs) -> httpx.Response:
+    """Awaitable `get`: same rate limits, timeouts, retries and upstream guard, without holding a thread.
+
+    A try that outlasts the upstream's usual latency is hedged with a second identical request.
+    Cancelling the awaiting task aborts the requests in flight.
+    """
+    if upstream:
+        await rate_limiters.aacquire(upstream)
+    client = get_async_client()
+
+    async def send():
+        async with upstream_guards.acall(upstream) as guarded:
+            response = await client.get(url, params=params, timeout=timeout or httpx.USE_CLIENT_DEFAULT, **kwargs)
+            guarded.failed = response.status_code in RETRY_STATUS_CODES
+            return response
+
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        response = await upstream_guards.ahedged(upstream, send)
+        if response.status_code not in RETRY_STATUS_CODES or attempt == HTTP_MAX_RETRIES:
+            return response
+        await asyncio.sleep(_retry_delay(response, attempt))
+
+async def aclose():
+    """Drop the running loop's pooled connections"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
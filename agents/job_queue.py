@@ -0,0 +1,216 @@
+# agents/job_queue.py
+import os
+import time
+import socket
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import func
+from database.database import SessionLocal
+from database.models import PlanJob
+from database.crud import save_plan_to_db, get_plan
+from agents import metrics
+
+load_dotenv()
+
+# Caps the number of plan generations (and so concurrent LLM calls) in this process
+PLAN_WORKERS = int(os.getenv("PLAN_WORKERS", "2"))
+
+# Owners refresh their active jobs this often; a job silent for JOB_STALE_SEC is reclaimed by another process
+JOB_HEARTBEAT_SEC = float(os.getenv("JOB_HEARTBEAT_SEC", "10"))
+JOB_STALE_SEC = float(os.getenv("JOB_STALE_SEC", "60"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Identifies this app process in plan_jobs.owner
+JOB_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+class PlanJobQueue:
+    """Runs acreate_plan for every job on one background event loop and tracks each job in plan_jobs.
+
+    At most `max_workers` plans generate at once; the rest wait as queued coroutines rather than
+    threads, and any of them can be cancelled. Streamed jobs publish each day as it is written,
+    for the UI to poll. Jobs are owned by the process that runs them and kept alive by its
+    heartbeat, so other processes only take over jobs whose owner has gone quiet.
+    """
+
+    def __init__(self, planner=None, max_workers: int = PLAN_WORKERS):
+        self._planner = planner
+        self._slots = asyncio.Semaphore(max_workers)
+        self._loop = None
+        self._running = {}   # job id -> future of its coroutine
+        self._progress = {}  # job id -> {"days": [...], "text": str} while a streamed job runs
+        self._lock = threading.Lock()
+        self._next_recovery = 0.0
+
+    @property
+    def planner(self):
+        if self._planner is None:
+            from agents.planner_agent import planner_agent
+            self._planner = planner_agent
+        return self._planner
+
+    def submit(self, goal: str, stream: bool = False) -> int:
+        """Record a queued job and hand it to the pool; returns the job id to poll"""
+        self._recover_orphans()
+        db = SessionLocal()
+        try:
+            job = PlanJob(goal=goal, status="queued", owner=JOB_OWNER, heartbeat_at=datetime.utcnow())
+            db.add(job)
+            db.commit()
+            job_id = job.id
+        finally:
+            db.close()
+        self._start(job_id, goal, stream)
+        return job_id
+
+    def cancel(self, job_id: int) -> bool:
+        """Stop a queued or running job, aborting its LLM call and enrichment requests.
+
+        Returns False if the job is not active in this process.
+        """
+        future = self._running.get(job_id)
+        return future.cancel() if future is not None else False
+
+    def get(self, job_id: int):
+        """Return the job as a dict (with the finished plan once done, or the days streamed so far), or None"""
+        self._recover_orphans()
+        db = SessionLocal()
+        try:
+            job = db.get(PlanJob, job_id)
+            if job is None:
+                return None
+            info = {
+                "id": job.id,
+                "goal": job.goal,
+                "status": job.status,
+                "plan_id": job.plan_id,
+                "error": job.error,
+                "created_at": job.created_at,
+                "started_at": job.started_at,
+                "finished_at": job.finished_at
+            }
+        finally:
+            db.close()
+        progress = self._progress.get(job_id) or {}
+        info["days"] = list(progress.get("days", []))
+        info["streamed_text"] = progress.get("text", "")
+        info["plan"] = get_plan(info["plan_id"]) if info["status"] == "done" and info["plan_id"] else None
+        return info
+
+    def _start(self, job_id: int, goal: str, stream: bool = False):
+        future = asyncio.run_coroutine_threadsafe(self._run(job_id, goal, stream), self._event_loop())
+        self._running[job_id] = future
+        future.add_done_callback(lambda _: self._running.pop(job_id, None))
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="plan-jobs", daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._heartbeat(), self._loop)
+            return self._loop
+
+    async def _run(self, job_id: int, goal: str, stream: bool = False):
+        try:
+            async with self._slots:
+                await asyncio.to_thread(self._update, job_id, status="running", started_at=datetime.utcnow())
+                # One trace covers generation and the save
+                with metrics.trace():
+                    result = await (self._stream(job_id, goal) if stream else self.planner.acreate_plan(goal))
+                    plan_id = await asyncio.to_thread(save_plan_to_db, result)
+            await asyncio.to_thread(self._update, job_id, status="done", plan_id=plan_id, finished_at=datetime.utcnow())
+        except asyncio.CancelledError:
+            # Shielded so the status is written even if the task is cancelled again while it waits
+            await asyncio.shield(asyncio.to_thread(self._update, job_id, status="cancelled", finished_at=datetime.utcnow()))
+            raise
+        except Exception as e:
+            await asyncio.to_thread(self._update, job_id, status="failed", error=f"Plan generation failed: {str(e)}", finished_at=datetime.utcnow())
+        finally:
+            self._progress.pop(job_id, None)
+
+    async def _stream(self, job_id: int, goal: str) -> dict:
+        """Run stream_plan on a worker thread, publishing tokens and finished days as they arrive"""
+        progress = self._progress[job_id] = {"days": [], "text": ""}
+        stopped = threading.Event()
+
+        def consume():
+            events = self.planner.stream_plan(goal)
+            try:
+                for event, payload in events:
+                    if stopped.is_set():
+                        return None  # cancelled; closing the stream releases its LLM slot
+                    if event == "token":
+                        progress["text"] += payload
+                    elif event == "day":
+                        progress["days"].append(payload)
+                    elif event == "plan":
+                        return payload
+            finally:
+                events.close()
+
+        try:
+            return await asyncio.to_thread(consume)
+        finally:
+            stopped.set()
+
+    async def _heartbeat(self):
+        """Mark this process's active jobs as alive, so no other process reclaims them"""
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SEC)
+            job_ids = list(self._running)
+            if job_ids:
+                try:
+                    with metrics.span("job_heartbeat"):
+                        await asyncio.to_thread(self._touch, job_ids)
+                except Exception:
+                    pass  # recorded as an errored job_heartbeat span; the next beat tries again
+
+    def _touch(self, job_ids: list):
+        db = SessionLocal()
+        try:
+            db.query(PlanJob).filter(PlanJob.id.in_(job_ids), PlanJob.owner == JOB_OWNER).update(
+                {PlanJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _update(self, job_id: int, **fields):
+        db = SessionLocal()
+        try:
+            db.query(PlanJob).filter(PlanJob.id == job_id).update(fields)
+            db.commit()
+        finally:
+            db.close()
+
+    def _recover_orphans(self):
+        """Take over active jobs whose owner stopped sending heartbeats; checked at most once per heartbeat"""
+        with self._lock:
+            if time.monotonic() < self._next_recovery:
+                return
+            self._next_recovery = time.monotonic() + JOB_HEARTBEAT_SEC
+
+        claimed = []
+        db = SessionLocal()
+        try:
+            # Rows from before heartbeats existed count from their creation time
+            last_seen = func.coalesce(PlanJob.heartbeat_at, PlanJob.created_at)
+            stale = [PlanJob.status.in_(ACTIVE_STATUSES), last_seen < datetime.utcnow() - timedelta(seconds=JOB_STALE_SEC)]
+            for job_id, goal in db.query(PlanJob.id, PlanJob.goal).filter(*stale).all():
+                # Conditional claim: when several processes race for the same orphan, one update wins
+                won = db.query(PlanJob).filter(PlanJob.id == job_id, *stale).update(
+                    {PlanJob.status: "queued", PlanJob.started_at: None, PlanJob.owner: JOB_OWNER, PlanJob.heartbeat_at: datetime.utcnow()},
+                    synchronize_session=False
+                )
+                db.commit()
+                if won:
+                    claimed.append((job_id, goal))
+        finally:
+            db.close()
+        for job_id, goal in claimed:
+            self._start(job_id, goal)
+
+# Shared queue for this process
+plan_jobs = PlanJobQueue()
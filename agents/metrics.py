@@ -0,0 +1,227 @@
+# agents/metrics.py
+import os
+import time
+import uuid
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import func, case, cast, or_, Integer
+from dotenv import load_dotenv
+from database.database import SessionLocal
+from database.models import PerfSpan, LLMUsage
+from database.write_batcher import WriteBehindBatcher
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Samples older than this are deleted by the writer, at most once per prune interval
+METRICS_RETENTION_DAYS = float(os.getenv("METRICS_RETENTION_DAYS", "30"))
+METRICS_PRUNE_INTERVAL_SEC = float(os.getenv("METRICS_PRUNE_INTERVAL_SEC", "600"))
+
+# USD per 1K (prompt, completion) tokens; unknown models are recorded with zero cost
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015)
+}
+
+# Id of the plan request the current code runs for; copied into enrichment threads and crewai event handlers
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+_next_prune = 0.0
+
+def prune_expired(retention_days: float = None) -> int:
+    """Delete spans and LLM usage older than the retention window; returns the rows removed"""
+    cutoff = datetime.utcnow() - timedelta(days=METRICS_RETENTION_DAYS if retention_days is None else retention_days)
+    db = SessionLocal()
+    try:
+        removed = 0
+        for model in (PerfSpan, LLMUsage):
+            removed += db.query(model).filter(model.created_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+        return removed
+    finally:
+        db.close()
+
+def _prune_if_due():
+    """Runs on the writer thread after each batch, so retention needs no scheduler of its own"""
+    global _next_prune
+    if time.monotonic() >= _next_prune:
+        _next_prune = time.monotonic() + METRICS_PRUNE_INTERVAL_SEC
+        prune_expired()
+
+# Samples are written off the request path, many per transaction
+_writer = WriteBehindBatcher(after_flush=_prune_if_due)
+
+class Span:
+    """Mutable handle for the stage being timed; set `cache` to "hit" or "miss" for cached lookups"""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.cache = None
+        self.status = "ok"
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+@contextmanager
+def trace(trace_id: str = None):
+    """Group the spans recorded inside into one plan request.
+
+    Without an explicit id an enclosing trace is reused, so a job that generates and then saves
+    a plan reports both under one id.
+    """
+    if trace_id is None and current_trace.get() is not None:
+        yield current_trace.get()
+        return
+    token = current_trace.set(trace_id or new_trace_id())
+    try:
+        yield current_trace.get()
+    finally:
+        current_trace.reset(token)
+
+@contextmanager
+def span(stage: str):
+    """Time a stage of the current request and persist it"""
+    handle = Span(stage)
+    started = time.perf_counter()
+    try:
+        yield handle
+    except asyncio.CancelledError:
+        handle.status = "cancelled"
+        raise
+    except BaseException:
+        handle.status = "error"
+        raise
+    finally:
+        record_span(stage, (time.perf_counter() - started) * 1000, handle.status, handle.cache)
+
+def record_span(stage: str, duration_ms: float, status: str = "ok", cache: str = None, trace_id: str = None):
+    """Persist a stage timing measured outside a `span` block"""
+    trace_id = trace_id or current_trace.get()
+    _record(lambda: PerfSpan(trace_id=trace_id, stage=stage, duration_ms=duration_ms, status=status, cache=cache))
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    # Provider prefixes such as "openai/gpt-4" price like the bare model name
+    prompt_price, completion_price = MODEL_PRICES.get((model or "").split("/")[-1], (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+def record_llm_usage(model: str, prompt_tokens: int, completion_tokens: int, trace_id: str = None):
+    """Persist the token counts of one LLM call under the current (or given) trace"""
+    trace_id = trace_id or current_trace.get()
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    _record(lambda: LLMUsage(
+        trace_id=trace_id, model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cost_usd=cost
+    ))
+
+def _record(build_row):
+    if METRICS_ENABLED:
+        _writer.submit(build_row)
+
+# ------------------ REPORTING ------------------ #
+# Percentiles are picked in SQL by nearest rank (the sample at index int(n * fraction) in sorted
+# order), so a report reads a few rows per stage however many samples the window holds
+def _ranked(value, partition=None):
+    """Row number by `value` and row count, within `partition`"""
+    return (
+        func.row_number().over(partition_by=partition, order_by=value).label("rank"),
+        func.count().over(partition_by=partition).label("total")
+    )
+
+def _at_percentile(ranked, fraction):
+    return ranked.c.rank == cast(ranked.c.total * fraction, Integer) + 1
+
+def _rank_of(count, fraction):
+    return int(count * fraction) + 1
+
+def stage_latency_summary(hours: int = 24):
+    """p50/p95/p99 latency per stage over the last `hours`"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    fractions = (0.50, 0.95, 0.99)
+    db = SessionLocal()
+    try:
+        counts = (
+            db.query(PerfSpan.stage, func.count(PerfSpan.id), func.sum(case((PerfSpan.status == 'error', 1), else_=0)))
+            .filter(PerfSpan.created_at >= since)
+            .group_by(PerfSpan.stage)
+            .all()
+        )
+        ranked = (
+            db.query(PerfSpan.stage, PerfSpan.duration_ms, *_ranked(PerfSpan.duration_ms, PerfSpan.stage))
+            .filter(PerfSpan.created_at >= since)
+            .subquery()
+        )
+        picks = (
+            db.query(ranked.c.stage, ranked.c.rank, ranked.c.duration_ms)
+            .filter(or_(*(_at_percentile(ranked, fraction) for fraction in fractions)))
+            .all()
+        )
+    finally:
+        db.close()
+
+    at_rank = {(stage, rank): duration_ms for stage, rank, duration_ms in picks}
+    summary = []
+    for stage, count, errors in counts:
+        p50, p95, p99 = (at_rank[(stage, _rank_of(count, fraction))] for fraction in fractions)
+        summary.append({"stage": stage, "count": count, "errors": errors, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99})
+    return sorted(summary, key=lambda row: row["p95_ms"], reverse=True)
+
+def token_usage_summary(hours: int = 24):
+    """Tokens and estimated cost per plan request, plus totals, over the last `hours`"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    prompt = func.coalesce(func.sum(LLMUsage.prompt_tokens), 0)
+    completion = func.coalesce(func.sum(LLMUsage.completion_tokens), 0)
+    db = SessionLocal()
+    try:
+        per_trace = (
+            db.query(
+                prompt.label("prompt"),
+                completion.label("completion"),
+                func.coalesce(func.sum(LLMUsage.cost_usd), 0.0).label("cost"),
+                (prompt + completion).label("tokens")
+            )
+            .filter(LLMUsage.created_at >= since)
+            .group_by(LLMUsage.trace_id)
+            .subquery()
+        )
+        plans, prompt_tokens, completion_tokens, cost = db.query(
+            func.count(), func.sum(per_trace.c.prompt), func.sum(per_trace.c.completion), func.sum(per_trace.c.cost)
+        ).one()
+        ranked = db.query(per_trace.c.tokens, *_ranked(per_trace.c.tokens)).subquery()
+        at_rank = dict(
+            db.query(ranked.c.rank, ranked.c.tokens)
+            .filter(or_(_at_percentile(ranked, 0.50), _at_percentile(ranked, 0.95)))
+            .all()
+        )
+    finally:
+        db.close()
+
+    return {
+        "plans": plans,
+        "prompt_tokens": prompt_tokens or 0,
+        "completion_tokens": completion_tokens or 0,
+        "cost_usd": cost or 0.0,
+        "p50_tokens_per_plan": at_rank[_rank_of(plans, 0.50)] if plans else 0,
+        "p95_tokens_per_plan": at_rank[_rank_of(plans, 0.95)] if plans else 0
+    }
+
+def cache_hit_rates(hours: int = 24):
+    """Hourly hit rate of each cached stage: [{"hour", "stage", "hit_rate", "lookups"}]"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    hour = func.strftime('%Y-%m-%d %H:00', PerfSpan.created_at)
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(hour, PerfSpan.stage, func.sum(case((PerfSpan.cache == 'hit', 1), else_=0)), func.count(PerfSpan.id))
+            .filter(PerfSpan.created_at >= since, PerfSpan.cache.isnot(None))
+            .group_by(hour, PerfSpan.stage)
+            .order_by(hour)
+            .all()
+        )
+    finally:
+        db.close()
+    return [{"hour": bucket, "stage": stage, "hit_rate": hits / lookups, "lookups": lookups} for bucket, stage, hits, lookups in rows]
@@ -0,0 +1,158 @@
+# agents/plan_cache.py
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from database.database import SessionLocal
+from database.models import TaskPlan, plan_document_options
+from agents.gazetteer import get_gazetteer, fold_text
+from agents import metrics
+
+load_dotenv()
+
+# How long a stored plan may be reused for an equivalent goal
+PLAN_CACHE_MAX_AGE_HOURS = float(os.getenv("PLAN_CACHE_MAX_AGE_HOURS", str(7 * 24)))
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# ------------------ GOAL CANONICALIZATION ------------------ #
+STOPWORDS = {
+    "a", "an", "the", "to", "in", "into", "for", "of", "on", "at", "and", "or", "with", "by", "from",
+    "my", "me", "i", "we", "our", "us", "you", "your", "please", "can", "could", "would", "will",
+    "want", "like", "need", "some", "this", "that", "plan", "create", "make", "generate", "give",
+    "help", "build", "itinerary", "schedule", "about", "around", "focusing", "focus", "focused"
+}
+
+NUMBER_WORDS = {
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6", "seven": "7",
+    "eight": "8", "nine": "9", "ten": "10", "eleven": "11", "twelve": "12", "fourteen": "14",
+    "single": "1", "couple": "2", "weekend": "2 day"
+}
+
+# Units a count binds to, in days: "2 weeks" and "14 days" both become "14 day"
+DAY_UNITS = {"day": 1, "week": 7, "fortnight": 14}
+
+def _stem(token: str) -> str:
+    """Very small plural folding so 'days' and 'day' match"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def canonical_goal(goal: str) -> str:
+    """Lowercase, number-normalize and stopword-strip a goal into a cache key.
+
+    The key is "<anchors> | <words>". Anchors are durations ("3 day"), other counts and the
+    gazetteer's place names, kept in goal order when two or more places are named, so
+    "London to Paris" and "Paris to London" stay apart. The remaining words form an order-free
+    set; the word after "from" is marked as an origin so unknown places keep their direction.
+    """
+    places = {start: (end, city) for start, end, city in get_gazetteer().mentions(goal)}
+    parts = []  # (kind, value) in goal order
+    skip_until = 0
+    after_from = False
+    for match in re.finditer(r'\d+(?:st|nd|rd|th)?\b|\d+|[a-z]+', fold_text(goal)):
+        if match.start() < skip_until:
+            continue
+        if match.start() in places:
+            skip_until, city = places[match.start()]
+            parts.append(("place", fold_text(city.name)))
+            after_from = False
+            continue
+        token = _stem(match.group())
+        if token[0].isdigit():
+            token = re.match(r'\d+', token).group()
+        for part in NUMBER_WORDS.get(token, token).split():
+            if part == "from":
+                after_from = True
+            elif part not in STOPWORDS:
+                kind = "count" if part.isdigit() else "unit" if part in DAY_UNITS else "word"
+                parts.append((kind, f"from {part}" if after_from and kind == "word" else part))
+                after_from = False
+
+    anchors, words = [], set()
+    for index, (kind, value) in enumerate(parts):
+        if kind == "unit":
+            count = parts[index - 1][1] if index and parts[index - 1][0] == "count" else "1"
+            anchors.append(f"{int(count) * DAY_UNITS[value]} day")
+        elif kind == "count":
+            if index + 1 == len(parts) or parts[index + 1][0] != "unit":
+                anchors.append(value)
+        elif kind == "place":
+            anchors.append(value)
+        else:
+            words.add(value)
+    if sum(kind == "place" for kind, _ in parts) < 2:
+        anchors.sort()  # with one place, "Paris for 3 days" and "3 days in Paris" are the same trip
+    return f"{' '.join(anchors)} | {' '.join(sorted(words))}"
+
+# ------------------ PLAN CACHE ------------------ #
+class PlanCache:
+    """Serves stored plans for equivalent goals so the LLM only runs for new ones"""
+
+    def __init__(self, max_age_hours: float = PLAN_CACHE_MAX_AGE_HOURS, enabled: bool = PLAN_CACHE_ENABLED):
+        self.max_age = timedelta(hours=max_age_hours)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._backfilled = False
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def lookup(self, goal: str, force_refresh: bool = False):
+        """Return the freshest stored plan for an equivalent goal, or None"""
+        if force_refresh or not self.enabled:
+            self._count("bypasses")
+            return None
+
+        self._backfill_goal_keys()
+        cutoff = datetime.utcnow() - self.max_age
+        db = SessionLocal()
+        try:
+            with metrics.span("plan_cache.lookup") as span:
+                plan = (
+                    db.query(TaskPlan)
+                    .options(*plan_document_options())
+                    .filter(TaskPlan.goal_key == canonical_goal(goal), TaskPlan.status == 'completed', TaskPlan.created_at >= cutoff)
+                    .order_by(TaskPlan.created_at.desc())
+                    .first()
+                )
+                span.cache = "miss" if plan is None else "hit"
+            if plan is None:
+                self._count("misses")
+                return None
+            self._count("hits")
+            cached_plan = plan.to_plan_dict()
+            cached_plan["cached"] = True
+            return cached_plan
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _backfill_goal_keys(self):
+        """Key rows saved before the cache existed; runs once per process"""
+        if self._backfilled:
+            return
+        db = SessionLocal()
+        try:
+            for plan_id, goal in db.query(TaskPlan.id, TaskPlan.goal).filter(TaskPlan.goal_key.is_(None)).all():
+                db.query(TaskPlan).filter(TaskPlan.id == plan_id).update({TaskPlan.goal_key: canonical_goal(goal)})
+            db.commit()
+            self._backfilled = True
+        finally:
+            db.close()
+
+# Shared cache for this process
+plan_cache = PlanCache()
@@ -0,0 +1,112 @@
+# agents/plan_service.py
+import os
+import math
+import time
+import asyncio
+from dotenv import load_dotenv
+from database.crud import save_plan_to_db
+from agents.plan_cache import plan_cache, canonical_goal
+from agents.single_flight import AsyncSingleFlight
+from agents import metrics
+
+load_dotenv()
+
+# Plans generated at once by the HTTP service, and distinct goals allowed to wait for a slot
+PLAN_API_MAX_INFLIGHT = int(os.getenv("PLAN_API_MAX_INFLIGHT", "8"))
+PLAN_API_MAX_QUEUE = int(os.getenv("PLAN_API_MAX_QUEUE", "32"))
+
+class ServiceOverloaded(Exception):
+    """Raised instead of queueing a new generation when the queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Planner is saturated, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class PlanService:
+    """Plan creation for the headless API, with request coalescing and admission control.
+
+    Concurrent requests for the same canonical goal share one acreate_plan call (and one saved
+    plan). Joining a generation that is already running is always allowed; a new one is admitted
+    only while fewer than `max_inflight + max_queue` are running or waiting, otherwise
+    ServiceOverloaded tells the caller when to come back.
+    """
+
+    def __init__(self, planner=None, max_inflight: int = PLAN_API_MAX_INFLIGHT, max_queue: int = PLAN_API_MAX_QUEUE):
+        self._planner = planner
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._flights = AsyncSingleFlight()
+        self._admitted = 0  # distinct generations running or waiting for a slot
+        self._running = 0
+        self._seconds_per_plan = 10.0  # moving average, seeds Retry-After before the first plan finishes
+        self.rejected = 0
+
+    @property
+    def planner(self):
+        if self._planner is None:
+            from agents.planner_agent import planner_agent
+            self._planner = planner_agent
+        return self._planner
+
+    async def create_plan(self, goal: str, force_refresh: bool = False) -> dict:
+        """Return a stored plan for an equivalent goal, or generate, save and return a new one.
+
+        The returned dict carries "coalesced": True when it came from another request's generation.
+        """
+        cached = await asyncio.to_thread(plan_cache.lookup, goal, force_refresh)
+        if cached:
+            return cached
+
+        key = (canonical_goal(goal), force_refresh)
+        coalesced = self._flights.in_flight(key)
+        if not coalesced:
+            self._admit()
+        plan = await self._flights.do(key, lambda: self._start_generation(goal))
+        return {**plan, "coalesced": coalesced}
+
+    def stats(self) -> dict:
+        return {
+            "running": self._running,
+            "queued": self._admitted - self._running,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "coalesced": self._flights.shared,
+            "rejected": self.rejected,
+            "seconds_per_plan": round(self._seconds_per_plan, 2)
+        }
+
+    def _admit(self):
+        if self._admitted >= self.max_inflight + self.max_queue:
+            self.rejected += 1
+            raise ServiceOverloaded(self.retry_after())
+        # Counted now rather than inside _generate so requests in the same tick see each other
+        self._admitted += 1
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained by one generation's worth"""
+        waves = (self._admitted - self.max_inflight) / self.max_inflight + 1
+        return max(1, math.ceil(self._seconds_per_plan * max(waves, 1)))
+
+    def _start_generation(self, goal: str) -> asyncio.Task:
+        task = asyncio.ensure_future(self._generate(goal))
+        # Released when the task ends, however it ends: a task cancelled before its first step never runs a finally
+        task.add_done_callback(self._release)
+        return task
+
+    def _release(self, _task):
+        self._admitted -= 1
+
+    async def _generate(self, goal: str) -> dict:
+        async with self._slots:
+            self._running += 1
+            started = time.monotonic()
+            try:
+                # One trace covers generation and the save, as for UI jobs
+                with metrics.trace():
+                    result = await self.planner.acreate_plan(goal)
+                    result["id"] = await asyncio.to_thread(save_plan_to_db, result)
+            finally:
+                self._running -= 1
+            self._seconds_per_plan = 0.8 * self._seconds_per_plan + 0.2 * (time.monotonic() - started)
+            return result
@@ -2,14 +2,52 @@
 from crewai import Agent, Task, Crew, Process
 from crewai.llm import LLM
 from crewai.tools import BaseTool
-from typing import Type
+from crewai.agents.crew_agent_executor import CrewAgentExecutor
+from crewai.types.streaming import StreamChunkType
+from crewai.events import crewai_event_bus
+from crewai.events.types.llm_events import LLMCallCompletedEvent
+from crewai.types.usage_metrics import UsageMetrics
+from typing import Type, List
 from pydantic import BaseModel, Field
-import requests, os, re
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import os, re, time, asyncio, threading, contextvars, itertools
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from agents import http_client, metrics
+from agents.tool_cache import tool_cache, normalize_key, SEARCH_CACHE_TTL, WEATHER_CACHE_TTL
+from agents.rate_limit import rate_limiters
+from agents.resilience import upstream_guards, UpstreamUnavailable
+from agents.single_flight import AsyncSingleFlight
+from agents.gazetteer import find_cities
 
 load_dotenv()
 
+# "structured" asks the LLM for a validated PlanOutput; "text" keeps free text + regex parsing
+PLAN_OUTPUT_MODE = os.getenv("PLAN_OUTPUT_MODE", "structured").lower()
+
+# Agent/crew step logging to stdout; off by default because it is slow in the request path
+PLANNER_VERBOSE = os.getenv("PLANNER_VERBOSE", "false").lower() in ("1", "true", "yes")
+
 # ------------------ TOOLS ------------------ #
+# Upstream endpoints; point them at local stand-ins for offline runs (see benchmarks/bench_e2e.py)
+SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search")
+OPENWEATHER_URL = os.getenv("OPENWEATHER_URL", "http://api.openweathermap.org/data/2.5/weather")
+
+def _degraded_result(span, namespace: str, key: str, message: str) -> str:
+    """Last known (possibly expired) result while the upstream is unavailable, else `message`"""
+    stale = tool_cache.get_stale(namespace, normalize_key(key))
+    if stale is None:
+        return message
+    span.cache = "stale"
+    return stale
+
+def _unique_cities(cities: list) -> list:
+    """Drop repeats that share a cache key ("Paris,FR" and "paris,fr"), keeping first-mention order"""
+    unique = {}
+    for city in cities:
+        unique.setdefault(normalize_key(city), city)
+    return list(unique.values())
+
 class WebSearchInput(BaseModel):
     query: str = Field(description="Search query to look up information")
 
@@ -20,22 +58,66 @@ class WebSearchTool(BaseTool):
     name: str = "web_search"
     description: str = "Search the web for current information about topics, resources, guides, best practices, etc."
     args_schema: Type[BaseModel] = WebSearchInput
+    cache_ttl: int = SEARCH_CACHE_TTL
+    base_url: str = SERPAPI_URL
 
     def _run(self, query: str) -> str:
-        try:
-            actual_query = query.get('query') if isinstance(query, dict) else str(query)
-            serpapi_key = os.getenv("SERPAPI_KEY")
-            if serpapi_key:
-                return self._serpapi_search(actual_query)
-            return self._duckduckgo_search(actual_query)
-        except Exception as e:
-            return f"Search failed: {str(e)}"
+        with metrics.span(f"tool.{self.name}") as span:
+            try:
+                actual_query = query.get('query') if isinstance(query, dict) else str(query)
+                serpapi_key = os.getenv("SERPAPI_KEY")
+                if serpapi_key:
+                    cache_key = normalize_key(actual_query)
+                    cached = tool_cache.get(self.name, cache_key)
+                    span.cache = "miss" if cached is None else "hit"
+                    if cached is not None: return cached
+                    result = self._serpapi_search(actual_query)
+                    tool_cache.set(self.name, cache_key, result, self.cache_ttl)
+                    return result
+                return self._duckduckgo_search(actual_query)
+            except UpstreamUnavailable as e:
+                # Failed fast without a request; the last known answer beats none
+                span.status = "error"
+                return _degraded_result(span, self.name, actual_query, f"Search unavailable: {str(e)}")
+            except Exception as e:
+                span.status = "error"
+                return f"Search failed: {str(e)}"
+
+    async def _arun(self, query: str) -> str:
+        """Same lookup as _run on the event loop; cancellation aborts the request"""
+        with metrics.span(f"tool.{self.name}") as span:
+            try:
+                actual_query = query.get('query') if isinstance(query, dict) else str(query)
+                serpapi_key = os.getenv("SERPAPI_KEY")
+                if serpapi_key:
+                    cache_key = normalize_key(actual_query)
+                    cached = tool_cache.get(self.name, cache_key)
+                    span.cache = "miss" if cached is None else "hit"
+                    if cached is not None: return cached
+                    return await inflight_lookups.do((self.name, cache_key), lambda: self._aserpapi_search(actual_query, cache_key))
+                return self._duckduckgo_search(actual_query)
+            except UpstreamUnavailable as e:
+                # Failed fast without a request; the last known answer beats none
+                span.status = "error"
+                return _degraded_result(span, self.name, actual_query, f"Search unavailable: {str(e)}")
+            except Exception as e:
+                span.status = "error"
+                return f"Search failed: {str(e)}"
+
+    async def _aserpapi_search(self, query: str, cache_key: str) -> str:
+        response = await http_client.aget(self.base_url, params=self._serpapi_params(query), upstream="serpapi")
+        result = self._format_results(response.json())
+        tool_cache.set(self.name, cache_key, result, self.cache_ttl)
+        return result
+
+    def _serpapi_params(self, query: str) -> dict:
+        return {"q": query, "engine": "google", "api_key": os.getenv("SERPAPI_KEY"), "num": 5}
 
     def _serpapi_search(self, query: str) -> str:
-        url = "https://serpapi.com/search"
-        params = {"q": query, "engine": "google", "api_key": os.getenv("SERPAPI_KEY"), "num": 5}
-        response = requests.get(url, params=params)
-        data = response.json()
+        response = http_client.get(self.base_url, params=self._serpapi_params(query), upstream="serpapi")
+        return self._format_results(response.json())
+
+    def _format_results(self, data: dict) -> str:
         results = []
         for result in data.get("organic_results", [])[:5]:
             results.append(f"Title: {result.get('title','')}\nSnippet: {result.get('snippet','')}\n")
@@ -48,101 +130,611 @@ class WeatherTool(BaseTool):
     name: str = "weather_forecast"
     description: str = "Get current weather and forecast for any city"
     args_schema: Type[BaseModel] = WeatherInput
+    cache_ttl: int = WEATHER_CACHE_TTL
+    base_url: str = OPENWEATHER_URL
 
     def _run(self, city: str) -> str:
-        try:
-            actual_city = city.get('city') if isinstance(city, dict) else str(city)
-            api_key = os.getenv("OPENWEATHER_API_KEY")
-            if not api_key: return "Weather API key not configured"
-            url = "http://api.openweathermap.org/data/2.5/weather"
-            params = {"q": actual_city, "appid": api_key, "units": "metric"}
-            response = requests.get(url, params=params)
-            if response.status_code != 200: return f"Weather data not available for {actual_city}"
-            data = response.json()
-            return f"{data['main']['temp']}°C, {data['weather'][0]['description'].title()}, Humidity: {data['main']['humidity']}%"
-        except Exception as e:
-            return f"Weather lookup failed: {str(e)}"
+        with metrics.span(f"tool.{self.name}") as span:
+            try:
+                actual_city = city.get('city') if isinstance(city, dict) else str(city)
+                api_key = os.getenv("OPENWEATHER_API_KEY")
+                if not api_key: return "Weather API key not configured"
+                cache_key = normalize_key(actual_city)
+                cached = tool_cache.get(self.name, cache_key)
+                span.cache = "miss" if cached is None else "hit"
+                if cached is not None: return cached
+                params = {"q": actual_city, "appid": api_key, "units": "metric"}
+                response = http_client.get(self.base_url, params=params, upstream="openweather")
+                if response.status_code != 200:
+                    span.status = "error"
+                    return f"Weather data not available for {actual_city}"
+                result = self._format_weather(response.json())
+                tool_cache.set(self.name, cache_key, result, self.cache_ttl)
+                return result
+            except UpstreamUnavailable as e:
+                span.status = "error"
+                return _degraded_result(span, self.name, actual_city, f"Weather unavailable: {str(e)}")
+            except Exception as e:
+                span.status = "error"
+                return f"Weather lookup failed: {str(e)}"
+
+    async def _arun(self, city: str) -> str:
+        """Same lookup as _run on the event loop; cancellation aborts the request"""
+        with metrics.span(f"tool.{self.name}") as span:
+            try:
+                actual_city = city.get('city') if isinstance(city, dict) else str(city)
+                api_key = os.getenv("OPENWEATHER_API_KEY")
+                if not api_key: return "Weather API key not configured"
+                cache_key = normalize_key(actual_city)
+                cached = tool_cache.get(self.name, cache_key)
+                span.cache = "miss" if cached is None else "hit"
+                if cached is not None: return cached
+                result = await inflight_lookups.do((self.name, cache_key), lambda: self._afetch_weather(actual_city, api_key, cache_key))
+                if result is None:
+                    span.status = "error"
+                    return f"Weather data not available for {actual_city}"
+                return result
+            except UpstreamUnavailable as e:
+                span.status = "error"
+                return _degraded_result(span, self.name, actual_city, f"Weather unavailable: {str(e)}")
+            except Exception as e:
+                span.status = "error"
+                return f"Weather lookup failed: {str(e)}"
+
+    async def _afetch_weather(self, city: str, api_key: str, cache_key: str):
+        """Formatted weather (cached), or None if the upstream answered with an error"""
+        params = {"q": city, "appid": api_key, "units": "metric"}
+        response = await http_client.aget(self.base_url, params=params, upstream="openweather")
+        if response.status_code != 200:
+            return None
+        result = self._format_weather(response.json())
+        tool_cache.set(self.name, cache_key, result, self.cache_ttl)
+        return result
+
+    def _run_many(self, cities: list) -> str:
+        """Weather for every city as one de-duplicated batch, looked up side by side"""
+        cities = _unique_cities(cities)
+        if len(cities) <= 1:
+            return self._run(cities[0]) if cities else "No destination recognised for a weather lookup"
+        # A context copy per lookup so each tool span joins the plan's trace
+        futures = [weather_batch_executor.submit(contextvars.copy_context().run, self._run, city) for city in cities]
+        return self._format_many(cities, [future.result() for future in futures])
+
+    async def _arun_many(self, cities: list) -> str:
+        """Awaitable _run_many; cache hits and single-flight still apply per city"""
+        cities = _unique_cities(cities)
+        if len(cities) <= 1:
+            return await self._arun(cities[0]) if cities else "No destination recognised for a weather lookup"
+        return self._format_many(cities, await asyncio.gather(*(self._arun(city) for city in cities)))
+
+    def _format_many(self, cities: list, results: list) -> str:
+        # "Paris,FR" -> "Paris"
+        return "; ".join(f"{city.split(',')[0]}: {result}" for city, result in zip(cities, results))
+
+    def _format_weather(self, data: dict) -> str:
+        return f"{data['main']['temp']}°C, {data['weather'][0]['description'].title()}, Humidity: {data['main']['humidity']}%"
+
+# Concurrent async lookups of the same uncached key (many plans for one city) share one request
+inflight_lookups = AsyncSingleFlight()
+
+# Fans out the weather lookups of multi-city goals on the sync path; shared so plans don't spawn threads
+WEATHER_BATCH_WORKERS = int(os.getenv("WEATHER_BATCH_WORKERS", "4"))
+weather_batch_executor = ThreadPoolExecutor(max_workers=WEATHER_BATCH_WORKERS, thread_name_prefix="weather")
 
 # Initialize tools
 web_search_tool = WebSearchTool()
 weather_tool = WeatherTool()
 available_tools = [web_search_tool, weather_tool]
 
+# ------------------ ENRICHMENT POOL ------------------ #
+# Shared, bounded pool so enrichment lookups run side by side without spawning a thread per plan
+ENRICHMENT_MAX_WORKERS = int(os.getenv("ENRICHMENT_MAX_WORKERS", "8"))
+enrichment_executor = ThreadPoolExecutor(max_workers=ENRICHMENT_MAX_WORKERS, thread_name_prefix="enrichment")
+
+# Per-lookup deadlines in seconds, measured from the moment enrichment starts
+ENRICHMENT_DEADLINES = {
+    "weather_considerations": float(os.getenv("WEATHER_DEADLINE", "5")),
+    "recommendations": float(os.getenv("RECOMMENDATIONS_DEADLINE", "8")),
+    "budget_tips": float(os.getenv("BUDGET_TIPS_DEADLINE", "8")),
+}
+
+# Partial results returned when a lookup misses its deadline
+ENRICHMENT_FALLBACKS = {
+    "weather_considerations": "Weather unavailable",
+    "recommendations": "Recommendations unavailable",
+    "budget_tips": "Budget tips unavailable",
+}
+
+# ------------------ LLM USAGE ------------------ #
+# crewai runs sync handlers in a copy of the emitting thread's context, so the plan's trace id is visible here
+@crewai_event_bus.on(LLMCallCompletedEvent)
+def _record_llm_usage(source, event):
+    usage = UsageMetrics.from_provider_dict(event.usage) if isinstance(event.usage, dict) else None
+    if usage is not None:
+        metrics.record_llm_usage(event.model, usage.prompt_tokens, usage.completion_tokens)
+
+# ------------------ STRUCTURED OUTPUT ------------------ #
+class TimedTask(BaseModel):
+    time: str = Field(default="", description="Start time such as 09:00, or empty if untimed")
+    activity: str = Field(description="Short description of the activity")
+
+class DayPlan(BaseModel):
+    day: int = Field(description="Day number, starting at 1")
+    title: str = Field(default="", description="Short theme for the day")
+    tasks: List[TimedTask] = Field(description="Activities for the day in order")
+
+class PlanOutput(BaseModel):
+    days: List[DayPlan] = Field(description="Every day of the plan in order")
+
+def day_tasks(day: DayPlan) -> list:
+    """Display strings for a structured day's activities"""
+    return [f"{task.time} - {task.activity}" if task.time else task.activity for task in day.tasks]
+
+class IncrementalJSONPlanParser:
+    """Reports each day of a streamed PlanOutput JSON document as soon as its object closes.
+
+    Same feed/close interface as IncrementalPlanParser; only whole day objects are decoded, and
+    each is validated as a DayPlan.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._scanned = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._day_start = None
+
+    def feed(self, chunk: str) -> list:
+        self._buffer += chunk
+        completed = []
+        for index in range(self._scanned, len(self._buffer)):
+            char = self._buffer[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 2 and char == "{":
+                    self._day_start = index  # an element of the top-level "days" array
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 2 and char == "}" and self._day_start is not None:
+                    day = self._decode(self._buffer[self._day_start:index + 1])
+                    if day is not None:
+                        completed.append((f"Day {day.day}", day_tasks(day)))
+                    self._day_start = None
+        self._scanned = len(self._buffer)
+        return completed
+
+    def close(self) -> list:
+        return []
+
+    def _decode(self, text: str):
+        try:
+            return DayPlan.model_validate_json(text)
+        except ValueError:
+            return None  # malformed day; the final validation of the whole plan decides
+
+# ------------------ INCREMENTAL PARSER ------------------ #
+class IncrementalPlanParser:
+    """Line-oriented Day N / numbered-step parser that reports each day as soon as its block closes"""
+
+    def __init__(self):
+        self.days = {}
+        self.current_day = None
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> list:
+        """Consume a chunk of text and return the (day, tasks) blocks it completed"""
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split('\n')
+        completed = []
+        for line in lines:
+            closed = self._consume(line)
+            if closed:
+                completed.append(closed)
+        return completed
+
+    def close(self) -> list:
+        """Flush the trailing partial line and the last open day"""
+        completed = self.feed('\n')
+        if self.current_day:
+            completed.append((self.current_day, self.days[self.current_day]))
+            self.current_day = None
+        return completed
+
+    def _consume(self, line: str):
+        line = line.strip()
+        day_match = re.match(r'[#>*_\s]*Day\s*(\d+)', line, re.I)
+        step_match = re.match(r'^\s*(?:\d+[\.\)]|[-*•])\s+(.*)', line)
+
+        if day_match:
+            closed = (self.current_day, self.days[self.current_day]) if self.current_day else None
+            self.current_day = f"Day {day_match.group(1)}"
+            self.days[self.current_day] = []
+            return closed
+        elif step_match and self.current_day:
+            self.days[self.current_day].append(step_match.group(1))
+        return None
+
 # ------------------ PLANNER AGENT ------------------ #
+# The goal is filled in per request via kickoff(inputs={"goal": ...})
+PLAN_TASK_DESCRIPTION = "Goal: '{goal}'. Create a detailed, actionable, day-wise plan including travel, food, sightseeing, and rest."
+
+# Single-day revision: only the day being changed and a short outline of its neighbours are sent
+DAY_TASK_DESCRIPTION = (
+    "Goal: '{goal}'. Revise {day} of an existing plan.\n"
+    "Current {day}:\n{day_tasks}\n"
+    "Neighbouring days (stay consistent, don't repeat them): {neighbours}\n"
+    "Change requested: {instruction}"
+)
+
+# Tasks of each neighbouring day included as context for a single-day revision
+REPLAN_CONTEXT_TASKS = int(os.getenv("REPLAN_CONTEXT_TASKS", "3"))
+
+# Idle crews kept per mode for acreate_plan; busier moments build extra ones that are then dropped
+ASYNC_CREW_POOL_SIZE = int(os.getenv("ASYNC_CREW_POOL_SIZE", "32"))
+
 class TaskPlannerAgent:
-    def __init__(self):
+    def __init__(self, verbose: bool = PLANNER_VERBOSE):
         self.llm = LLM(model="gpt-4", api_key=os.getenv("OPENAI_API_KEY"))
+        self._streaming_llm = (None, None)  # (the self.llm it was copied from, copy with stream=True)
+        self.verbose = verbose
+        # Crews keep per-run state, so each thread reuses its own templates
+        self._crews = threading.local()
+        # Coroutines share a thread, so acreate_plan leases crews from a pool instead
+        self._idle_crews = {}
 
-    def create_plan(self, goal: str) -> dict:
-        """Create structured day-wise plan with enrichment"""
-        # Step 1: Get main steps from LLM
+    def _llm_for(self, stream: bool):
+        """The LLM for a crew. Crew(stream=True) switches `stream` on for its agents' LLM and never
+        switches it back, so streaming crews get their own copy and the others keep self.llm as is."""
+        if not stream:
+            return self.llm
+        source, streaming_llm = self._streaming_llm
+        if source is not self.llm:
+            streaming_llm = self.llm.model_copy(update={"stream": True})
+            self._streaming_llm = (self.llm, streaming_llm)
+        return streaming_llm
+
+    def _build_crew(self, stream: bool = False, structured: bool = False, single_day: bool = False, native_async: bool = False) -> Crew:
+        """Assemble the single-agent planning crew; the goal stays a template variable"""
+        # The default flow-based executor runs LLM calls on worker threads even under akickoff;
+        # CrewAgentExecutor awaits llm.acall, so crews for acreate_plan use it
+        executor = {"executor_class": CrewAgentExecutor} if native_async else {}
         planner_agent = Agent(
             role='Task Planning Specialist',
             goal='Break down complex goals into actionable steps',
             backstory='You excel at creating detailed, step-by-step plans for any type of goal.',
-            llm=self.llm,
-            verbose=True
+            llm=self._llm_for(stream),
+            verbose=self.verbose,
+            **executor
         )
 
-        task = Task(
-            description=f"Goal: '{goal}'. Create a detailed, actionable, day-wise plan including travel, food, sightseeing, and rest.",
-            expected_output="Numbered day-wise plan with steps",
-            agent=planner_agent
-        )
+        if single_day:
+            task = Task(
+                description=DAY_TASK_DESCRIPTION,
+                expected_output="Only the revised activities for {day}, timed and in order" if structured else "Numbered list of the revised activities for {day}",
+                agent=planner_agent,
+                output_pydantic=DayPlan if structured else None
+            )
+        elif structured:
+            task = Task(
+                description=PLAN_TASK_DESCRIPTION,
+                expected_output="Days in order, each with a short title and timed activities; keep each activity to one sentence",
+                agent=planner_agent,
+                output_pydantic=PlanOutput
+            )
+        else:
+            task = Task(
+                description=PLAN_TASK_DESCRIPTION,
+                expected_output="Numbered day-wise plan with steps",
+                agent=planner_agent
+            )
 
-        crew = Crew(
+        return Crew(
             agents=[planner_agent],
             tasks=[task],
             process=Process.sequential,
-            verbose=True
+            verbose=self.verbose,
+            stream=stream
         )
 
-        raw_result = crew.kickoff()
+    def _get_crew(self, stream: bool = False, structured: bool = False, single_day: bool = False) -> Crew:
+        """This thread's crew for the mode, built on first use and reused for every later goal"""
+        crews = getattr(self._crews, "by_mode", None)
+        if crews is None:
+            crews = self._crews.by_mode = {}
+        # Keyed by the LLM too, so crews built on a replaced self.llm are never reused
+        mode = (id(self.llm), stream, structured, single_day)
+        if mode not in crews:
+            crews[mode] = self._build_crew(stream=stream, structured=structured, single_day=single_day)
+        return crews[mode]
+
+    @asynccontextmanager
+    async def _lease_crew(self, stream: bool = False, structured: bool = False, single_day: bool = False):
+        """An idle crew for the mode (or a new one), returned to the pool only after a clean run"""
+        idle = self._idle_crews.setdefault((id(self.llm), stream, structured, single_day), [])
+        try:
+            crew = idle.pop()
+        except IndexError:
+            crew = self._build_crew(stream=stream, structured=structured, single_day=single_day, native_async=True)
+        yield crew
+        if len(idle) < ASYNC_CREW_POOL_SIZE:
+            idle.append(crew)
+
+    def create_plan(self, goal: str) -> dict:
+        """Create structured day-wise plan with enrichment"""
+        with metrics.trace(), metrics.span("create_plan"):
+            # Step 1: Get main steps from LLM
+            structured = PLAN_OUTPUT_MODE == "structured"
+            crew = self._get_crew(structured=structured)
+            rate_limiters.acquire("llm")
+            with upstream_guards.call("llm"), metrics.span("llm"):
+                raw_result = crew.kickoff(inputs={"goal": goal})
+
+            plan_output = getattr(raw_result, 'pydantic', None) if structured else None
+            if isinstance(plan_output, PlanOutput) and plan_output.days:
+                return self._structured_result(plan_output, goal)
+
+            # Fallback: scrape the free text
+            result_text = str(raw_result.raw) if hasattr(raw_result, 'raw') else str(raw_result)
+            return self._parse_result(result_text, goal)
+
+    async def acreate_plan(self, goal: str) -> dict:
+        """Coroutine version of create_plan, for running many plans on one event loop.
+
+        The LLM call and every enrichment lookup are awaited, so cancelling the task stops them
+        all. Enrichment only needs the goal, so it runs while the LLM writes.
+        """
+        with metrics.trace(), metrics.span("create_plan"):
+            enrichment = asyncio.ensure_future(self._aenrich(goal))
+            try:
+                structured = PLAN_OUTPUT_MODE == "structured"
+                await rate_limiters.aacquire("llm")
+                # Leased outside the guard: building a crew is local work, not an LLM call
+                async with self._lease_crew(structured=structured) as crew:
+                    async with upstream_guards.acall("llm"):
+                        with metrics.span("llm"):
+                            raw_result = await crew.akickoff(inputs={"goal": goal})
+
+                plan_output = getattr(raw_result, 'pydantic', None) if structured else None
+                if isinstance(plan_output, PlanOutput) and plan_output.days:
+                    steps, full_result = self._structured_steps(plan_output)
+                else:
+                    full_result = str(raw_result.raw) if hasattr(raw_result, 'raw') else str(raw_result)
+                    steps = self._text_steps(full_result)
+                return {"goal": goal, "steps": steps, "enriched_info": await enrichment, "full_result": full_result}
+            finally:
+                enrichment.cancel()  # no-op once finished; stops the lookups if the LLM call failed or was cancelled
+
+    def stream_plan(self, goal: str):
+        """Yield ("day", step) events while the LLM writes, then ("plan", plan).
+
+        In structured mode the model streams PlanOutput JSON: each day is reported once its object
+        closes and the plan is built from the validated output, scraping the text only if that
+        fails. Free-text mode also yields ("token", text) events.
+        """
+        # A trace can't stay set across yields, so it is entered around each non-yielding step
+        trace_id = metrics.new_trace_id()
+        started = time.perf_counter()
+        structured = PLAN_OUTPUT_MODE == "structured"
+        crew = self._get_crew(stream=True, structured=structured)
+        rate_limiters.acquire("llm")
+        # The slot is held until the stream ends; a caller that stops reading releases it uncounted
+        with upstream_guards.call("llm"):
+            streaming = crew.kickoff(inputs={"goal": goal})
+            parser = IncrementalJSONPlanParser() if structured else IncrementalPlanParser()
+
+            llm_started = time.perf_counter()
+            chunks = iter(streaming)
+            with metrics.trace(trace_id):
+                # crewai starts the LLM worker on the first next(), copying this context, so token usage joins the trace
+                first_chunk = next(chunks, None)
+            for chunk in itertools.chain([first_chunk] if first_chunk is not None else [], chunks):
+                if chunk.chunk_type != StreamChunkType.TEXT or not chunk.content:
+                    continue
+                if not structured:
+                    yield "token", chunk.content  # JSON fragments aren't worth showing
+                for day, tasks in parser.feed(chunk.content):
+                    yield "day", {"day": day, "tasks": tasks}
+            for day, tasks in parser.close():
+                yield "day", {"day": day, "tasks": tasks}
+            metrics.record_span("llm", (time.perf_counter() - llm_started) * 1000, trace_id=trace_id)
+            raw_result = streaming.result
+
         result_text = str(raw_result.raw) if hasattr(raw_result, 'raw') else str(raw_result)
+        plan_output = self._validated_output(raw_result, result_text) if structured else None
+        with metrics.trace(trace_id):
+            if plan_output is not None:
+                plan = self._structured_result(plan_output, goal)
+            else:
+                plan = self._parse_result(result_text, goal)
+        metrics.record_span("create_plan", (time.perf_counter() - started) * 1000, trace_id=trace_id)
+        yield "plan", plan
+
+    def replan_day(self, plan_id: int, day_label: str, instruction: str) -> dict:
+        """Regenerate one day of a stored plan and save it in place.
+
+        Only that day and an outline of its neighbours go to the LLM; the other days and the
+        stored enrichment are kept as they are. Returns the updated plan.
+        """
+        from database.crud import get_plan, replace_plan_day
+
+        with metrics.trace(), metrics.span("replan_day"):
+            plan = get_plan(plan_id)
+            if plan is None:
+                raise ValueError(f"Plan {plan_id} not found")
+            labels = [step.get("day") for step in plan["steps"] if isinstance(step, dict)]
+            if day_label not in labels:
+                raise ValueError(f"Plan {plan_id} has no day '{day_label}'")
 
-        return self._parse_result(result_text, goal)
+            tasks = self._revise_day(plan["goal"], plan["steps"], labels.index(day_label), instruction)
+            replace_plan_day(plan_id, day_label, tasks)
+            return get_plan(plan_id)
+
+    def _revise_day(self, goal: str, steps: list, index: int, instruction: str) -> list:
+        """New task list for steps[index], asked of the LLM with only local context"""
+        day = steps[index]
+        neighbours = []
+        for neighbour in (steps[index - 1] if index > 0 else None, steps[index + 1] if index + 1 < len(steps) else None):
+            if neighbour:
+                neighbours.append(f"{neighbour['day']}: " + "; ".join(neighbour.get("tasks", [])[:REPLAN_CONTEXT_TASKS]))
+
+        structured = PLAN_OUTPUT_MODE == "structured"
+        crew = self._get_crew(structured=structured, single_day=True)
+        rate_limiters.acquire("llm")
+        with upstream_guards.call("llm"), metrics.span("llm"):
+            raw_result = crew.kickoff(inputs={
+                "goal": goal,
+                "day": day["day"],
+                "day_tasks": "\n".join(f"{i}. {task}" for i, task in enumerate(day.get("tasks", []), 1)),
+                "neighbours": " | ".join(neighbours) or "none",
+                "instruction": instruction
+            })
+
+        with metrics.span("parse"):
+            day_output = getattr(raw_result, 'pydantic', None) if structured else None
+            if isinstance(day_output, DayPlan) and day_output.tasks:
+                return [f"{task.time} - {task.activity}" if task.time else task.activity for task in day_output.tasks]
+
+            text = str(raw_result.raw) if hasattr(raw_result, 'raw') else str(raw_result)
+            parser = IncrementalPlanParser()
+            parser.feed(f"Day 1\n{text}")  # anchor steps that come without a day heading
+            parser.close()
+            tasks = [task for day_tasks in parser.days.values() for task in day_tasks]
+            if not tasks:
+                raise ValueError("The model did not return any activities for the day")
+            return tasks
 
     # ------------------ PARSING ------------------ #
-    def _parse_result(self, text: str, goal: str) -> dict:
-        """Parse raw LLM output into structured plan"""
-        steps = []
-        day_plan = {}
-        current_day = None
+    def _structured_result(self, plan_output: PlanOutput, goal: str) -> dict:
+        """Build the plan dict straight from validated structured output"""
+        steps, full_result = self._structured_steps(plan_output)
+        return {
+            "goal": goal,
+            "steps": steps,
+            "enriched_info": self._enrich(goal),
+            "full_result": full_result
+        }
 
-        for line in text.split('\n'):
-            line = line.strip()
-            day_match = re.match(r'Day\s*(\d+)', line, re.I)
-            step_match = re.match(r'^\s*\d+[\.\)]\s+(.*)', line)
+    def _validated_output(self, raw_result, result_text: str):
+        """The PlanOutput crewai validated, else the raw text validated against it, else None"""
+        plan_output = getattr(raw_result, 'pydantic', None)
+        if not isinstance(plan_output, PlanOutput):
+            try:
+                plan_output = PlanOutput.model_validate_json(result_text)
+            except ValueError:
+                return None
+        return plan_output if plan_output.days else None
 
-            if day_match:
-                current_day = f"Day {day_match.group(1)}"
-                day_plan[current_day] = []
-            elif step_match and current_day:
-                day_plan[current_day].append(step_match.group(1))
+    def _structured_steps(self, plan_output: PlanOutput):
+        """(steps, readable text) from validated structured output"""
+        steps = []
+        lines = []
+        with metrics.span("parse"):
+            for day in sorted(plan_output.days, key=lambda d: d.day):
+                tasks = day_tasks(day)
+                steps.append({"day": f"Day {day.day}", "tasks": tasks})
+                lines.append(f"Day {day.day}: {day.title}" if day.title else f"Day {day.day}")
+                lines.extend(f"{i}. {task}" for i, task in enumerate(tasks, 1))
+                lines.append("")
+        return steps, "\n".join(lines).strip()
 
-        # If no day-wise, fallback to plain numbered steps
-        if not day_plan:
-            day_plan = {"Day 1": [line for line in text.split('\n') if line.strip()][:10]}
+    def _parse_result(self, text: str, goal: str) -> dict:
+        """Parse raw LLM output into structured plan"""
+        steps = self._text_steps(text)
 
         # Add enrichment
-        enriched_info = {
-            "weather_considerations": self._get_weather(goal),
-            "recommendations": self._get_recommendations(goal),
-            "budget_tips": self._get_budget_tips(goal)
-        }
+        enriched_info = self._enrich(goal)
 
         return {
             "goal": goal,
-            "steps": [{"day": day, "tasks": tasks} for day, tasks in day_plan.items()],
+            "steps": steps,
             "enriched_info": enriched_info,
             "full_result": text
         }
 
+    def _text_steps(self, text: str) -> list:
+        """Day-wise steps scraped from free text"""
+        with metrics.span("parse"):
+            parser = IncrementalPlanParser()
+            parser.feed(text)
+            parser.close()
+            day_plan = parser.days
+
+            # If no day-wise, fallback to plain numbered steps
+            if not day_plan:
+                day_plan = {"Day 1": [line for line in text.split('\n') if line.strip()][:10]}
+        return [{"day": day, "tasks": tasks} for day, tasks in day_plan.items()]
+
     # ------------------ ENRICHMENT ------------------ #
+    def _enrich(self, goal: str) -> dict:
+        """Run all enrichment lookups concurrently, each bounded by its own deadline"""
+        with metrics.span("enrich"):
+            return self._run_enrichment(goal)
+
+    def _run_enrichment(self, goal: str) -> dict:
+        lookups = {
+            "weather_considerations": self._get_weather,
+            "recommendations": self._get_recommendations,
+            "budget_tips": self._get_budget_tips
+        }
+        started = time.monotonic()
+        # Each lookup runs in a copy of this context so its tool spans join the plan's trace
+        futures = {key: enrichment_executor.submit(contextvars.copy_context().run, lookup, goal) for key, lookup in lookups.items()}
+
+        enriched_info = {}
+        for key, future in futures.items():
+            remaining = ENRICHMENT_DEADLINES[key] - (time.monotonic() - started)
+            try:
+                enriched_info[key] = future.result(timeout=max(remaining, 0))
+            except FutureTimeout:
+                future.cancel()
+                enriched_info[key] = ENRICHMENT_FALLBACKS[key]
+            except Exception as e:
+                enriched_info[key] = f"{ENRICHMENT_FALLBACKS[key]}: {str(e)}"
+        return enriched_info
+
+    async def _aenrich(self, goal: str) -> dict:
+        """Awaitable _enrich: lookups run as tasks on the current loop instead of pool threads"""
+        with metrics.span("enrich"):
+            return await self._arun_enrichment(goal)
+
+    async def _arun_enrichment(self, goal: str) -> dict:
+        lookups = {
+            "weather_considerations": self._aget_weather,
+            "recommendations": self._aget_recommendations,
+            "budget_tips": self._aget_budget_tips
+        }
+        started = time.monotonic()
+        # Tasks start from a copy of this context, so their tool spans join the plan's trace
+        tasks = {key: asyncio.ensure_future(lookup(goal)) for key, lookup in lookups.items()}
+
+        enriched_info = {}
+        try:
+            for key, task in tasks.items():
+                remaining = ENRICHMENT_DEADLINES[key] - (time.monotonic() - started)
+                try:
+                    # On timeout wait_for cancels the lookup, closing its upstream request
+                    enriched_info[key] = await asyncio.wait_for(task, timeout=max(remaining, 0))
+                except asyncio.TimeoutError:
+                    enriched_info[key] = ENRICHMENT_FALLBACKS[key]
+                except Exception as e:
+                    enriched_info[key] = f"{ENRICHMENT_FALLBACKS[key]}: {str(e)}"
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return enriched_info
+
     def _get_weather(self, goal: str) -> str:
-        city_match = re.search(r'\b(?:in|to)\s+([A-Za-z\s]+)', goal)
-        city = city_match.group(1) if city_match else "destination"
-        return weather_tool._run(city)
+        return weather_tool._run_many(self._goal_cities(goal))
 
     def _get_recommendations(self, goal: str) -> str:
         return web_search_tool._run(f"best things to do, food, and attractions in {goal}")
@@ -150,5 +742,26 @@ class TaskPlannerAgent:
     def _get_budget_tips(self, goal: str) -> str:
         return web_search_tool._run(f"budget tips for {goal}")
 
+    async def _aget_weather(self, goal: str) -> str:
+        return await weather_tool._arun_many(self._goal_cities(goal))
+
+    async def _aget_recommendations(self, goal: str) -> str:
+        return await web_search_tool._arun(f"best things to do, food, and attractions in {goal}")
+
+    async def _aget_budget_tips(self, goal: str) -> str:
+        return await web_search_tool._arun(f"budget tips for {goal}")
+
+    def _goal_cities(self, goal: str) -> list:
+        """OpenWeather queries for every destination in the goal, in order of mention.
+
+        Known cities come from the gazetteer in one pass. Otherwise the capitalised words after
+        "in"/"to" are used, so "trip to Paris focusing on art" never sends the whole phrase.
+        """
+        cities = find_cities(goal)
+        if cities:
+            return [city.query for city in cities]
+        place_match = re.search(r"\b(?:in|to)\s+([A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)*)", goal)
+        return [place_match.group(1)] if place_match else []
+
 # Initialize agent
 planner_agent = TaskPlannerAgent()
@@ -0,0 +1,76 @@
+# agents/rate_limit.py
+import os
+import time
+import asyncio
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Wait until `tokens` are available, then take them"""
+        while True:
+            wait = self._take(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: float = 1.0):
+        """Like acquire, but yields to the event loop while waiting"""
+        while True:
+            wait = self._take(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def _take(self, tokens: float) -> float:
+        """Take `tokens` if available and return 0, else return the seconds until they will be"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+def _rate_from_env(name: str):
+    """Requests per second from e.g. SERPAPI_RATE_PER_SEC; unset or 0 means unlimited"""
+    rate = float(os.getenv(f"{name}_RATE_PER_SEC", "0"))
+    return TokenBucket(rate, float(os.getenv(f"{name}_BURST", "0")) or None) if rate > 0 else None
+
+class RateLimiters:
+    """One bucket per upstream, shared by every thread in the process"""
+
+    def __init__(self):
+        self._buckets = {
+            "llm": _rate_from_env("LLM"),
+            "serpapi": _rate_from_env("SERPAPI"),
+            "openweather": _rate_from_env("OPENWEATHER")
+        }
+
+    def configure(self, upstream: str, rate: float, burst: float = None):
+        """Override a bucket at runtime (e.g. from CLI flags); rate <= 0 removes the limit"""
+        self._buckets[upstream] = TokenBucket(rate, burst) if rate and rate > 0 else None
+
+    def acquire(self, upstream: str):
+        bucket = self._buckets.get(upstream)
+        if bucket is not None:
+            bucket.acquire()
+
+    async def aacquire(self, upstream: str):
+        bucket = self._buckets.get(upstream)
+        if bucket is not None:
+            await bucket.aacquire()
+
+rate_limiters = RateLimiters()
@@ -0,0 +1,443 @@
+# agents/resilience.py
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError as FutureTimeout, wait
+from contextlib import contextmanager, asynccontextmanager
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESILIENCE_ENABLED = os.getenv("RESILIENCE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Hedging: a slow lookup gets a second identical request once it outlasts this percentile of
+# recent latencies; at most HEDGE_BUDGET of calls are hedged so a slow upstream isn't doubled
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05  # seconds
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "16"))  # threads running blocking calls that may be hedged
+
+# Per upstream: (initial concurrency, max concurrency, seconds a call may wait for a slot)
+UPSTREAM_DEFAULTS = {
+    "llm": (32, 128, 60.0),
+    "serpapi": (8, 32, 5.0),
+    "openweather": (8, 32, 5.0)
+}
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream whose breaker is open or whose slots stay full"""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float):
+        super().__init__(f"{upstream} unavailable ({reason}), retry in {retry_after:.0f}s")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+# Client exceptions for timeouts and refused connections that carry no status code (openai, litellm)
+TRANSPORT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "Timeout"}
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """True for errors that are the upstream's fault: transport failures, 429 and 5xx.
+
+    Anything else raised inside a guarded block, such as output validation, prompt templating or
+    a 4xx for a bad request, leaves the breaker and the limit alone. Wrapped errors are followed
+    through __cause__ / __context__.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError)):
+            return True
+        status = error.response.status_code if isinstance(error, httpx.HTTPStatusError) else getattr(error, "status_code", None)
+        if isinstance(status, int):
+            return status == 429 or status >= 500
+        if type(error).__name__ in TRANSPORT_ERROR_NAMES:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+# ------------------ CIRCUIT BREAKER ------------------ #
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and rejects calls for `reset_timeout`
+    seconds; then one probe call is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> float:
+        """0 if a call may go ahead, else the seconds until the next probe"""
+        with self._lock:
+            if self.state == "closed":
+                return 0.0
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return 0.0
+            self.rejected += 1
+            return max(remaining, 1.0)
+
+    def record(self, ok):
+        """Outcome of an allowed call: True, False, or None when it was abandoned (cancelled) or
+        failed for a reason that says nothing about the upstream"""
+        with self._lock:
+            if ok is None:
+                self._probing = False  # let the next call probe instead
+            elif self.state == "open":
+                pass  # a call started before the breaker tripped says nothing new
+            elif ok:
+                self.state = "closed"
+                self.failures = 0
+                self._probing = False
+            else:
+                self.failures += 1
+                if self.state == "half_open" or self.failures >= self.failure_threshold:
+                    self.state = "open"
+                    self.trips += 1
+                    self._opened_at = time.monotonic()
+                    self._probing = False
+
+# ------------------ ADAPTIVE CONCURRENCY ------------------ #
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+class AdaptiveLimit:
+    """AIMD concurrency limit driven by observed latency.
+
+    Calls are judged a window at a time (`limit` calls, at least MIN_WINDOW): if the window's median
+    latency stays within `tolerance` x the baseline and the limit was in use, it grows by one;
+    otherwise it is cut by `backoff`. A failure cuts it straight away, once per window. Medians keep
+    a few very slow responses from shrinking the limit. The baseline drops to any faster window
+    and creeps up slowly, so it follows the upstream's unloaded latency, not its queueing delay.
+    """
+
+    MIN_WINDOW = 10
+    BASELINE_DRIFT = 0.01
+
+    def __init__(self, initial: int, min_limit: int = 1, max_limit: int = 64, tolerance: float = 2.0, backoff: float = 0.75):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.inflight = 0
+        self.baseline = None
+        self._window = []  # latencies of the successful calls in the current window
+        self._window_peak = 0  # most calls in flight at once during the window
+        self._cut_in_window = False
+        self._cond = threading.Condition()
+        self._waiters = deque()  # (loop, future) of coroutines waiting for a slot
+
+    def has_capacity(self) -> bool:
+        return self.inflight < int(self.limit)
+
+    def acquire(self, timeout: float) -> bool:
+        """Take a slot, waiting up to `timeout` seconds; False if none freed up"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._take():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    async def aacquire(self, timeout: float) -> bool:
+        """Like acquire, but yields to the event loop while waiting"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self._cond:
+                if self._take():
+                    return True
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await asyncio.wait_for(waiter, max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                with self._cond:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+
+    def release(self, started: float, ok):
+        """Free a slot; `ok` is the call's outcome, or None to leave the limit alone"""
+        with self._cond:
+            self.inflight -= 1
+            if ok is not None:
+                self._adjust(time.monotonic() - started, ok)
+            # Every waiter re-checks; the ones that lose go back to waiting
+            self._cond.notify_all()
+            waiters, self._waiters = self._waiters, deque()
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                pass  # that loop has closed
+
+    def _take(self) -> bool:
+        if self.inflight < int(self.limit):
+            self.inflight += 1
+            self._window_peak = max(self._window_peak, self.inflight)
+            return True
+        return False
+
+    def _adjust(self, latency: float, ok: bool):
+        if not ok:
+            if not self._cut_in_window:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._cut_in_window = True
+            return
+        self._window.append(latency)
+        if len(self._window) < max(int(self.limit), self.MIN_WINDOW):
+            return
+
+        median = sorted(self._window)[len(self._window) // 2]
+        if self.baseline is None or median < self.baseline:
+            self.baseline = median
+        else:
+            self.baseline += (median - self.baseline) * self.BASELINE_DRIFT
+        if median > self.baseline * self.tolerance:
+            if not self._cut_in_window:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif self._window_peak >= self.limit / 2:
+            # Only grow a limit that is being used, so an idle upstream doesn't earn a large one
+            self.limit = min(self.max_limit, self.limit + 1)
+        self._window = []
+        self._window_peak = self.inflight
+        self._cut_in_window = False
+
+# ------------------ GUARDS ------------------ #
+class Attempt:
+    """Mutable handle for one guarded call; set `failed` for responses that count against the
+    upstream (429 / 5xx) without raising"""
+
+    def __init__(self):
+        self.failed = False
+
+class UpstreamGuard:
+    """Circuit breaker, adaptive concurrency limit and hedging for one upstream"""
+
+    def __init__(self, name: str, breaker: CircuitBreaker, limit: AdaptiveLimit, slot_timeout: float):
+        self.name = name
+        self.breaker = breaker
+        self.limit = limit
+        self.slot_timeout = slot_timeout
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=200)  # recent successful calls, for the hedge delay
+
+    @contextmanager
+    def call(self):
+        """Guard a blocking call; raises UpstreamUnavailable instead of waiting on a failing upstream"""
+        self._check_breaker()
+        if not self.limit.acquire(self.slot_timeout):
+            self._reject_slot()
+        with self._outcome() as attempt:
+            yield attempt
+
+    @asynccontextmanager
+    async def acall(self):
+        """Guard an awaited call; same rules as `call`"""
+        self._check_breaker()
+        try:
+            acquired = await self.limit.aacquire(self.slot_timeout)
+        except BaseException:
+            self.breaker.record(None)
+            raise
+        if not acquired:
+            self._reject_slot()
+        with self._outcome() as attempt:
+            yield attempt
+
+    def hedged(self, call):
+        """Blocking `ahedged`: `call()` runs on the hedge pool so a second one can be raced against it.
+
+        A thread can't be cancelled, so the slower call runs to completion and its result is dropped.
+        """
+        delay = self.hedge_delay()
+        if delay is None:
+            return call()
+        primary = hedge_executor.submit(call)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        if not self._take_hedge():
+            return primary.result()
+        hedge = hedge_executor.submit(call)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+            if winner is None and pending:
+                continue  # one failed; the other may still succeed
+            if winner is hedge:
+                self.hedge_wins += 1
+            return (winner or done.pop()).result()
+
+    async def ahedged(self, call):
+        """Await `call()`; if it outlasts the hedge delay, race an identical second call and keep
+        whichever finishes first. Only for idempotent calls: the slower one is cancelled.
+        """
+        primary = asyncio.ensure_future(call())
+        delay = self.hedge_delay()
+        if delay is None:
+            return await primary
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self._take_hedge():
+                return await primary
+            hedge = asyncio.ensure_future(call())
+            tasks.add(hedge)
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is None and pending:
+                    continue  # one failed; the other may still succeed
+                if winner is hedge:
+                    self.hedge_wins += 1
+                return (winner or done.pop()).result()
+        finally:
+            for task in tasks:
+                if task.done() and not task.cancelled():
+                    task.exception()  # the loser's error was handled by racing; don't log it as unretrieved
+                task.cancel()
+
+    def hedge_delay(self):
+        """Seconds before a call is hedged, or None while hedging is off or unsafe"""
+        if not HEDGE_ENABLED or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return max(HEDGE_MIN_DELAY, ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE))])
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "trips": self.breaker.trips,
+            "rejected": self.breaker.rejected,
+            "limit": round(self.limit.limit, 1),
+            "inflight": self.limit.inflight,
+            "baseline_ms": round(self.limit.baseline * 1000, 1) if self.limit.baseline is not None else None,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins
+        }
+
+    def _check_breaker(self):
+        wait = self.breaker.allow()
+        if wait:
+            raise UpstreamUnavailable(self.name, "circuit open", wait)
+
+    def _reject_slot(self):
+        self.breaker.record(None)
+        raise UpstreamUnavailable(self.name, "concurrency limit", self.slot_timeout)
+
+    def _take_hedge(self) -> bool:
+        if self.breaker.state != "closed" or not self.limit.has_capacity() or self.hedges >= HEDGE_BUDGET * self.calls:
+            return False
+        self.hedges += 1
+        return True
+
+    @contextmanager
+    def _outcome(self):
+        """Record the guarded call's outcome on the breaker and the limit; the slot is already held"""
+        self.calls += 1
+        attempt = Attempt()
+        started = time.monotonic()
+        ok = None
+        try:
+            yield attempt
+            ok = not attempt.failed
+        except Exception as e:
+            if is_upstream_failure(e):
+                ok = False
+            raise
+        finally:
+            # Cancelled calls and local errors (ok is None) free their slot without counting either way
+            self.limit.release(started, ok)
+            self.breaker.record(ok)
+            if ok:
+                self._latencies.append(time.monotonic() - started)
+
+def _guard_from_env(name: str, initial: int, max_limit: int, slot_timeout: float) -> UpstreamGuard:
+    """Guard configured from e.g. SERPAPI_BREAKER_FAILURES, SERPAPI_MAX_CONCURRENCY"""
+    prefix = name.upper()
+    breaker = CircuitBreaker(
+        int(os.getenv(f"{prefix}_BREAKER_FAILURES", "5")),
+        float(os.getenv(f"{prefix}_BREAKER_RESET_SEC", "30"))
+    )
+    limit = AdaptiveLimit(
+        int(os.getenv(f"{prefix}_INITIAL_CONCURRENCY", str(initial))),
+        max_limit=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(max_limit)))
+    )
+    return UpstreamGuard(name, breaker, limit, float(os.getenv(f"{prefix}_SLOT_TIMEOUT", str(slot_timeout))))
+
+class UpstreamGuards:
+    """One guard per upstream, shared by every thread and event loop in the process.
+
+    Mirrors RateLimiters: calls for an unknown upstream, or with RESILIENCE_ENABLED=false, pass
+    straight through.
+    """
+
+    def __init__(self, enabled: bool = RESILIENCE_ENABLED):
+        self.enabled = enabled
+        self._guards = {name: _guard_from_env(name, *defaults) for name, defaults in UPSTREAM_DEFAULTS.items()}
+
+    def get(self, upstream: str):
+        return self._guards.get(upstream) if self.enabled else None
+
+    @contextmanager
+    def call(self, upstream: str):
+        guard = self.get(upstream)
+        if guard is None:
+            yield Attempt()
+            return
+        with guard.call() as attempt:
+            yield attempt
+
+    @asynccontextmanager
+    async def acall(self, upstream: str):
+        guard = self.get(upstream)
+        if guard is None:
+            yield Attempt()
+            return
+        async with guard.acall() as attempt:
+            yield attempt
+
+    def hedged(self, upstream: str, call):
+        guard = self.get(upstream)
+        return guard.hedged(call) if guard is not None else call()
+
+    async def ahedged(self, upstream: str, call):
+        guard = self.get(upstream)
+        return await (guard.ahedged(call) if guard is not None else call())
+
+    def snapshot(self) -> dict:
+        """Breaker state, concurrency limit and hedging counters per upstream, for monitoring"""
+        return {name: guard.snapshot() for name, guard in self._guards.items()} if self.enabled else {}
+
+hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+
+upstream_guards = UpstreamGuards()
@@ -0,0 +1,46 @@
+# agents/single_flight.py
+import asyncio
+
+class AsyncSingleFlight:
+    """Coalesces concurrent awaits of the same key into one call.
+
+    Callers that arrive while a call for their key is in flight wait for its result instead of
+    starting their own. The call is cancelled only when every waiter has gone away, so one
+    cancelled caller never fails the others, and the last one still stops the upstream work.
+    """
+
+    def __init__(self):
+        self._calls = {}  # (event loop, key) -> [task, waiters]
+        self.shared = 0
+
+    def in_flight(self, key) -> bool:
+        """Whether a call for `key` is running on this event loop, so `do` would join it"""
+        return self._live_call((asyncio.get_running_loop(), key)) is not None
+
+    def _live_call(self, call_key):
+        """The in-flight call, unless it was cancelled and its done callback has not run yet"""
+        call = self._calls.get(call_key)
+        if call is not None and call[0].cancelled():
+            self._calls.pop(call_key)
+            return None
+        return call
+
+    async def do(self, key, fetch):
+        """Await `fetch()` (a coroutine function), or the identical call already in flight"""
+        call_key = (asyncio.get_running_loop(), key)
+        call = self._live_call(call_key)
+        if call is None:
+            call = self._calls[call_key] = [asyncio.ensure_future(fetch()), 0]
+            call[0].add_done_callback(lambda _, call=call: self._calls.get(call_key) is call and self._calls.pop(call_key))
+        else:
+            self.shared += 1
+        call[1] += 1
+        try:
+            return await asyncio.shield(call[0])
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not call[0].done():
+                call[0].cancel()
+                # The task only finishes on a later step; callers arriving before then start afresh
+                if self._calls.get(call_key) is call:
+                    self._calls.pop(call_key)
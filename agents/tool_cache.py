@@ -0,0 +1,145 @@
+# agents/tool_cache.py
+import os
+import re
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, defaultdict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ------------------ CONFIG ------------------ #
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+TOOL_CACHE_PERSIST = os.getenv("TOOL_CACHE_PERSIST", "true").lower() in ("1", "true", "yes")
+TOOL_CACHE_DB = os.getenv("TOOL_CACHE_DB", "tool_cache.db")  # lives next to task_planner.db
+
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", str(15 * 60)))          # 15 minutes
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(3 * 24 * 60 * 60)))   # 3 days
+
+def normalize_key(text: str) -> str:
+    """Fold case and whitespace so 'Paris ' and 'paris' share one entry"""
+    return re.sub(r'\s+', ' ', str(text)).strip().lower()
+
+# ------------------ SQLITE TIER ------------------ #
+class SQLiteTier:
+    """Persistent tier shared by every process pointing at the same file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+
+    def get(self, namespace: str, key: str, allow_stale: bool = False):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM tool_cache WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        if row and (allow_stale or row[1] > time.time()):
+            return row
+        return None
+
+    def set(self, namespace: str, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tool_cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, value, expires_at)
+            )
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM tool_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM tool_cache")
+
+# ------------------ TIERED CACHE ------------------ #
+class ToolResultCache:
+    """In-process LRU tier backed by an optional SQLite tier, with per-entry TTLs"""
+
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES, db_path: str = None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (namespace, key) -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._disk = SQLiteTier(db_path) if db_path else None
+        self._stats = defaultdict(lambda: {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "stale_hits": 0})
+
+    def get(self, namespace: str, key: str):
+        """Return a cached value or None, promoting disk hits into memory"""
+        entry_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry and entry[0] > time.time():
+                self._entries.move_to_end(entry_key)
+                self._stats[namespace]["memory_hits"] += 1
+                return entry[1]
+            # Expired entries stay until evicted, for get_stale
+
+        row = self._disk.get(namespace, key) if self._disk else None
+        with self._lock:
+            if row:
+                self._stats[namespace]["disk_hits"] += 1
+                self._remember(namespace, key, row[0], row[1])
+                return row[0]
+            self._stats[namespace]["misses"] += 1
+        return None
+
+    def get_stale(self, namespace: str, key: str):
+        """Last stored value even if expired, or None; for when the upstream can't be asked"""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry:
+                self._stats[namespace]["stale_hits"] += 1
+                return entry[1]
+        row = self._disk.get(namespace, key, allow_stale=True) if self._disk else None
+        if row:
+            with self._lock:
+                self._stats[namespace]["stale_hits"] += 1
+            return row[0]
+        return None
+
+    def set(self, namespace: str, key: str, value: str, ttl: float):
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(namespace, key, value, expires_at)
+        if self._disk:
+            self._disk.set(namespace, key, value, expires_at)
+
+    def _remember(self, namespace: str, key: str, value: str, expires_at: float):
+        """Insert into the LRU tier, evicting least recently used entries past the size bound"""
+        self._entries[(namespace, key)] = (expires_at, value)
+        self._entries.move_to_end((namespace, key))
+        while len(self._entries) > self.max_entries:
+            (evicted_namespace, _), _ = self._entries.popitem(last=False)
+            self._stats[evicted_namespace]["evictions"] += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters per namespace, plus an overall hit rate"""
+        with self._lock:
+            per_namespace = {namespace: dict(counters) for namespace, counters in self._stats.items()}
+            size = len(self._entries)
+        hits = sum(c["memory_hits"] + c["disk_hits"] for c in per_namespace.values())
+        lookups = hits + sum(c["misses"] for c in per_namespace.values())
+        return {
+            "namespaces": per_namespace,
+            "memory_entries": size,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+        if self._disk:
+            self._disk.clear()
+
+# Shared cache for all tools in this process
+tool_cache = ToolResultCache(db_path=TOOL_CACHE_DB if TOOL_CACHE_PERSIST else None)
@@ -0,0 +1,137 @@
+# api_server.py
+import os
+import json
+import math
+import base64
+import asyncio
+import argparse
+from contextlib import asynccontextmanager
+from datetime import datetime
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from database.database import create_tables
+from database.crud import get_plan, list_plans_page, SORT_KEYS
+from database.search import search_plans
+from database.models import TaskPlan
+from agents.plan_service import PlanService, ServiceOverloaded
+from agents.resilience import upstream_guards, UpstreamUnavailable
+from agents import http_client
+
+API_MAX_PAGE_SIZE = 100
+
+class PlanJSONResponse(JSONResponse):
+    """JSON with datetimes as ISO 8601 strings"""
+
+    def render(self, content) -> bytes:
+        return json.dumps(content, ensure_ascii=False, default=_encode).encode("utf-8")
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _error(message: str, status_code: int, headers: dict = None):
+    return PlanJSONResponse({"error": message}, status_code=status_code, headers=headers)
+
+# History cursors are opaque to clients: base64 of the JSON-encoded keyset or search offset
+def _encode_cursor(cursor) -> str:
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor, default=_encode).encode("utf-8")).decode("ascii")
+
+def _decode_cursor(token: str, sort_by: str = None):
+    cursor = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    if sort_by is None:
+        return int(cursor)
+    value, plan_id = cursor
+    column, _ = SORT_KEYS[sort_by]
+    return (datetime.fromisoformat(value) if column is TaskPlan.created_at else value, int(plan_id))
+
+def create_app(service: PlanService = None) -> Starlette:
+    service = service or PlanService()
+
+    async def create_plan(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return _error("Request body must be JSON", 400)
+        goal = body.get("goal") if isinstance(body, dict) else None
+        if not isinstance(goal, str) or not goal.strip():
+            return _error("'goal' must be a non-empty string", 400)
+        try:
+            plan = await service.create_plan(goal.strip(), force_refresh=bool(body.get("force_refresh")))
+        except ServiceOverloaded as e:
+            return _error(str(e), 429, headers={"Retry-After": str(e.retry_after)})
+        except UpstreamUnavailable as e:
+            return _error(f"Plan generation failed: {str(e)}", 503, headers={"Retry-After": str(math.ceil(e.retry_after))})
+        except Exception as e:
+            return _error(f"Plan generation failed: {str(e)}", 502)
+        return PlanJSONResponse(plan, status_code=200 if plan.get("cached") else 201)
+
+    async def read_plan(request):
+        plan = await asyncio.to_thread(get_plan, request.path_params["plan_id"])
+        if plan is None:
+            return _error("Plan not found", 404)
+        return PlanJSONResponse(plan)
+
+    async def list_plans(request):
+        """History page: full-text search with ?q=, otherwise sorted by ?sort= (see crud.SORT_KEYS)"""
+        params = request.query_params
+        search = params.get("q", "").strip()
+        sort_by = params.get("sort", "Newest")
+        if sort_by not in SORT_KEYS:
+            return _error(f"'sort' must be one of: {', '.join(SORT_KEYS)}", 400)
+        try:
+            page_size = min(max(int(params.get("limit", "20")), 1), API_MAX_PAGE_SIZE)
+            cursor = _decode_cursor(params["cursor"], None if search else sort_by) if params.get("cursor") else None
+        except (ValueError, TypeError):
+            return _error("Invalid 'limit' or 'cursor'", 400)
+
+        if search:
+            rows, next_cursor = await asyncio.to_thread(search_plans, search, cursor, page_size)
+        else:
+            rows, next_cursor = await asyncio.to_thread(list_plans_page, sort_by, cursor, page_size)
+        return PlanJSONResponse({"plans": rows, "next_cursor": _encode_cursor(next_cursor)})
+
+    async def health(request):
+        """Queue counters plus breaker and concurrency state per upstream"""
+        upstreams = upstream_guards.snapshot()
+        degraded = any(upstream["state"] != "closed" for upstream in upstreams.values())
+        return PlanJSONResponse({"status": "degraded" if degraded else "ok", **service.stats(), "upstreams": upstreams})
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await asyncio.to_thread(create_tables)
+        # Import crewai and build the planner before the first request rather than during it
+        await asyncio.to_thread(lambda: service.planner)
+        yield
+        await http_client.aclose()
+
+    app = Starlette(routes=[
+        Route("/plans", create_plan, methods=["POST"]),
+        Route("/plans", list_plans, methods=["GET"]),
+        Route("/plans/{plan_id:int}", read_plan, methods=["GET"]),
+        Route("/health", health, methods=["GET"])
+    ], lifespan=lifespan)
+    app.state.service = service
+    return app
+
+app = create_app()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve plan creation, retrieval and history search over HTTP")
+    parser.add_argument("--host", default=os.getenv("PLAN_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PLAN_API_PORT", "8000")))
+    parser.add_argument("--max-inflight", type=int, help="plans generated at once (default: PLAN_API_MAX_INFLIGHT)")
+    parser.add_argument("--max-queue", type=int, help="distinct goals allowed to wait before answering 429 (default: PLAN_API_MAX_QUEUE)")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    limits = {name: value for name, value in (("max_inflight", args.max_inflight), ("max_queue", args.max_queue)) if value is not None}
+    print(f"🚀 Plan API on http://{args.host}:{args.port}")
+    uvicorn.run(create_app(PlanService(**limits)) if limits else app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# benchmarks/bench_blob_store.py
+"""Database size and read/write throughput of inline JSON vs the compressed blob store.
+
+Usage: python -m benchmarks.bench_blob_store [--plans 2000] [--cities 25]
+
+Plans are generated for a fixed set of cities, so (like real traffic) many of them carry the same
+recommendation and budget text. Each layout runs in a fresh subprocess against its own database:
+
+  inline    enrichment JSON on every task_plans row, no raw output (the layout before the blob
+            store), then the one-shot migration into blobs
+  blob      plans saved through the normal write path, raw output included
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+def make_plans(count: int, cities: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    city_names = [f"City{number}" for number in range(cities)]
+    plans = []
+    for number in range(count):
+        city = rng.choice(city_names)
+        days = rng.randint(2, 5)
+        steps = [
+            {"day": f"Day {day}", "tasks": [f"{hour:02d}:00 - Visit sight {rng.randint(1, 400)} in {city}" for hour in range(9, 15)]}
+            for day in range(1, days + 1)
+        ]
+        full_result = "\n\n".join(
+            f"{step['day']}: Exploring {city}\n" + "\n".join(f"{i}. {task}" for i, task in enumerate(step["tasks"], 1))
+            for step in steps
+        )
+        plans.append({
+            "goal": f"Plan a {days}-day trip to {city} #{number}",
+            "steps": steps,
+            "full_result": full_result,
+            "enriched_info": {
+                "destination": city,
+                "weather_considerations": f"{rng.randint(10, 30)}°C, {rng.choice(['Clear Sky', 'Light Rain', 'Overcast'])}",
+                "recommendations": "".join(
+                    f"Title: {city} highlight {i}\nSnippet: One of the best-rated things to do in {city}, open daily.\nLink: https://example.com/{city}/{i}\n\n"
+                    for i in range(5)
+                ),
+                "budget_tips": "".join(
+                    f"Title: {city} on a budget, tip {i}\nSnippet: Save money with the {city} city pass and free museum days.\n\n"
+                    for i in range(5)
+                )
+            }
+        })
+    return plans
+
+def database_size(engine) -> int:
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+    return os.path.getsize(engine.url.database)
+
+def time_reads(plan_ids: list) -> float:
+    """get_plan calls per second over every stored plan"""
+    from database.crud import get_plan
+    started = time.perf_counter()
+    for plan_id in plan_ids:
+        get_plan(plan_id)
+    return len(plan_ids) / (time.perf_counter() - started)
+
+def run_cell(layout: str, count: int, cities: int, batch: int = 200) -> dict:
+    """Runs inside the subprocess, against the database named by DATABASE_URL"""
+    from sqlalchemy import text
+    from database.database import engine, create_tables, SessionLocal, migrate_enrichment_to_blobs, prune_blobs
+    from database.models import TaskPlan
+    from database.crud import save_plans_bulk
+    from database.blobs import BLOB_CODEC
+
+    create_tables()
+    plans = make_plans(count, cities)
+    result = {"codec": BLOB_CODEC}
+
+    started = time.perf_counter()
+    plan_ids = []
+    for offset in range(0, count, batch):
+        chunk = plans[offset:offset + batch]
+        if layout == "blob":
+            plan_ids += save_plans_bulk(chunk)
+            continue
+        db = SessionLocal()
+        try:
+            rows = []
+            for plan_data in chunk:
+                row = TaskPlan(goal=plan_data["goal"], status="completed")
+                row.set_plan_steps_list(plan_data["steps"])
+                row.enriched_info = json.dumps(plan_data["enriched_info"])
+                rows.append(row)
+            db.add_all(rows)
+            db.commit()
+            plan_ids += [row.id for row in rows]
+        finally:
+            db.close()
+    result["writes_per_sec"] = count / (time.perf_counter() - started)
+    result["size"] = database_size(engine)
+    result["reads_per_sec"] = time_reads(plan_ids)
+
+    if layout == "inline":
+        started = time.perf_counter()
+        migrate_enrichment_to_blobs()
+        prune_blobs()
+        result["migrate_sec"] = time.perf_counter() - started
+        result["migrated_size"] = database_size(engine)
+        result["migrated_reads_per_sec"] = time_reads(plan_ids)
+
+    with engine.connect() as conn:
+        blobs, raw, stored = conn.execute(text("SELECT count(*), coalesce(sum(size), 0), coalesce(sum(length(data)), 0) FROM plan_blobs")).one()
+        references = conn.execute(text(
+            "SELECT (SELECT count(*) FROM plan_enrichment) + (SELECT count(*) FROM task_plans WHERE body_hash IS NOT NULL)"
+        )).scalar()
+    result.update({"blobs": blobs, "references": references, "blob_raw_bytes": raw, "blob_stored_bytes": stored})
+    return result
+
+def spawn_cell(layout: str, count: int, cities: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.update({"DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}", "METRICS_ENABLED": "false"})
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_blob_store", "--cell", layout, "--plans", str(count), "--cities", str(cities)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plans", type=int, default=2000)
+    parser.add_argument("--cities", type=int, default=25, help="distinct destinations; fewer means more repeated enrichment")
+    parser.add_argument("--cell", choices=("inline", "blob"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cell:
+        print(json.dumps(run_cell(args.cell, args.plans, args.cities)))
+        return
+
+    inline = spawn_cell("inline", args.plans, args.cities)
+    blob = spawn_cell("blob", args.plans, args.cities)
+
+    print(f"📊 Blob store benchmark — {args.plans} plans over {args.cities} cities, codec {blob['codec']}")
+    print(f"{'layout':<34}{'size KiB':>10}{'writes/s':>10}{'reads/s':>10}")
+    print(f"{'inline JSON, no raw output':<34}{inline['size'] / 1024:>10.0f}{inline['writes_per_sec']:>10.0f}{inline['reads_per_sec']:>10.0f}")
+    print(f"{'inline, after migration':<34}{inline['migrated_size'] / 1024:>10.0f}{'-':>10}{inline['migrated_reads_per_sec']:>10.0f}")
+    print(f"{'blob store, raw output included':<34}{blob['size'] / 1024:>10.0f}{blob['writes_per_sec']:>10.0f}{blob['reads_per_sec']:>10.0f}")
+    print(f"Migration took {inline['migrate_sec']:.2f}s")
+    for label, cell in (("after migration", inline), ("blob store", blob)):
+        ratio = cell["blob_raw_bytes"] / cell["blob_stored_bytes"] if cell["blob_stored_bytes"] else 0.0
+        print(f"{label}: {cell['references']} references → {cell['blobs']} distinct blobs, "
+              f"{cell['blob_raw_bytes'] / 1024:.0f} KiB of text stored in {cell['blob_stored_bytes'] / 1024:.0f} KiB ({ratio:.1f}x)")
+
+if __name__ == "__main__":
+    main()
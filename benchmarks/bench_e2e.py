@@ -0,0 +1,344 @@
+# benchmarks/bench_e2e.py
+"""Offline end-to-end benchmark of create_plan -> parsing/enrichment -> save_plan_to_db.
+
+Usage:
+    python -m benchmarks.bench_e2e [--sessions 1 8 32] [--plans-per-session 4]
+                                   [--token-latency-ms 1] [--upstream-delay-ms 40] [--error-rate 0.02]
+                                   [--tail-rate 0.03 --tail-ms 2000]   # occasional very slow responses
+    python -m benchmarks.bench_e2e --record fixtures.json   # proxy to the real APIs and save their responses
+    python -m benchmarks.bench_e2e --replay fixtures.json   # serve saved responses instead of synthetic ones
+    python -m benchmarks.bench_e2e --runner async --sessions 32 256   # acreate_plan on one event loop
+
+The real TaskPlannerAgent runs against a deterministic stub LLM (fixed plan, configurable
+per-token latency) and a local HTTP server that imitates SerpAPI and OpenWeather with
+injectable delays, slow tail responses and 503 errors. Plans are saved to a temporary SQLite database, so nothing
+needs network access or API keys. Recording needs SERPAPI_KEY and OPENWEATHER_API_KEY.
+
+`--runner threads` gives every session a thread calling create_plan; `--runner async` runs the
+sessions as coroutines calling acreate_plan on a single event loop.
+"""
+import argparse
+import asyncio
+import resource
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+CITIES = ["Paris", "Rome", "Tokyo", "Lisbon", "Berlin", "Madrid", "Vienna", "Prague", "Oslo", "Dublin", "Athens", "Kyoto"]
+
+# Where the stand-in forwards requests while recording
+REAL_UPSTREAMS = {
+    "/search": "https://serpapi.com/search",
+    "/weather": "http://api.openweathermap.org/data/2.5/weather"
+}
+SECRET_PARAMS = ("api_key", "appid")
+
+STUB_PLAN = {"days": [
+    {"day": day, "title": f"Day {day} highlights", "tasks": [
+        {"time": f"{hour:02d}:00", "activity": f"Stop {hour - 8} of day {day}"} for hour in range(9, 15)
+    ]} for day in range(1, 4)
+]}
+STUB_TEXT = "\n".join(
+    f"Day {day['day']}: {day['title']}\n" + "\n".join(
+        f"{i}. {task['time']} - {task['activity']}" for i, task in enumerate(day["tasks"], 1)
+    ) for day in STUB_PLAN["days"]
+)
+STUB_COMPLETION_TOKENS = len(json.dumps(STUB_PLAN)) // 4
+
+# ------------------ UPSTREAM STAND-IN ------------------ #
+def synthetic_response(path: str, params: dict):
+    if path == "/weather":
+        seed = sum(map(ord, params.get("q", "")))
+        return 200, {
+            "main": {"temp": 10 + seed % 20, "humidity": 40 + seed % 50},
+            "weather": [{"description": "scattered clouds"}]
+        }
+    query = params.get("q", "")
+    return 200, {"organic_results": [
+        {"title": f"Result {rank} for {query}", "snippet": f"Offline snippet {rank} about {query}."} for rank in range(1, 6)
+    ]}
+
+class UpstreamStandIn:
+    """Local server imitating SerpAPI (/search) and OpenWeather (/weather)"""
+
+    def __init__(self, delay_ms: float = 0, error_rate: float = 0, seed: int = 0, record_path: str = None, replay_path: str = None,
+                 tail_rate: float = 0, tail_ms: float = 0):
+        self.delay = delay_ms / 1000
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail = tail_ms / 1000
+        self.record_path = record_path
+        self.fixtures = {}
+        if replay_path:
+            with open(replay_path, encoding="utf-8") as f:
+                self.fixtures = json.load(f)
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @staticmethod
+    def fixture_key(path: str, params: dict) -> str:
+        return path + "?" + "&".join(f"{k}={v}" for k, v in sorted(params.items()) if k not in SECRET_PARAMS)
+
+    def respond(self, path: str, params: dict):
+        """(status, JSON body) for one request"""
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            delay = self.delay + (self.tail if self._random.random() < self.tail_rate else 0)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return 503, {"error": "injected failure"}
+
+        key = self.fixture_key(path, params)
+        if key in self.fixtures:
+            fixture = self.fixtures[key]
+            return fixture["status"], fixture["body"]
+        if self.record_path and path in REAL_UPSTREAMS:
+            import requests
+            response = requests.get(REAL_UPSTREAMS[path], params=params, timeout=15)
+            status, body = response.status_code, response.json()
+            with self._lock:
+                self.fixtures[key] = {"status": status, "body": body}
+            return status, body
+        return synthetic_response(path, params)
+
+    def start(self) -> str:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                status, body = stand_in.respond(url.path, dict(parse_qsl(url.query)))
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 256
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+        if self.record_path:
+            with open(self.record_path, "w", encoding="utf-8") as f:
+                json.dump(self.fixtures, f, indent=2, sort_keys=True)
+
+# ------------------ STUB LLM ------------------ #
+def make_stub_llm(token_latency_ms: float):
+    from crewai.llms.base_llm import BaseLLM
+    from crewai.events.types.llm_events import LLMCallType
+
+    class StubLLM(BaseLLM):
+        """Returns the same plan every call after sleeping as if it generated each token"""
+        token_latency: float = 0.0
+
+        def call(self, messages, tools=None, callbacks=None, available_functions=None,
+                 from_task=None, from_agent=None, response_model=None):
+            self._emit_call_started_event(messages=messages, from_task=from_task, from_agent=from_agent)
+            if self.token_latency:
+                time.sleep(self.token_latency * STUB_COMPLETION_TOKENS)
+            result = response_model.model_validate(STUB_PLAN) if response_model is not None else STUB_TEXT
+            self._emit_call_completed_event(
+                STUB_TEXT, LLMCallType.LLM_CALL, from_task=from_task, from_agent=from_agent, messages=messages,
+                usage={"prompt_tokens": len(str(messages)) // 4, "completion_tokens": STUB_COMPLETION_TOKENS}
+            )
+            return result
+
+        async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                        from_task=None, from_agent=None, response_model=None):
+            self._emit_call_started_event(messages=messages, from_task=from_task, from_agent=from_agent)
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency * STUB_COMPLETION_TOKENS)
+            result = response_model.model_validate(STUB_PLAN) if response_model is not None else STUB_TEXT
+            self._emit_call_completed_event(
+                STUB_TEXT, LLMCallType.LLM_CALL, from_task=from_task, from_agent=from_agent, messages=messages,
+                usage={"prompt_tokens": len(str(messages)) // 4, "completion_tokens": STUB_COMPLETION_TOKENS}
+            )
+            return result
+
+    return StubLLM(model="gpt-4", token_latency=token_latency_ms / 1000)
+
+# ------------------ RUNNER ------------------ #
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def session_goal(number: int, i: int, plans_per_session: int) -> str:
+    return f"Plan a 3-day trip to {CITIES[(number * plans_per_session + i) % len(CITIES)]}"
+
+def run_cell(planner, save_plan_to_db, sessions: int, plans_per_session: int, runner: str = "threads") -> dict:
+    """`sessions` concurrent users, each generating and saving plans back to back"""
+    latencies = []
+    failures = []
+    peak_threads = threading.active_count()
+
+    def session(number):
+        nonlocal peak_threads
+        for i in range(plans_per_session):
+            started = time.perf_counter()
+            try:
+                save_plan_to_db(planner.create_plan(session_goal(number, i, plans_per_session)))
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {e}")
+            peak_threads = max(peak_threads, threading.active_count())
+
+    async def async_session(number):
+        nonlocal peak_threads
+        for i in range(plans_per_session):
+            started = time.perf_counter()
+            try:
+                plan = await planner.acreate_plan(session_goal(number, i, plans_per_session))
+                await asyncio.to_thread(save_plan_to_db, plan)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {e}")
+            peak_threads = max(peak_threads, threading.active_count())
+
+    async def async_sessions():
+        await asyncio.gather(*(async_session(number) for number in range(sessions)))
+
+    started = time.perf_counter()
+    if runner == "async":
+        asyncio.run(async_sessions())
+    else:
+        with ThreadPoolExecutor(max_workers=sessions) as executor:
+            list(executor.map(session, range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies) or [0.0]
+    return {
+        "sessions": sessions,
+        "plans": len(latencies),
+        "failures": len(failures),
+        "seconds": elapsed,
+        "plans_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "peak_threads": peak_threads,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "first_failure": failures[0] if failures else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32], help="concurrent sessions per cell")
+    parser.add_argument("--plans-per-session", type=int, default=4)
+    parser.add_argument("--token-latency-ms", type=float, default=1.0, help="stub LLM time per completion token")
+    parser.add_argument("--upstream-delay-ms", type=float, default=40.0, help="added latency of every SerpAPI/OpenWeather call")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="fraction of upstream calls answered with 503")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of upstream calls slowed down by --tail-ms")
+    parser.add_argument("--tail-ms", type=float, default=2000.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", choices=("structured", "text"), default="structured")
+    parser.add_argument("--runner", choices=("threads", "async"), default="threads", help="a thread per session, or coroutines on one event loop")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", metavar="FIXTURES", help="forward upstream calls to the real APIs and save responses")
+    mode.add_argument("--replay", metavar="FIXTURES", help="serve previously recorded responses")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="exit non-zero if any cell's p95 exceeds this")
+    args = parser.parse_args()
+
+    if args.record and not (os.getenv("SERPAPI_KEY") and os.getenv("OPENWEATHER_API_KEY")):
+        parser.error("--record needs SERPAPI_KEY and OPENWEATHER_API_KEY")
+
+    stand_in = UpstreamStandIn(
+        delay_ms=0 if args.record else args.upstream_delay_ms,
+        error_rate=0 if args.record else args.error_rate,
+        seed=args.seed,
+        record_path=args.record,
+        replay_path=args.replay,
+        tail_rate=0 if args.record else args.tail_rate,
+        tail_ms=args.tail_ms
+    )
+    base_url = stand_in.start()
+    tmp = tempfile.TemporaryDirectory()
+
+    # Configure before the app modules import: the engine and tools read these at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    os.environ["TOOL_CACHE_PERSIST"] = "0"
+    os.environ["PLAN_OUTPUT_MODE"] = args.output
+    os.environ["SERPAPI_URL"] = f"{base_url}/search"
+    os.environ["OPENWEATHER_URL"] = f"{base_url}/weather"
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    if not args.record:
+        os.environ["SERPAPI_KEY"] = "offline"
+        os.environ["OPENWEATHER_API_KEY"] = "offline"
+
+    from database.database import create_tables
+    from database.crud import save_plan_to_db
+    from agents.planner_agent import TaskPlannerAgent
+    from agents.tool_cache import tool_cache
+    from agents.resilience import upstream_guards
+
+    create_tables()
+    planner = TaskPlannerAgent(verbose=False)
+    planner.llm = make_stub_llm(args.token_latency_ms)
+    run_cell(planner, save_plan_to_db, 1, 1, args.runner)  # warm-up: imports, crew templates, connection pool
+
+    print(f"End-to-end, offline ({args.runner}, {args.output} output, {args.token_latency_ms}ms/token, "
+          f"upstream +{stand_in.delay * 1000:.0f}ms, {args.error_rate:.0%} errors"
+          f"{f', {args.tail_rate:.0%} +{args.tail_ms:.0f}ms' if args.tail_rate else ''}"
+          f"{', replay' if args.replay else ''}{', recording' if args.record else ''})")
+    print(f"{'sessions':>8} {'plans':>6} {'fail':>5} {'plans/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'threads':>8} {'rss MB':>7}")
+    print("-" * 75)
+    results = []
+    try:
+        for sessions in args.sessions:
+            tool_cache.clear()  # every cell starts cold
+            result = run_cell(planner, save_plan_to_db, sessions, args.plans_per_session, args.runner)
+            results.append(result)
+            print(f"{result['sessions']:>8} {result['plans']:>6} {result['failures']:>5} {result['plans_per_sec']:>8.2f} "
+                  f"{result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} {result['p99_ms']:>8.0f} "
+                  f"{result['peak_threads']:>8} {result['peak_rss_mb']:>7.0f}")
+            if result["first_failure"]:
+                print(f"         first failure: {result['first_failure']}")
+    finally:
+        stand_in.stop()
+
+    print(f"\nUpstream stand-in: {stand_in.requests} requests, {stand_in.errors} injected errors")
+    for name, guard in upstream_guards.snapshot().items():
+        print(f"  {name:<12} breaker {guard['state']} ({guard['trips']} trips, {guard['rejected']} rejected), "
+              f"limit {guard['limit']}, {guard['hedges']} hedged ({guard['hedge_wins']} won)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+    if args.max_p95_ms is not None:
+        slow = [result for result in results if result["p95_ms"] > args.max_p95_ms]
+        if slow:
+            print(f"❌ p95 above {args.max_p95_ms}ms at {', '.join(str(result['sessions']) for result in slow)} session(s)")
+            sys.exit(1)
+        print(f"✅ p95 within {args.max_p95_ms}ms at every concurrency")
+
+if __name__ == "__main__":
+    main()
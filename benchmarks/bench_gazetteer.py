@@ -0,0 +1,93 @@
+# benchmarks/bench_gazetteer.py
+"""Destination extraction: Aho-Corasick gazetteer vs one regex per spelling vs the old "in/to" regex.
+
+Usage: python -m benchmarks.bench_gazetteer [--goals 5000]
+
+Goals are generated from templates over the gazetteer's own cities, with one to three
+destinations each. For every extractor it reports goals per second, the share of goals whose
+destinations were all found, and how many weather lookups would be sent for text that is not a
+known city (each one a wasted, failing OpenWeather call).
+"""
+import argparse
+import random
+import re
+import time
+from agents.gazetteer import Gazetteer, load_entries, fold_text
+
+# (template, number of destinations it names)
+TEMPLATES = [
+    ("Plan a {days}-day trip to {0} focusing on art museums", 1),
+    ("{days} days in {0} with kids", 1),
+    ("Weekend getaway to {0}, mostly food and markets", 1),
+    ("Fly into {0}, then take the train to {1}", 2),
+    ("Honeymoon in {0} followed by a few days in {1}", 2),
+    ("I want to see {0} and {1} in {days} days", 2),
+    ("Two weeks: {0}, {1} and {2} on a budget", 3),
+]
+
+def make_goals(count: int, cities: list, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    goals = []
+    for _ in range(count):
+        template, slots = rng.choice(TEMPLATES)
+        picked = rng.sample(cities, slots)
+        goals.append((template.format(*(city.name for city in picked), days=rng.randint(2, 9)), picked))
+    return goals
+
+def old_extractor(goal: str) -> list:
+    """The single-city regex _goal_city used before the gazetteer"""
+    city_match = re.search(r'\b(?:in|to)\s+([A-Za-z\s]+)', goal)
+    return [city_match.group(1) if city_match else "destination"]
+
+def per_spelling_extractor(entries: list):
+    """The same spellings, each tried with its own compiled regex"""
+    patterns = []
+    for city, spellings in entries:
+        for spelling in spellings:
+            if spelling.endswith("*"):
+                patterns.append((re.compile(r'(?<!\w)' + re.escape(spelling[:-1]) + r'(?!\w)'), False, city))
+            else:
+                patterns.append((re.compile(r'(?<!\w)' + re.escape(fold_text(spelling)) + r'(?!\w)'), True, city))
+
+    def extract(goal: str) -> list:
+        folded = fold_text(goal)
+        found = []
+        for pattern, fold, city in patterns:
+            if city not in found and pattern.search(folded if fold else goal):
+                found.append(city)
+        return found
+    return extract
+
+def run(label: str, extract, goals: list, known: set):
+    started = time.perf_counter()
+    outputs = [extract(goal) for goal, _ in goals]
+    elapsed = time.perf_counter() - started
+    complete = wasted = 0
+    for (_, expected), found in zip(goals, outputs):
+        names = [getattr(city, "name", city) for city in found]
+        complete += all(city.name in names for city in expected)
+        wasted += sum(1 for name in names if name not in known)
+    print(f"{label:<26}{len(goals) / elapsed:>12,.0f}{complete / len(goals):>12.0%}{wasted:>14,}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--goals", type=int, default=5000)
+    args = parser.parse_args()
+
+    entries = load_entries()
+    started = time.perf_counter()
+    gazetteer = Gazetteer(entries)
+    build_ms = (time.perf_counter() - started) * 1000
+    cities = [city for city, _ in entries]
+    goals = make_goals(args.goals, cities)
+    known = {city.name for city in cities}
+
+    print(f"📍 Destination extraction — {args.goals:,} goals, {len(cities)} cities, "
+          f"{len(gazetteer._patterns)} spellings (automaton built in {build_ms:.1f} ms)")
+    print(f"{'extractor':<26}{'goals/s':>12}{'all found':>12}{'wasted calls':>14}")
+    run("old in/to regex", old_extractor, goals, known)
+    run("regex per spelling", per_spelling_extractor(entries), goals, known)
+    run("Aho-Corasick gazetteer", gazetteer.find, goals, known)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_planner_overhead.py
+"""Per-request framework overhead of the planner, with model latency taken out.
+
+Usage: python -m benchmarks.bench_planner_overhead [--requests 30] [--output structured|text]
+
+A stub LLM answers instantly with a fixed plan and enrichment is disabled. What remains is the
+crewai cost of each request: building (or reusing) the Agent/Task/Crew, kickoff, event
+dispatch, console logging and parsing. Compares a fresh crew per request against the reused
+per-thread templates, each with verbose logging on and off.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("TOOL_CACHE_PERSIST", "0")
+
+from crewai.llms.base_llm import BaseLLM
+
+STUB_PLAN = {"days": [
+    {"day": day, "title": f"Day {day} theme", "tasks": [
+        {"time": f"{hour:02d}:00", "activity": f"Activity {hour} of day {day}"} for hour in range(9, 15)
+    ]} for day in range(1, 4)
+]}
+STUB_TEXT = "\n".join(
+    f"Day {day['day']}: {day['title']}\n" + "\n".join(
+        f"{i}. {task['time']} - {task['activity']}" for i, task in enumerate(day["tasks"], 1)
+    ) for day in STUB_PLAN["days"]
+)
+
+class StubLLM(BaseLLM):
+    """Answers every call instantly with the same plan"""
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        if response_model is not None:
+            return response_model.model_validate(STUB_PLAN)
+        return STUB_TEXT
+
+def measure(planner, goals, reuse: bool, structured: bool) -> list:
+    """Seconds per request for build-or-reuse + kickoff + parse"""
+    timings = []
+    for goal in goals:
+        started = time.perf_counter()
+        crew = planner._get_crew(structured=structured) if reuse else planner._build_crew(structured=structured)
+        result = crew.kickoff(inputs={"goal": goal})
+        if structured and result.pydantic is not None:
+            planner._structured_result(result.pydantic, goal)
+        else:
+            planner._parse_result(str(result.raw), goal)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--output", choices=("structured", "text"), default="structured")
+    args = parser.parse_args()
+
+    from agents.planner_agent import TaskPlannerAgent
+
+    structured = args.output == "structured"
+    goals = [f"Plan a 3-day trip to city number {i}" for i in range(args.requests)]
+    results = []
+    for label, reuse, verbose in (
+        ("fresh crew, verbose", False, True),
+        ("fresh crew, quiet", False, False),
+        ("reused crew, verbose", True, True),
+        ("reused crew, quiet", True, False)
+    ):
+        planner = TaskPlannerAgent(verbose=verbose)
+        planner.llm = StubLLM(model="stub")
+        planner._enrich = lambda goal: {}
+        measure(planner, goals[:2], reuse, structured)  # warm-up: imports, first template build
+
+        # Send console logging to /dev/null so terminal speed doesn't skew the numbers
+        sys.stdout.flush()
+        saved_stdout = os.dup(1)
+        with open(os.devnull, "w") as devnull:
+            os.dup2(devnull.fileno(), 1)
+            try:
+                timings = measure(planner, goals, reuse, structured)
+            finally:
+                sys.stdout.flush()
+                os.dup2(saved_stdout, 1)
+                os.close(saved_stdout)
+        results.append((label, timings))
+
+    print(f"Planner overhead per request ({args.requests} requests, {args.output} output, stub LLM)")
+    print(f"{'mode':<24} {'mean (ms)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    print("-" * 58)
+    for label, timings in results:
+        ordered = sorted(timings)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        print(f"{label:<24} {statistics.mean(timings) * 1000:10.1f} {statistics.median(timings) * 1000:10.1f} {p95 * 1000:10.1f}")
+
+if __name__ == "__main__":
+    main()
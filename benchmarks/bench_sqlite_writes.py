@@ -0,0 +1,116 @@
+# benchmarks/bench_sqlite_writes.py
+"""Plan write throughput with N concurrent writers, default vs production storage mode.
+
+Usage: python -m benchmarks.bench_sqlite_writes [--writers 1 4 16] [--plans 50] [--readers 2]
+
+Each (mode, writers) cell runs in a fresh subprocess because the engine is configured at import time.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SAMPLE_PLAN = {
+    "goal": "Plan a 3-day trip to Paris focusing on art museums and local cuisine",
+    "steps": [{"day": f"Day {day}", "tasks": [f"Activity {task} of day {day}" for task in range(1, 7)]} for day in range(1, 4)],
+    "enriched_info": {
+        "weather_considerations": "18°C, Clear Sky, Humidity: 60%",
+        "recommendations": "Title: Louvre\nSnippet: The world's most visited museum.\n" * 5,
+        "budget_tips": "Title: Paris on a budget\nSnippet: Use the Navigo weekly pass.\n" * 5
+    }
+}
+
+def run_cell(writers: int, plans_per_writer: int, readers: int) -> dict:
+    """Runs inside the subprocess: hammer save_plan_to_db from `writers` threads while `readers` page history"""
+    from database.database import create_tables
+    from database.crud import save_plan_to_db, list_plans_page
+
+    create_tables()
+    errors = []
+    latencies = []
+    stop_reading = threading.Event()
+
+    def writer():
+        for _ in range(plans_per_writer):
+            started = time.perf_counter()
+            try:
+                save_plan_to_db(SAMPLE_PLAN)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(type(e).__name__ + ": " + str(e).splitlines()[0])
+
+    def reader():
+        while not stop_reading.is_set():
+            try:
+                list_plans_page("Newest")
+            except Exception as e:
+                errors.append(type(e).__name__ + ": " + str(e).splitlines()[0])
+
+    reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+    writer_threads = [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in reader_threads:
+        thread.start()
+    started = time.perf_counter()
+    for thread in writer_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop_reading.set()
+    for thread in reader_threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "saved": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "plans_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else None
+    }
+
+def spawn_cell(mode: str, writers: int, plans_per_writer: int, readers: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            "STORAGE_MODE": mode,
+            "DB_BUSY_TIMEOUT_MS": env.get("DB_BUSY_TIMEOUT_MS", "5000")
+        })
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_sqlite_writes", "--cell", str(writers), str(plans_per_writer), str(readers)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--plans", type=int, default=50, help="plans saved by each writer")
+    parser.add_argument("--readers", type=int, default=2, help="concurrent history readers")
+    parser.add_argument("--modes", nargs="+", default=["default", "production"])
+    parser.add_argument("--cell", type=int, nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cell:
+        print(json.dumps(run_cell(*args.cell)))
+        return
+
+    print(f"📊 SQLite write benchmark — {args.plans} plans per writer, {args.readers} readers")
+    print(f"{'mode':<12}{'writers':>8}{'saved':>8}{'errors':>8}{'plans/s':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for mode in args.modes:
+        for writers in args.writers:
+            result = spawn_cell(mode, writers, args.plans, args.readers)
+            p50 = f"{result['p50_ms']:.1f}" if result['p50_ms'] is not None else "-"
+            p99 = f"{result['p99_ms']:.1f}" if result['p99_ms'] is not None else "-"
+            print(f"{mode:<12}{writers:>8}{result['saved']:>8}{result['errors']:>8}{result['plans_per_sec']:>10.1f}{p50:>9}{p99:>9}")
+            if result["first_error"]:
+                print(f"    ❌ {result['first_error']}")
+
+if __name__ == "__main__":
+    main()
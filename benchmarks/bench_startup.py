@@ -0,0 +1,104 @@
+# benchmarks/bench_startup.py
+"""Cold-start cost of the Streamlit app, and proof that browsing history never imports crewai.
+
+Usage: python -m benchmarks.bench_startup [--reruns 5]
+
+Each measurement runs in a fresh subprocess against a temporary copy of task_planner.db, so
+module caches are cold and the tracked database is never migrated in place. Exits non-zero if
+rendering the history page pulls crewai into the process.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "streamlit_app.py")
+
+def run_import(module: str) -> dict:
+    """Runs inside the subprocess: time a bare import"""
+    started = time.perf_counter()
+    __import__(module)
+    return {"seconds": time.perf_counter() - started, "crewai_loaded": "crewai" in sys.modules}
+
+def run_app(page: str, reruns: int) -> dict:
+    """Runs inside the subprocess: render the app, switch to `page`, then rerun it a few times"""
+    from streamlit.testing.v1 import AppTest
+
+    started = time.perf_counter()
+    app = AppTest.from_file(APP, default_timeout=120).run()
+    first_render = time.perf_counter() - started
+
+    started = time.perf_counter()
+    app.selectbox(key="page_selector").select(page).run()
+    page_render = time.perf_counter() - started
+
+    rerun_times = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app.run()
+        rerun_times.append(time.perf_counter() - started)
+
+    return {
+        "seconds": first_render,
+        "page_seconds": page_render,
+        "rerun_seconds": sum(rerun_times) / len(rerun_times) if rerun_times else 0.0,
+        "errors": [str(e.value) for e in app.exception],
+        "crewai_loaded": "crewai" in sys.modules
+    }
+
+def spawn(args, database_url: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url, TOOL_CACHE_PERSIST="0")
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", *args],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--cell", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cell:
+        kind, target = args.cell
+        result = run_import(target) if kind == "import" else run_app(target, args.reruns)
+        print(json.dumps(result))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "task_planner.db")
+        shutil.copy(os.path.join(ROOT, "task_planner.db"), db_path)
+        database_url = f"sqlite:///{db_path}"
+
+        print(f"{'measurement':<32} {'cold (s)':>9} {'page (s)':>9} {'rerun (s)':>10}  crewai")
+        print("-" * 72)
+        history_loaded_crewai = False
+        for label, cell in (
+            ("import database.crud", ["import", "database.crud"]),
+            ("import agents.planner_agent", ["import", "agents.planner_agent"]),
+            ("app: View Plans History", ["app", "View Plans History"]),
+            ("app: Create New Plan", ["app", "Create New Plan"])
+        ):
+            result = spawn(["--cell", *cell, "--reruns", str(args.reruns)], database_url)
+            if result.get("errors"):
+                print(f"{label}: app raised {result['errors']}")
+                sys.exit(1)
+            page = f"{result['page_seconds']:9.3f}" if "page_seconds" in result else f"{'':>9}"
+            rerun = f"{result['rerun_seconds']:10.3f}" if "rerun_seconds" in result else f"{'':>10}"
+            print(f"{label:<32} {result['seconds']:9.3f} {page} {rerun}  {'yes' if result['crewai_loaded'] else 'no'}")
+            if cell == ["app", "View Plans History"]:
+                history_loaded_crewai = result["crewai_loaded"]
+
+    if history_loaded_crewai:
+        print("\n❌ Rendering the history page imported crewai")
+        sys.exit(1)
+    print("\n✅ History page rendered without importing crewai")
+
+if __name__ == "__main__":
+    main()
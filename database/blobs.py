@@ -0,0 +1,49 @@
+# database/blobs.py
+import os
+import zlib
+import hashlib
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is always available
+    zstandard = None
+
+# Codec for new blobs; existing blobs keep the codec they were written with
+BLOB_CODEC = os.getenv("BLOB_CODEC", "zstd" if zstandard else "zlib").lower()
+# Short strings ("Weather unavailable") grow when compressed, so they are stored as-is
+BLOB_MIN_COMPRESS_BYTES = int(os.getenv("BLOB_MIN_COMPRESS_BYTES", "64"))
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+def blob_hash(data: bytes) -> str:
+    """Content address of a blob: sha256 of the uncompressed bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+def compress(data: bytes, codec: str = None):
+    """Returns (codec, payload); falls back to zlib when zstandard is not installed"""
+    codec = codec or BLOB_CODEC
+    if len(data) < BLOB_MIN_COMPRESS_BYTES:
+        return "raw", data
+    if codec == "zstd" and zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, ZLIB_LEVEL)
+
+def decompress(codec: str, payload: bytes) -> bytes:
+    if codec == "raw":
+        return payload
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This blob is zstd-compressed; install the 'zstandard' package to read it")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"Unknown blob codec '{codec}'")
+
+def encode_text(text: str):
+    """(hash, codec, raw size, payload) for storing `text` as a blob"""
+    data = text.encode("utf-8")
+    codec, payload = compress(data)
+    return blob_hash(data), codec, len(data), payload
+
+def decode_text(codec: str, payload: bytes) -> str:
+    return decompress(codec, payload).decode("utf-8")
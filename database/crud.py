@@ -0,0 +1,242 @@
+# database/crud.py
+import os
+import json
+import threading
+from sqlalchemy import func, tuple_, select
+from sqlalchemy.orm import undefer
+from .database import SessionLocal, PRODUCTION_STORAGE
+from .write_batcher import plan_write_batcher
+from .models import TaskPlan, PlanDay, PlanTask, plan_document_options, plan_blob_hashes, prune_orphan_blobs, steps_text
+from agents.plan_cache import canonical_goal
+from agents import metrics
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+
+# Sort option -> (keyset column, descending); each pairs with an index on (column, id)
+SORT_KEYS = {
+    "Newest": (TaskPlan.created_at, True),
+    "Oldest": (TaskPlan.created_at, False),
+    "Goal A-Z": (TaskPlan.goal, False),
+    "Goal Z-A": (TaskPlan.goal, True)
+}
+
+# Only what the history list shows; plan documents and their blobs stay on disk
+DAY_COUNT = select(func.count(PlanDay.id)).where(PlanDay.plan_id == TaskPlan.id).correlate(TaskPlan).scalar_subquery()
+TASK_COUNT = (
+    select(func.count(PlanTask.id))
+    .join(PlanDay, PlanTask.day_id == PlanDay.id)
+    .where(PlanDay.plan_id == TaskPlan.id)
+    .correlate(TaskPlan)
+    .scalar_subquery()
+)
+LIST_COLUMNS = (
+    TaskPlan.id, TaskPlan.goal, TaskPlan.status, TaskPlan.created_at,
+    DAY_COUNT.label("day_count"), TASK_COUNT.label("task_count")
+)
+
+# Bumped after every committed write so callers can cache reads until the data actually changes
+_data_version = 0
+_data_version_lock = threading.Lock()
+
+def data_version():
+    """Counter of plan writes made by this process"""
+    return _data_version
+
+def _bump_data_version():
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+
+def load_plans_from_db():
+    db = SessionLocal()
+    try:
+        return db.query(TaskPlan).order_by(TaskPlan.created_at.desc()).all()
+    finally:
+        db.close()
+
+def list_plans_page(sort_by="Newest", cursor=None, page_size=HISTORY_PAGE_SIZE):
+    """Keyset-paginated plan summaries.
+
+    Returns (rows, next_cursor); pass next_cursor back in to fetch the following page.
+    next_cursor is None on the last page.
+    """
+    column, descending = SORT_KEYS[sort_by]
+    db = SessionLocal()
+    try:
+        query = db.query(*LIST_COLUMNS)
+        if cursor is not None:
+            keyset = tuple_(column, TaskPlan.id)
+            query = query.filter(keyset < tuple_(*cursor) if descending else keyset > tuple_(*cursor))
+        if descending:
+            query = query.order_by(column.desc(), TaskPlan.id.desc())
+        else:
+            query = query.order_by(column.asc(), TaskPlan.id.asc())
+
+        rows = [row._asdict() for row in query.limit(page_size + 1).all()]
+    finally:
+        db.close()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = (last["created_at"] if column is TaskPlan.created_at else last["goal"], last["id"])
+    return rows, next_cursor
+
+def count_plans():
+    """Cheap total for the history header and sidebar"""
+    db = SessionLocal()
+    try:
+        return db.query(func.count(TaskPlan.id)).scalar()
+    finally:
+        db.close()
+
+def latest_plan_summary():
+    rows, _ = list_plans_page("Newest", page_size=1)
+    return rows[0] if rows else None
+
+def task_stats():
+    """Task totals aggregated in SQL from plan_tasks, without decoding any plan JSON"""
+    db = SessionLocal()
+    try:
+        plans, tasks = db.query(func.count(func.distinct(PlanDay.plan_id)), func.count(PlanTask.id)).select_from(PlanTask).join(PlanDay).one()
+        return {"tasks": tasks, "avg_tasks_per_plan": tasks / plans if plans else 0.0}
+    finally:
+        db.close()
+
+def get_plan_days(plan_id):
+    """Day labels and task counts for one plan"""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(PlanDay.label, func.count(PlanTask.id))
+            .outerjoin(PlanTask, PlanTask.day_id == PlanDay.id)
+            .filter(PlanDay.plan_id == plan_id)
+            .group_by(PlanDay.id)
+            .order_by(PlanDay.position)
+            .all()
+        )
+        return [{"day": label, "task_count": count} for label, count in rows]
+    finally:
+        db.close()
+
+def get_plan_day(plan_id, day_label):
+    """Tasks for a single day of a plan, loaded without touching the plan blobs"""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(PlanTask.description)
+            .join(PlanDay, PlanTask.day_id == PlanDay.id)
+            .filter(PlanDay.plan_id == plan_id, PlanDay.label == day_label[:100])
+            .order_by(PlanTask.position)
+            .all()
+        )
+        return {"day": day_label, "tasks": [description for description, in rows]}
+    finally:
+        db.close()
+
+def get_plan(plan_id):
+    """Load one plan as a display dict, or None if it no longer exists"""
+    db = SessionLocal()
+    try:
+        plan = (
+            db.query(TaskPlan)
+            .options(*plan_document_options())
+            .filter(TaskPlan.id == plan_id)
+            .first()
+        )
+        return plan.to_plan_dict() if plan else None
+    finally:
+        db.close()
+
+def _new_task_plan(plan_data):
+    new_plan = TaskPlan(goal=plan_data['goal'], goal_key=canonical_goal(plan_data['goal']), status='completed')
+    new_plan.set_plan_steps_list(plan_data['steps'])
+    new_plan.set_enriched_info_dict(plan_data['enriched_info'])
+    new_plan.set_full_result(plan_data.get('full_result'))
+    return new_plan
+
+def save_plan_to_db(plan_data):
+    with metrics.span("db.save_plan"):
+        return _save_plan(plan_data)
+
+def _save_plan(plan_data):
+    if PRODUCTION_STORAGE:
+        # Concurrent saves are grouped into one transaction by the write-behind batcher
+        plan_id = plan_write_batcher.submit(lambda: _new_task_plan(plan_data)).result()
+        _bump_data_version()
+        return plan_id
+
+    db = SessionLocal()
+    try:
+        new_plan = _new_task_plan(plan_data)
+        db.add(new_plan)
+        db.commit()
+        _bump_data_version()
+        return new_plan.id
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def save_plans_bulk(plans_data):
+    """Insert many plans in a single transaction; returns their ids in order"""
+    db = SessionLocal()
+    try:
+        new_plans = [_new_task_plan(plan_data) for plan_data in plans_data]
+        db.add_all(new_plans)
+        db.flush()
+        plan_ids = [new_plan.id for new_plan in new_plans]
+        db.commit()
+        _bump_data_version()
+        return plan_ids
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def replace_plan_day(plan_id, day_label, tasks):
+    """Swap one day's tasks in the stored steps, plan_tasks and full output, leaving other days and enrichment untouched"""
+    db = SessionLocal()
+    try:
+        plan = db.query(TaskPlan).options(undefer(TaskPlan.plan_steps)).filter(TaskPlan.id == plan_id).first()
+        if plan is None:
+            raise ValueError(f"Plan {plan_id} not found")
+        steps = plan.get_plan_steps_list()
+        for step in steps:
+            if isinstance(step, dict) and step.get("day") == day_label:
+                step["tasks"] = list(tasks)
+                break
+        else:
+            raise ValueError(f"Plan {plan_id} has no day '{day_label}'")
+        old_body = plan.body_hash
+        plan.plan_steps = json.dumps(steps)
+        # The stored output describes the old day, so it is replaced by text written from the new steps
+        plan.set_full_result(steps_text(steps))
+
+        day = db.query(PlanDay).filter(PlanDay.plan_id == plan_id, PlanDay.label == day_label[:100]).first()
+        if day is not None:
+            day.tasks = [PlanTask(position=position, description=str(task)) for position, task in enumerate(tasks)]
+        db.flush()
+        prune_orphan_blobs(db, {old_body} - {None})
+        db.commit()
+        _bump_data_version()
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def delete_plan(plan_id):
+    """Delete a plan with its days and enrichment, and the blobs no other plan shares"""
+    db = SessionLocal()
+    try:
+        hashes = plan_blob_hashes(db, plan_id)
+        db.query(TaskPlan).filter(TaskPlan.id == plan_id).delete()
+        prune_orphan_blobs(db, hashes)
+        db.commit()
+        _bump_data_version()
+    finally:
+        db.close()
@@ -1,17 +1,138 @@
 # database/database.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from .models import Base
+from sqlalchemy import create_engine, inspect, text, event
+from sqlalchemy.orm import sessionmaker, undefer
+from .models import Base, TaskPlan, build_plan_days, prune_orphan_blobs
 import os
 
-DATABASE_URL = "sqlite:///task_planner.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///task_planner.db")
 
-engine = create_engine(DATABASE_URL)
+# "production" switches SQLite to WAL with tuned pragmas, a sized pool and batched plan writes
+STORAGE_MODE = os.getenv("STORAGE_MODE", "default").lower()
+PRODUCTION_STORAGE = STORAGE_MODE == "production"
+
+# Enough connections for every plan worker plus the Streamlit script threads
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(int(os.getenv("PLAN_WORKERS", "2")) + 4)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+SQLITE_PRODUCTION_PRAGMAS = {
+    "journal_mode": "WAL",                                      # readers never block the writer
+    "synchronous": "NORMAL",                                    # fsync at checkpoints only; safe with WAL
+    "busy_timeout": DB_BUSY_TIMEOUT_MS,                         # wait for the write lock instead of "database is locked"
+    "cache_size": int(os.getenv("DB_CACHE_SIZE_KB", "-65536")), # negative = KiB, so 64 MiB of page cache
+    "mmap_size": int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+def _build_engine():
+    if not DATABASE_URL.startswith("sqlite") or not PRODUCTION_STORAGE:
+        return create_engine(DATABASE_URL)
+    return create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        connect_args={"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT_MS / 1000}
+    )
+
+engine = _build_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        """SQLite only honours ON DELETE CASCADE when foreign keys are switched on per connection"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        if PRODUCTION_STORAGE:
+            for pragma, value in SQLITE_PRODUCTION_PRAGMAS.items():
+                cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
 def create_tables():
     """Create all tables"""
     Base.metadata.create_all(bind=engine)
+    migrate_schema()
+
+    from .search import create_search_index
+    create_search_index()
+    backfill_plan_days()
+    prune_blobs()
+
+def migrate_schema():
+    """Add columns and indexes introduced after an existing database file was created"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+def backfill_plan_days(batch_size=200):
+    """Populate plan_days/plan_tasks for plans saved before the normalized tables existed"""
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            plans = (
+                db.query(TaskPlan)
+                .options(undefer(TaskPlan.plan_steps))
+                .filter(TaskPlan.id > last_id, ~TaskPlan.days.any())
+                .order_by(TaskPlan.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not plans:
+                break
+            for plan in plans:
+                plan.days = build_plan_days(plan.get_plan_steps_list())
+            db.commit()
+            last_id = plans[-1].id
+    finally:
+        db.close()
+
+def migrate_enrichment_to_blobs(batch_size=200):
+    """One-shot move of inline enriched_info JSON into the blob store; returns (plans, inline bytes freed)"""
+    db = SessionLocal()
+    migrated = freed = 0
+    try:
+        last_id = 0
+        while True:
+            plans = (
+                db.query(TaskPlan)
+                .options(undefer(TaskPlan.enriched_info))
+                .filter(TaskPlan.id > last_id, TaskPlan.enriched_info.isnot(None))
+                .order_by(TaskPlan.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not plans:
+                break
+            for plan in plans:
+                freed += len(plan.enriched_info.encode("utf-8"))
+                plan.set_enriched_info_dict(plan.get_enriched_info_dict())
+            db.commit()
+            migrated += len(plans)
+            last_id = plans[-1].id
+    finally:
+        db.close()
+    return migrated, freed
+
+def prune_blobs():
+    """Delete blobs no plan refers to any more (left behind by deleted or re-planned plans); returns the count"""
+    db = SessionLocal()
+    try:
+        pruned = prune_orphan_blobs(db)
+        db.commit()
+        return pruned
+    finally:
+        db.close()
 
 def get_db():
     """Get database session"""
@@ -0,0 +1,151 @@
+# database/export.py
+import os
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select
+from .database import SessionLocal
+from .blobs import decode_text
+from .models import TaskPlan, PlanBlob, PlanEnrichment, steps_to_days
+
+EXPORT_FORMATS = ("jsonl", "csv", "parquet")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+CSV_COLUMNS = ("id", "goal", "status", "created_at", "day_count", "task_count", "steps", "enriched_info")
+
+def _decode(value, default):
+    try:
+        return json.loads(value) if value else default
+    except (TypeError, ValueError):
+        return default
+
+def iter_plans(since=None, until=None, goal_contains=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield plans as plain dicts, oldest first, fetching `batch_size` rows at a time.
+
+    Rows are read with a server-side cursor and decoded one by one, so memory stays flat no
+    matter how many plans are stored. Enrichment in the blob store is fetched once per batch.
+    `since`/`until` bound created_at; `goal_contains` is a case-insensitive substring filter.
+    """
+    query = select(
+        TaskPlan.id, TaskPlan.goal, TaskPlan.status, TaskPlan.created_at, TaskPlan.plan_steps, TaskPlan.enriched_info
+    ).order_by(TaskPlan.id)
+    if since is not None:
+        query = query.where(TaskPlan.created_at >= since)
+    if until is not None:
+        query = query.where(TaskPlan.created_at < until)
+    if goal_contains:
+        query = query.where(TaskPlan.goal.ilike(f"%{goal_contains}%"))
+
+    db = SessionLocal()
+    try:
+        for rows in db.execute(query.execution_options(yield_per=batch_size)).partitions():
+            enrichment = _blob_enrichment(db, [row.id for row in rows])
+            for row in rows:
+                steps = _decode(row.plan_steps, [])
+                days = steps_to_days(steps)
+                yield {
+                    "id": row.id,
+                    "goal": row.goal,
+                    "status": row.status,
+                    "created_at": row.created_at.isoformat() if row.created_at else None,
+                    "day_count": len(days),
+                    "task_count": sum(len(tasks) for _, tasks in days),
+                    "steps": steps,
+                    "enriched_info": enrichment.get(row.id) or _decode(row.enriched_info, {})
+                }
+    finally:
+        db.close()
+
+def _blob_enrichment(db, plan_ids):
+    """{plan id: enrichment dict} for the given plans' blob-stored fields"""
+    rows = db.execute(
+        select(PlanEnrichment.plan_id, PlanEnrichment.field, PlanBlob.codec, PlanBlob.data)
+        .join(PlanBlob, PlanBlob.hash == PlanEnrichment.blob_hash)
+        .where(PlanEnrichment.plan_id.in_(plan_ids))
+        .order_by(PlanEnrichment.id)
+    )
+    enrichment = {}
+    for plan_id, field, codec, data in rows:
+        enrichment.setdefault(plan_id, {})[field] = _decode(decode_text(codec, data), None)
+    return enrichment
+
+def encode_jsonl(plans):
+    """One JSON object per line, as UTF-8 bytes"""
+    for plan in plans:
+        yield (json.dumps(plan, ensure_ascii=False) + "\n").encode("utf-8")
+
+def encode_csv(plans):
+    """CSV with a header row; steps and enrichment are embedded as JSON text"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for plan in plans:
+        writer.writerow([
+            json.dumps(plan[column], ensure_ascii=False) if column in ("steps", "enriched_info") else plan[column]
+            for column in CSV_COLUMNS
+        ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def write_parquet(plans, sink, batch_size=EXPORT_BATCH_SIZE):
+    """Write plans to `sink` (path or binary file) as Parquet, one row group per batch"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    day_type = pa.struct([("day", pa.string()), ("tasks", pa.list_(pa.string()))])
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("goal", pa.string()),
+        ("status", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("day_count", pa.int32()),
+        ("task_count", pa.int32()),
+        ("days", pa.list_(day_type)),
+        ("enriched_info", pa.string())
+    ])
+
+    def to_record(plan):
+        return {
+            **{column: plan[column] for column in ("id", "goal", "status", "day_count", "task_count")},
+            "created_at": datetime.fromisoformat(plan["created_at"]) if plan["created_at"] else None,
+            "days": [{"day": label, "tasks": tasks} for label, tasks in steps_to_days(plan["steps"])],
+            "enriched_info": json.dumps(plan["enriched_info"], ensure_ascii=False)
+        }
+
+    count = 0
+    batch = []
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for plan in plans:
+            batch.append(to_record(plan))
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch.clear()
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+def export_plans(sink, fmt="jsonl", **filters):
+    """Stream matching plans into a binary file-like `sink` (or path for Parquet); returns the row count"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+
+    count = 0
+    def counted(plans):
+        nonlocal count
+        for plan in plans:
+            count += 1
+            yield plan
+
+    plans = counted(iter_plans(**filters))
+    if fmt == "parquet":
+        return write_parquet(plans, sink)
+    encoder = encode_jsonl if fmt == "jsonl" else encode_csv
+    for chunk in encoder(plans):
+        sink.write(chunk)
+    return count
@@ -1,21 +1,35 @@
 # database/models.py
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, ForeignKey, Index, Float, LargeBinary, event, text, delete, exists
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker, relationship, deferred, undefer, joinedload, selectinload
 from datetime import datetime
 import json
+import itertools
+from .blobs import encode_text, decode_text
 
 Base = declarative_base()
 
 class TaskPlan(Base):
     __tablename__ = 'task_plans'
+    __table_args__ = (
+        # Keyset pagination indexes for the history list (see database.crud.list_plans_page)
+        Index('ix_task_plans_created_at_id', 'created_at', 'id'),
+        Index('ix_task_plans_goal_id', 'goal', 'id'),
+    )
     
     id = Column(Integer, primary_key=True)
     goal = Column(String(500), nullable=False)
-    plan_steps = Column(Text, nullable=False)  # JSON string
-    enriched_info = Column(Text)  # JSON string for external data
+    goal_key = Column(String(500), index=True)  # canonicalized goal used by the plan cache
+    # Whole-document blobs are deferred: list views never fetch or decode them
+    plan_steps = deferred(Column(Text, nullable=False))  # JSON string
+    enriched_info = deferred(Column(Text))  # JSON string; only rows saved before the blob store
+    body_hash = Column(String(64), ForeignKey('plan_blobs.hash'), index=True)  # raw planner output
     status = Column(String(50), default='completed')
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    days = relationship('PlanDay', back_populates='plan', order_by='PlanDay.position', cascade='all, delete-orphan', passive_deletes=True)
+    body = relationship('PlanBlob', viewonly=True)
+    enrichment = relationship('PlanEnrichment', order_by='PlanEnrichment.id', cascade='all, delete-orphan', passive_deletes=True)
     
     def get_plan_steps_list(self):
         """Convert JSON string back to list"""
@@ -25,16 +39,266 @@ class TaskPlan(Base):
             return []
     
     def set_plan_steps_list(self, steps_list):
-        """Convert list to JSON string"""
+        """Convert list to JSON string and mirror it into plan_days/plan_tasks"""
         self.plan_steps = json.dumps(steps_list)
+        self.days = build_plan_days(steps_list)
     
     def get_enriched_info_dict(self):
-        """Convert JSON string back to dict"""
+        """Enrichment fields decoded from their blobs, or from the inline JSON of older rows"""
         try:
+            if self.enrichment:
+                return {item.field: json.loads(item.blob.text) for item in self.enrichment}
             return json.loads(self.enriched_info) if self.enriched_info else {}
         except:
             return {}
     
     def set_enriched_info_dict(self, info_dict):
-        """Convert dict to JSON string"""
-        self.enriched_info = json.dumps(info_dict)
\ No newline at end of file
+        """Store every field as its own blob, so identical enrichment text is kept once across plans"""
+        self.enriched_info = None
+        self.enrichment = [PlanEnrichment.for_value(field, value) for field, value in (info_dict or {}).items()]
+        self.pending_search_text = info_dict
+
+    def set_full_result(self, text):
+        """Keep the raw planner output as a compressed blob"""
+        self.body_hash = _stage_blob(self, text) if text else None
+
+    def get_full_result(self):
+        """The stored planner output, else readable day-wise text rebuilt from the steps"""
+        if self.body is not None:
+            return self.body.text
+        return steps_text(self.get_plan_steps_list())
+
+    def to_plan_dict(self):
+        """Same shape as TaskPlannerAgent.create_plan output, for display"""
+        return {
+            "id": self.id,
+            "goal": self.goal,
+            "steps": self.get_plan_steps_list(),
+            "enriched_info": self.get_enriched_info_dict(),
+            "full_result": self.get_full_result(),
+            "status": self.status,
+            "created_at": self.created_at
+        }
+
+class PlanBlob(Base):
+    """Compressed text stored once per distinct content (see database.blobs)"""
+    __tablename__ = 'plan_blobs'
+
+    hash = Column(String(64), primary_key=True)  # sha256 of the uncompressed bytes
+    codec = Column(String(10), nullable=False)  # raw / zlib / zstd
+    size = Column(Integer, nullable=False)  # uncompressed bytes
+    data = Column(LargeBinary, nullable=False)
+
+    @property
+    def text(self):
+        return decode_text(self.codec, self.data)
+
+class PlanEnrichment(Base):
+    """One enrichment field of a plan, pointing at the blob holding its JSON-encoded value"""
+    __tablename__ = 'plan_enrichment'
+
+    id = Column(Integer, primary_key=True)
+    plan_id = Column(Integer, ForeignKey('task_plans.id', ondelete='CASCADE'), nullable=False, index=True)
+    field = Column(String(100), nullable=False)
+    blob_hash = Column(String(64), ForeignKey('plan_blobs.hash'), nullable=False, index=True)
+
+    blob = relationship('PlanBlob', viewonly=True)
+
+    @classmethod
+    def for_value(cls, field, value):
+        item = cls(field=str(field)[:100])
+        item.blob_hash = _stage_blob(item, json.dumps(value))
+        return item
+
+class PlanJob(Base):
+    __tablename__ = 'plan_jobs'
+
+    id = Column(Integer, primary_key=True)
+    goal = Column(String(500), nullable=False)
+    status = Column(String(20), default='queued', index=True)  # queued / running / done / failed / cancelled
+    plan_id = Column(Integer, ForeignKey('task_plans.id', ondelete='SET NULL'))
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    owner = Column(String(100))  # "host:pid" of the app process running the job
+    heartbeat_at = Column(DateTime)  # refreshed by the owner while the job is queued or running
+
+class PlanDay(Base):
+    __tablename__ = 'plan_days'
+    __table_args__ = (
+        Index('ix_plan_days_plan_position', 'plan_id', 'position'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    plan_id = Column(Integer, ForeignKey('task_plans.id', ondelete='CASCADE'), nullable=False)
+    position = Column(Integer, nullable=False)
+    label = Column(String(100), nullable=False)
+
+    plan = relationship('TaskPlan', back_populates='days')
+    tasks = relationship('PlanTask', back_populates='day', order_by='PlanTask.position', cascade='all, delete-orphan', passive_deletes=True)
+
+class PlanTask(Base):
+    __tablename__ = 'plan_tasks'
+    __table_args__ = (
+        Index('ix_plan_tasks_day_position', 'day_id', 'position'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    day_id = Column(Integer, ForeignKey('plan_days.id', ondelete='CASCADE'), nullable=False)
+    position = Column(Integer, nullable=False)
+    description = Column(Text, nullable=False)
+
+    day = relationship('PlanDay', back_populates='tasks')
+
+class PerfSpan(Base):
+    """One timed stage of a plan request (see agents.metrics)"""
+    __tablename__ = 'perf_spans'
+    __table_args__ = (
+        Index('ix_perf_spans_stage_created_at', 'stage', 'created_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    trace_id = Column(String(32), index=True)
+    stage = Column(String(64), nullable=False)
+    duration_ms = Column(Float, nullable=False)
+    status = Column(String(10), default='ok')  # ok / error / cancelled
+    cache = Column(String(10))  # hit / miss for cached lookups
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class LLMUsage(Base):
+    """Token counts and estimated cost of one LLM call"""
+    __tablename__ = 'llm_usage'
+
+    id = Column(Integer, primary_key=True)
+    trace_id = Column(String(32), index=True)
+    model = Column(String(100))
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    cost_usd = Column(Float, default=0.0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+def steps_to_days(steps_list):
+    """Group any stored step format into (day label, [task text]) pairs"""
+    days = []
+    loose_tasks = []
+    for step in steps_list or []:
+        if isinstance(step, dict) and "day" in step:
+            days.append((str(step["day"]), [str(task) for task in step.get("tasks", [])]))
+        elif isinstance(step, dict):
+            # Older rows stored flat {"step", "description", ...} entries
+            loose_tasks.append(str(step.get("description", step)))
+        else:
+            loose_tasks.append(str(step))
+    if loose_tasks:
+        days.append(("Steps", loose_tasks))
+    return days
+
+def steps_text(steps_list):
+    """Readable day-wise text for a steps list, in the planner's output layout"""
+    lines = []
+    for number, step in enumerate(steps_list or [], 1):
+        if isinstance(step, dict) and "day" in step:
+            lines.append(step["day"])
+            lines.extend(f"{i}. {task}" for i, task in enumerate(step.get("tasks", []), 1))
+            lines.append("")
+        elif isinstance(step, dict):
+            # Older rows stored flat {"step", "description", ...} entries
+            lines.append(f"{number}. {step.get('description', str(step))}")
+        else:
+            lines.append(str(step))
+    return "\n".join(lines).strip()
+
+def build_plan_days(steps_list):
+    """PlanDay/PlanTask rows for a steps list; keys are filled in through the relationships"""
+    plan_days = []
+    for position, (label, tasks) in enumerate(steps_to_days(steps_list)):
+        day = PlanDay(position=position, label=label[:100])
+        day.tasks = [PlanTask(position=i, description=task) for i, task in enumerate(tasks)]
+        plan_days.append(day)
+    return plan_days
+
+def plan_document_options():
+    """Loader options fetching everything TaskPlan.to_plan_dict decodes, in a fixed number of queries"""
+    return (
+        undefer(TaskPlan.plan_steps),
+        undefer(TaskPlan.enriched_info),
+        joinedload(TaskPlan.body),
+        selectinload(TaskPlan.enrichment).joinedload(PlanEnrichment.blob)
+    )
+
+def _stage_blob(row, text):
+    """Compress `text` for insertion when `row` is flushed; returns its content hash"""
+    blob_hash, codec, size, payload = encode_text(text)
+    row.pending_blob = {"hash": blob_hash, "codec": codec, "size": size, "data": payload}
+    return blob_hash
+
+@event.listens_for(Session, "before_flush")
+def _insert_pending_blobs(session, flush_context, instances):
+    """Write the blobs new or changed rows point at, in the same transaction, with one statement per flush.
+
+    Content that is already stored is skipped, so identical text is kept once.
+    """
+    blobs = {}
+    for row in itertools.chain(session.new, session.dirty):
+        values = vars(row).pop("pending_blob", None)
+        if values is not None:
+            blobs[values["hash"]] = values
+    if not blobs:
+        return
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    connection.execute(insert(PlanBlob).on_conflict_do_nothing(index_elements=["hash"]), list(blobs.values()))
+
+def plan_blob_hashes(session, plan_id):
+    """Hashes of the blobs one plan points at, for pruning once it is deleted or rewritten"""
+    hashes = {blob_hash for blob_hash, in session.query(PlanEnrichment.blob_hash).filter(PlanEnrichment.plan_id == plan_id)}
+    hashes.update(blob_hash for blob_hash, in session.query(TaskPlan.body_hash).filter(TaskPlan.id == plan_id, TaskPlan.body_hash.isnot(None)))
+    return hashes
+
+def prune_orphan_blobs(session, hashes=None):
+    """Delete blobs no plan body or enrichment field points at any more, among `hashes` or all of them.
+
+    Call after the referencing rows are flushed; returns the number of blobs removed.
+    """
+    query = delete(PlanBlob).where(
+        ~exists().where(TaskPlan.body_hash == PlanBlob.hash),
+        ~exists().where(PlanEnrichment.blob_hash == PlanBlob.hash)
+    )
+    if hashes is not None:
+        if not hashes:
+            return 0
+        query = query.where(PlanBlob.hash.in_(hashes))
+    return session.execute(query.execution_options(synchronize_session=False)).rowcount
+
+def search_text(value) -> str:
+    """Text leaves of a JSON-like value, joined like the SQL flattening in database.search"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (list, tuple)):
+        return ""
+    return " ".join(filter(None, (search_text(item) for item in value)))
+
+@event.listens_for(TaskPlan, "after_insert")
+@event.listens_for(TaskPlan, "after_update")
+def _index_enrichment(mapper, connection, target):
+    """Index enrichment saved to the blob store, which the FTS triggers can't read.
+
+    Registered here rather than in create_search_index, so processes that save plans without
+    calling create_tables() index it too.
+    """
+    info = vars(target).pop("pending_search_text", None)
+    if not info or connection.dialect.name != "sqlite":
+        return
+    if connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_plans_fts'").first() is None:
+        return  # a database the search index was never created in
+    connection.execute(
+        text("UPDATE task_plans_fts SET enrichment = :enrichment WHERE rowid = :id"),
+        {"enrichment": search_text(info), "id": target.id}
+    )
+
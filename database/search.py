@@ -0,0 +1,98 @@
+# database/search.py
+import re
+from sqlalchemy import text, DateTime
+from .database import engine, SessionLocal
+from .crud import HISTORY_PAGE_SIZE
+
+# Flatten a JSON column to its text leaves so day/task and enrichment strings are indexed without JSON syntax
+def _flatten(column):
+    return (
+        f"CASE WHEN json_valid({column}) "
+        f"THEN (SELECT group_concat(value, ' ') FROM json_tree({column}) WHERE type = 'text') "
+        f"ELSE {column} END"
+    )
+
+_INDEX_ROW = f"{{alias}}.id, {{alias}}.goal, {_flatten('{alias}.plan_steps')}, {_flatten('{alias}.enriched_info')}"
+
+FTS_STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS task_plans_fts USING fts5(goal, content, enrichment, tokenize = 'porter unicode61')",
+    f"""CREATE TRIGGER IF NOT EXISTS task_plans_fts_insert AFTER INSERT ON task_plans BEGIN
+        INSERT INTO task_plans_fts (rowid, goal, content, enrichment) VALUES ({_INDEX_ROW.format(alias='new')});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_plans_fts_delete AFTER DELETE ON task_plans BEGIN
+        DELETE FROM task_plans_fts WHERE rowid = old.id;
+    END""",
+    # Enrichment kept in the blob store leaves enriched_info NULL; the indexed text is then left as it was
+    "DROP TRIGGER IF EXISTS task_plans_fts_update",
+    f"""CREATE TRIGGER task_plans_fts_update AFTER UPDATE OF goal, plan_steps, enriched_info ON task_plans BEGIN
+        UPDATE task_plans_fts SET goal = new.goal, content = {_flatten('new.plan_steps')},
+            enrichment = COALESCE({_flatten('new.enriched_info')}, enrichment)
+        WHERE rowid = old.id;
+    END""",
+]
+
+# Column weights for bm25: goal matches count most, enrichment text least
+BM25_WEIGHTS = (10.0, 4.0, 1.0)
+
+def create_search_index():
+    """Create the FTS5 table and its sync triggers, indexing rows saved before the index existed"""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        for statement in FTS_STATEMENTS:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql(
+            f"INSERT INTO task_plans_fts (rowid, goal, content, enrichment) "
+            f"SELECT {_INDEX_ROW.format(alias='p')} FROM task_plans p "
+            f"WHERE p.id NOT IN (SELECT rowid FROM task_plans_fts)"
+        )
+
+def to_match_query(search: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match, as a prefix"""
+    return " ".join(f'"{word}"*' for word in re.findall(r'\w+', search))
+
+def search_plans(search: str, cursor=None, page_size: int = HISTORY_PAGE_SIZE):
+    """Ranked full-text search over goals, plan content and enrichment.
+
+    Returns (rows, next_cursor) like crud.list_plans_page; each row carries a highlighted snippet.
+    """
+    match = to_match_query(search)
+    if not match:
+        return [], None
+    offset = cursor or 0
+    db = SessionLocal()
+    try:
+        rows = db.execute(text(
+            "SELECT p.id, p.goal, p.status, p.created_at, "
+            "snippet(task_plans_fts, -1, '**', '**', '…', 16) AS snippet, "
+            "bm25(task_plans_fts, :goal_weight, :content_weight, :enrichment_weight) AS rank "
+            "FROM task_plans_fts JOIN task_plans p ON p.id = task_plans_fts.rowid "
+            "WHERE task_plans_fts MATCH :match "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ).columns(created_at=DateTime), {
+            "match": match,
+            "goal_weight": BM25_WEIGHTS[0],
+            "content_weight": BM25_WEIGHTS[1],
+            "enrichment_weight": BM25_WEIGHTS[2],
+            "limit": page_size + 1,
+            "offset": offset
+        }).mappings().all()
+    finally:
+        db.close()
+
+    rows = [dict(row) for row in rows]
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = offset + page_size
+    return rows, next_cursor
+
+def count_search_results(search: str) -> int:
+    match = to_match_query(search)
+    if not match:
+        return 0
+    db = SessionLocal()
+    try:
+        return db.execute(text("SELECT count(*) FROM task_plans_fts WHERE task_plans_fts MATCH :match"), {"match": match}).scalar()
+    finally:
+        db.close()
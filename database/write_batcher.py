@@ -0,0 +1,99 @@
+# database/write_batcher.py
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from .database import SessionLocal
+
+# Group commit: each flush takes everything queued (up to the batch size). Inserts that arrive
+# while a flush is running form the next batch, so a lone writer never waits. A non-zero delay
+# additionally lingers for stragglers before flushing.
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "64"))
+WRITE_BATCH_DELAY_MS = float(os.getenv("WRITE_BATCH_DELAY_MS", "0"))
+
+class WriteBehindBatcher:
+    """Groups inserts from many threads into one transaction per flush on a single writer thread"""
+
+    def __init__(self, batch_size: int = WRITE_BATCH_SIZE, max_delay_ms: float = WRITE_BATCH_DELAY_MS, after_flush=None):
+        self.batch_size = batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.after_flush = after_flush  # called on the writer thread after each batch, e.g. for retention
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+
+    def submit(self, build_row) -> Future:
+        """Queue a callable returning a new ORM object; the future resolves to its primary key"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((build_row, future))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="write-behind", daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._flush(batch)
+            if self.after_flush is not None:
+                try:
+                    self.after_flush()
+                except Exception:
+                    pass  # housekeeping must never stop the writer; it runs again after the next batch
+
+    def _flush(self, batch):
+        db = SessionLocal()
+        try:
+            rows = [build_row() for build_row, _ in batch]
+            db.add_all(rows)
+            db.flush()
+            ids = [row.id for row in rows]
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Retry one by one so a single bad row does not fail the whole batch
+            for build_row, future in batch:
+                self._flush_one(build_row, future)
+            return
+        finally:
+            db.close()
+
+        self.batches += 1
+        self.rows += len(ids)
+        for row_id, (_, future) in zip(ids, batch):
+            future.set_result(row_id)
+
+    def _flush_one(self, build_row, future):
+        db = SessionLocal()
+        try:
+            row = build_row()
+            db.add(row)
+            db.flush()
+            row_id = row.id
+            db.commit()
+            self.batches += 1
+            self.rows += 1
+            future.set_result(row_id)
+        except Exception as e:
+            db.rollback()
+            future.set_exception(e)
+        finally:
+            db.close()
+
+# Shared batcher for plan inserts in production storage mode
+plan_write_batcher = WriteBehindBatcher()
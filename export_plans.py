@@ -0,0 +1,46 @@
+# export_plans.py
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+FORMAT_BY_EXTENSION = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+
+def parse_date(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a date like 2025-01-31, got '{value}'")
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream saved plans to JSONL, CSV or Parquet")
+    parser.add_argument("output", help="output file, or - for stdout (JSONL/CSV only)")
+    parser.add_argument("--format", choices=("jsonl", "csv", "parquet"), help="default: from the file extension, else jsonl")
+    parser.add_argument("--since", type=parse_date, help="only plans created on or after this date")
+    parser.add_argument("--until", type=parse_date, help="only plans created before this date")
+    parser.add_argument("--goal", help="only plans whose goal contains this text")
+    args = parser.parse_args()
+
+    fmt = args.format or FORMAT_BY_EXTENSION.get(os.path.splitext(args.output)[1].lower(), "jsonl")
+    if fmt == "parquet" and args.output == "-":
+        parser.error("Parquet can't be written to stdout")
+
+    from database.database import create_tables
+    from database.export import export_plans
+
+    create_tables()
+    filters = {"since": args.since, "until": args.until, "goal_contains": args.goal}
+    started = time.monotonic()
+    if args.output == "-":
+        count = export_plans(sys.stdout.buffer, fmt, **filters)
+    elif fmt == "parquet":
+        count = export_plans(args.output, fmt, **filters)
+    else:
+        with open(args.output, "wb") as sink:
+            count = export_plans(sink, fmt, **filters)
+
+    print(f"✅ Exported {count} plan(s) as {fmt} in {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
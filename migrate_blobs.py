@@ -0,0 +1,31 @@
+# migrate_blobs.py
+import argparse
+import os
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description="Move inline plan enrichment into the compressed blob store")
+    parser.add_argument("--batch-size", type=int, default=200, help="plans rewritten per transaction")
+    parser.add_argument("--vacuum", action="store_true", help="rebuild the SQLite file afterwards so freed pages go back to disk")
+    args = parser.parse_args()
+
+    from sqlalchemy import text
+    from database.database import engine, create_tables, migrate_enrichment_to_blobs, prune_blobs
+
+    create_tables()
+    database_file = engine.url.database if engine.dialect.name == "sqlite" else None
+    size_before = os.path.getsize(database_file) if database_file and os.path.exists(database_file) else None
+
+    started = time.monotonic()
+    migrated, freed = migrate_enrichment_to_blobs(args.batch_size)
+    pruned = prune_blobs()
+    print(f"✅ Moved {migrated} plan(s) to the blob store ({freed / 1024:.1f} KiB of inline JSON) "
+          f"and pruned {pruned} unused blob(s) in {time.monotonic() - started:.1f}s")
+
+    if args.vacuum and database_file:
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        print(f"🗜️ Database file: {size_before / 1024:.1f} KiB → {os.path.getsize(database_file) / 1024:.1f} KiB")
+
+if __name__ == "__main__":
+    main()
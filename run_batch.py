@@ -0,0 +1,132 @@
+# run_batch.py
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+def read_goals(path):
+    """Yield (key, goal) pairs from a JSONL or CSV file.
+
+    JSONL lines may be {"goal": ..., "id": ...} objects or bare strings. CSV files use the
+    "goal" column (or the first column) and an optional "id" column. Keys default to the line number.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            reader = csv.DictReader(f)
+            goal_column = 'goal' if 'goal' in reader.fieldnames else reader.fieldnames[0]
+            for line_number, row in enumerate(reader, 1):
+                if row.get(goal_column, '').strip():
+                    yield str(row.get('id') or line_number), row[goal_column].strip()
+        else:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if isinstance(item, str):
+                    yield str(line_number), item.strip()
+                else:
+                    yield str(item.get('id') or line_number), item['goal'].strip()
+
+def load_checkpoint(path):
+    """Keys already saved by an earlier (possibly interrupted) run"""
+    done = set()
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get('plan_id') is not None:
+                        done.add(record['key'])
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate plans for a file of goals")
+    parser.add_argument("input", help="JSONL or CSV file of goals")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent plan generations")
+    parser.add_argument("--chunk-size", type=int, default=25, help="plans inserted per transaction")
+    parser.add_argument("--checkpoint", help="progress file (default: <input>.checkpoint.jsonl)")
+    parser.add_argument("--llm-rate", type=float, help="LLM calls per second")
+    parser.add_argument("--serpapi-rate", type=float, help="SerpAPI requests per second")
+    parser.add_argument("--openweather-rate", type=float, help="OpenWeather requests per second")
+    parser.add_argument("--skip-cached", action="store_true", help="skip goals that already have a fresh equivalent plan")
+    args = parser.parse_args()
+
+    # Heavy imports after argument parsing so --help stays instant
+    from database.database import create_tables
+    from database.crud import save_plans_bulk
+    from agents.planner_agent import planner_agent
+    from agents.plan_cache import plan_cache
+    from agents.rate_limit import rate_limiters
+
+    for upstream, rate in (("llm", args.llm_rate), ("serpapi", args.serpapi_rate), ("openweather", args.openweather_rate)):
+        if rate is not None:
+            rate_limiters.configure(upstream, rate)
+
+    create_tables()
+    checkpoint_path = args.checkpoint or f"{args.input}.checkpoint.jsonl"
+    done = load_checkpoint(checkpoint_path)
+    pending = [(key, goal) for key, goal in read_goals(args.input) if key not in done]
+
+    print(f"🚀 Batch planning: {len(pending)} goal(s) to generate, {len(done)} already done")
+    print(f"⚙️  {args.workers} worker(s), chunks of {args.chunk_size}, checkpoint: {checkpoint_path}")
+    print("-" * 50)
+
+    buffer = []  # (key, goal, plan) waiting for the next bulk insert
+    saved = failed = skipped = 0
+    started = time.monotonic()
+
+    def flush(checkpoint):
+        nonlocal saved
+        if not buffer:
+            return
+        plan_ids = save_plans_bulk([plan for _, _, plan in buffer])
+        # Checkpoint only after the chunk is committed, so a crash never marks unsaved work as done
+        for (key, goal, _), plan_id in zip(buffer, plan_ids):
+            checkpoint.write(json.dumps({"key": key, "goal": goal, "plan_id": plan_id}) + "\n")
+        checkpoint.flush()
+        saved += len(buffer)
+        buffer.clear()
+        rate = saved / (time.monotonic() - started)
+        print(f"💾 Saved {saved}/{len(pending)} ({rate:.2f} plans/s)")
+
+    def generate(goal):
+        if args.skip_cached and plan_cache.lookup(goal):
+            return None
+        return planner_agent.create_plan(goal)
+
+    executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="batch-plan")
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        futures = {executor.submit(generate, goal): (key, goal) for key, goal in pending}
+        try:
+            for future in as_completed(futures):
+                key, goal = futures[future]
+                try:
+                    plan = future.result()
+                except Exception as e:
+                    failed += 1
+                    checkpoint.write(json.dumps({"key": key, "goal": goal, "error": str(e)}) + "\n")
+                    print(f"❌ {key}: {e}")
+                    continue
+                if plan is None:
+                    skipped += 1
+                    continue
+                buffer.append((key, goal, plan))
+                if len(buffer) >= args.chunk_size:
+                    flush(checkpoint)
+            flush(checkpoint)
+        except KeyboardInterrupt:
+            print("\n⏹️  Interrupted — saving finished plans, rerun to resume")
+            executor.shutdown(wait=False, cancel_futures=True)
+            flush(checkpoint)
+            sys.exit(130)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    print("-" * 50)
+    print(f"✅ Done: {saved} saved, {skipped} skipped (cached), {failed} failed in {time.monotonic() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
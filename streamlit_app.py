@@ -1,12 +1,18 @@
 # streamlit_app.py
 import streamlit as st
-import time
+import os
 import json
-from datetime import datetime
-from database.database import create_tables, SessionLocal
-from database.models import TaskPlan
-from agents.planner_agent import planner_agent  # updated import for multi-agent planner
-import threading
+import tempfile
+from datetime import datetime, time as day_start
+from database.database import create_tables
+from database.crud import delete_plan, get_plan, list_plans_page, count_plans, latest_plan_summary, task_stats, data_version, SORT_KEYS
+from database.search import search_plans, count_search_results
+from database.export import export_plans, EXPORT_FORMATS
+from agents.plan_cache import plan_cache
+from agents.tool_cache import tool_cache
+from agents.resilience import upstream_guards
+from agents import metrics
+from agents.job_queue import plan_jobs
 
 # Page configuration
 st.set_page_config(
@@ -16,8 +22,44 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize database
-create_tables()
+# ----------------- PROCESS-WIDE RESOURCES ----------------- #
+# Streamlit reruns this script on every interaction; these run once per server process
+@st.cache_resource(show_spinner=False)
+def init_database():
+    """Create and migrate tables once, not on every rerun"""
+    create_tables()
+    return True
+
+@st.cache_resource(show_spinner="Loading planner...")
+def get_planner():
+    """Import crewai and build the planner on first use, shared by every session"""
+    from agents.planner_agent import planner_agent
+    return planner_agent
+
+init_database()
+
+# ----------------- CACHED READS ----------------- #
+# Reads are keyed on crud.data_version(), which every save and delete bumps, so reruns with no
+# data change are served from memory. The TTL only matters for writes from other processes (run_batch.py).
+DATA_CACHE_TTL = int(os.getenv("DATA_CACHE_TTL", "300"))
+
+CACHED_READS = {
+    "count_plans": count_plans,
+    "latest_plan_summary": latest_plan_summary,
+    "task_stats": task_stats,
+    "list_plans_page": list_plans_page,
+    "get_plan": get_plan,
+    "search_plans": search_plans,
+    "count_search_results": count_search_results
+}
+
+@st.cache_data(ttl=DATA_CACHE_TTL, max_entries=512, show_spinner=False)
+def _cached_read(name, version, *args, **kwargs):
+    return CACHED_READS[name](*args, **kwargs)
+
+def cached_read(name, *args, **kwargs):
+    """Call a read function from CACHED_READS, reusing the result until the data version changes"""
+    return _cached_read(name, data_version(), *args, **kwargs)
 
 # --- CSS already included as in your previous code ---
 
@@ -206,52 +248,62 @@ h2, h3, h4 {
 </style>
 """, unsafe_allow_html=True)
 # Initialize session state
-for key, value in [('plans', []), ('current_plan', None), ('planning_in_progress', False), ('current_page', "Create New Plan")]:
+for key, value in [('plans', []), ('current_plan', None), ('planning_in_progress', False), ('current_page', "Create New Plan"), ('active_job_id', None)]:
     if key not in st.session_state:
         st.session_state[key] = value
 
-# ----------------- DATABASE FUNCTIONS ----------------- #
-def load_plans_from_db():
-    db = SessionLocal()
-    try:
-        return db.query(TaskPlan).order_by(TaskPlan.created_at.desc()).all()
-    finally:
-        db.close()
-
-def save_plan_to_db(plan_data):
-    db = SessionLocal()
-    try:
-        new_plan = TaskPlan(goal=plan_data['goal'], status='completed')
-        new_plan.set_plan_steps_list(plan_data['steps'])
-        new_plan.set_enriched_info_dict(plan_data['enriched_info'])
-        db.add(new_plan)
-        db.commit()
-        return new_plan.id
-    except Exception as e:
-        db.rollback()
-        raise e
-    finally:
-        db.close()
+# Reattach to a queued/running job after a browser refresh or reconnect
+if st.session_state.active_job_id is None and st.query_params.get("job", "").isdigit():
+    st.session_state.active_job_id = int(st.query_params["job"])
 
 # ----------------- PLAN GENERATION ----------------- #
-def generate_plan_async(goal):
-    """Generate plan in background"""
-    try:
-        # Use the updated multi-agent planner
-        result = planner_agent.create_plan(goal)
-        plan_id = save_plan_to_db(result)
-        result['id'] = plan_id
-        st.session_state.current_plan = result
+def generate_plan_async(goal, force_refresh=False, stream=False):
+    """Queue plan generation on the background worker pool; streamed jobs publish days as they are written"""
+    # Reuse a stored plan for an equivalent goal unless the user asked to regenerate
+    cached = plan_cache.lookup(goal, force_refresh=force_refresh)
+    if cached:
+        st.session_state.current_plan = cached
         st.session_state.planning_in_progress = False
-        return result
-    except Exception as e:
+        return cached
+
+    job_id = plan_jobs.submit(goal, stream=stream)
+    st.session_state.active_job_id = job_id
+    st.query_params["job"] = str(job_id)
+    return None
+
+@st.fragment(run_every=1)
+def job_status_panel():
+    """Poll the active background job, showing streamed days while it runs and its plan once it finishes"""
+    job_id = st.session_state.get("active_job_id")
+    if job_id is None:
+        return
+    job = plan_jobs.get(job_id)
+
+    if job is None or job['status'] in ('done', 'failed', 'cancelled'):
+        st.session_state.active_job_id = None
         st.session_state.planning_in_progress = False
-        st.session_state.current_plan = {
-            'goal': goal,
-            'steps': [],
-            'enriched_info': {'error': f'Plan generation failed: {str(e)}'}
-        }
-        return None
+        st.query_params.pop("job", None)
+        if job and job['status'] == 'done':
+            st.session_state.current_plan = job['plan']
+        elif job and job['status'] == 'cancelled':
+            st.toast(f"Plan job #{job_id} cancelled")
+        elif job:
+            st.session_state.current_plan = {'goal': job['goal'], 'steps': [], 'enriched_info': {'error': job['error']}}
+        st.rerun()
+
+    if job['status'] == 'queued':
+        st.info(f"🕒 Plan job #{job_id} is queued — waiting for a free planner...")
+    elif job['days'] or job['streamed_text']:
+        st.markdown("### ✍️ Writing your plan...")
+        for day in job['days']:
+            st.markdown(f"**{day['day']}**")
+            for i, task in enumerate(day['tasks'], 1):
+                st.markdown(f"{i}. {task}")
+        st.text(job['streamed_text'])
+    else:
+        st.info(f"🤖 Plan job #{job_id} is running — AI Agent is analyzing your goal...")
+    # Stops the LLM call and enrichment requests, not just the polling
+    st.button("✖️ Cancel", key=f"cancel_job_{job_id}", on_click=plan_jobs.cancel, args=(job_id,))
 
 # ----------------- STREAMLIT PAGES ----------------- #
 def main():
@@ -262,20 +314,24 @@ def main():
     # Sidebar navigation & stats
     with st.sidebar:
         st.markdown("## 🧭 Navigation")
-        page = st.selectbox("Choose a page", ["Create New Plan", "View Plans History"], key="page_selector")
+        page = st.selectbox("Choose a page", ["Create New Plan", "View Plans History", "Performance"], key="page_selector")
         st.markdown("---")
         st.markdown("## 📊 Quick Stats")
-        plans = load_plans_from_db()
-        st.metric("Total Plans", len(plans))
-        if plans:
-            recent_plan = plans[0]
-            st.metric("Latest Plan", recent_plan.goal[:30]+"..." if len(recent_plan.goal) > 30 else recent_plan.goal)
+        st.metric("Total Plans", cached_read("count_plans"))
+        recent_plan = cached_read("latest_plan_summary")
+        if recent_plan:
+            st.metric("Latest Plan", recent_plan['goal'][:30]+"..." if len(recent_plan['goal']) > 30 else recent_plan['goal'])
+        st.metric("Planned Tasks", cached_read("task_stats")['tasks'])
+        cache_stats = plan_cache.stats()
+        st.metric("Plan Cache Hit Rate", f"{cache_stats['hit_rate']:.0%}", help=f"{cache_stats['hits']} hits / {cache_stats['misses']} misses")
 
     # Render main page
     if page == "Create New Plan":
         create_new_plan_page()
     elif page == "View Plans History":
         view_plans_history_page()
+    elif page == "Performance":
+        performance_page()
     else:
         st.error("Please select a valid page from the sidebar.")
 
@@ -291,6 +347,9 @@ def create_new_plan_page():
         key="goal_input"
     )
 
+    force_refresh = st.checkbox("🔄 Regenerate anyway", value=False, key="force_refresh", help="Skip saved plans for similar goals and call the AI again")
+    stream_output = st.checkbox("⚡ Stream plan as it is written", value=True, key="stream_output", help="Show each day as soon as the AI finishes writing it")
+
     st.markdown("<br>", unsafe_allow_html=True)
 
     # Center the button using a single column and CSS
@@ -319,11 +378,13 @@ def create_new_plan_page():
             st.session_state.planning_in_progress = True
             st.session_state.current_plan = None
 
-            with st.spinner("🤖 AI Agent is analyzing your goal..."):
-                result = generate_plan_async(goal)
-                st.session_state.current_plan = result
-                st.success("✅ Plan generated successfully!")
-                st.rerun()
+            result = generate_plan_async(goal, force_refresh=force_refresh, stream=stream_output)
+            if result and result.get('cached'):
+                st.success("⚡ Reused a saved plan for a similar goal!")
+            st.rerun()
+
+    # Track a background job, if one is in flight
+    job_status_panel()
 
     # Display current plan
     if st.session_state.get("current_plan"):
@@ -369,6 +430,24 @@ def display_plan(plan):
     if plan.get('full_result'):
         st.text(plan['full_result'])
 
+    # Change a single day of a saved plan without regenerating the rest
+    day_labels = [step['day'] for step in plan.get('steps', []) if isinstance(step, dict) and 'day' in step]
+    if plan.get('id') and day_labels:
+        with st.expander("✏️ Change one day"):
+            day_label = st.selectbox("Day:", day_labels, key=f"replan_day_{plan['id']}")
+            instruction = st.text_input("What should change?", placeholder="e.g., swap the museum for a food tour", key=f"replan_instruction_{plan['id']}")
+            if st.button("🔁 Update this day", key=f"replan_{plan['id']}"):
+                if not instruction.strip():
+                    st.error("Please describe the change!")
+                    return
+                with st.spinner(f"Re-planning {day_label}..."):
+                    try:
+                        st.session_state.current_plan = get_planner().replan_day(plan['id'], day_label, instruction)
+                    except Exception as e:
+                        st.error(f"Re-planning failed: {str(e)}")
+                        return
+                st.rerun()
+
 
 
 
@@ -376,8 +455,7 @@ def display_plan(plan):
 # ----------------- VIEW HISTORY ----------------- #
 def view_plans_history_page():
     st.markdown("## 📚 Plans History")
-    plans = load_plans_from_db()
-    if not plans:
+    if not cached_read("count_plans"):
         st.info("No plans found. Create your first plan!")
         return
 
@@ -386,53 +464,196 @@ def view_plans_history_page():
     with col1:
         search_term = st.text_input("🔍 Search plans:", placeholder="Search by goal or content...")
     with col2:
-        sort_by = st.selectbox("Sort by:", ["Newest","Oldest","Goal A-Z","Goal Z-A"])
-
-    filtered_plans = plans
-    if search_term:
-        filtered_plans = [p for p in plans if search_term.lower() in p.goal.lower()]
-
-    # Sorting
-    if sort_by == "Newest":
-        filtered_plans = sorted(filtered_plans, key=lambda x: x.created_at, reverse=True)
-    elif sort_by == "Oldest":
-        filtered_plans = sorted(filtered_plans, key=lambda x: x.created_at)
-    elif sort_by == "Goal A-Z":
-        filtered_plans = sorted(filtered_plans, key=lambda x: x.goal)
-    elif sort_by == "Goal Z-A":
-        filtered_plans = sorted(filtered_plans, key=lambda x: x.goal, reverse=True)
-
-    st.markdown(f"**Found {len(filtered_plans)} plan(s)**")
-
-    # Display plans
-    for plan in filtered_plans:
-        with st.expander(f"📋 {plan.goal[:50]}{'...' if len(plan.goal) > 50 else ''} - {plan.created_at.strftime('%Y-%m-%d %H:%M')}"):
-            col1, col2 = st.columns([3,1])
-            with col1:
-                st.markdown(f"**Goal:** {plan.goal}")
-                st.markdown(f"**Created:** {plan.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-                st.markdown(f"**Status:** {plan.status}")
-                
-                # Display full AI output directly
-                full_result = plan.get_enriched_info_dict().get('research_data', 'No AI output available')
-                st.text(full_result)
-
-            with col2:
-                if st.button("👁️ View", key=f"view_{plan.id}"):
-                    st.session_state.current_plan = {
-                        'goal': plan.goal,
-                        'full_result': full_result
-                    }
-                    st.rerun()
-                if st.button("🗑️ Delete", key=f"delete_{plan.id}"):
-                    db = SessionLocal()
-                    try:
-                        db.query(TaskPlan).filter(TaskPlan.id == plan.id).delete()
-                        db.commit()
-                        st.success("Plan deleted!")
-                        st.rerun()
-                    finally:
-                        db.close()
+        sort_by = st.selectbox("Sort by:", list(SORT_KEYS), disabled=bool(search_term.strip()), help="Search results are ranked by relevance")
+
+    # Remember the cursor that starts each visited page (keyset for lists, offset for search)
+    if st.session_state.get("history_query") != (search_term, sort_by):
+        st.session_state.history_query = (search_term, sort_by)
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+
+    if search_term.strip():
+        total = cached_read("count_search_results", search_term)
+        plans, next_cursor = cached_read("search_plans", search_term, cursor=cursors[-1])
+    else:
+        total = cached_read("count_plans")
+        plans, next_cursor = cached_read("list_plans_page", sort_by, cursor=cursors[-1])
+    page_number = len(cursors)
+
+    st.markdown(f"**Found {total} plan(s)** — page {page_number}")
+
+    # Lightweight summaries only; the grid is virtualized, so just the visible rows are drawn
+    table_key = f"history_table_{sort_by}_{page_number}_{search_term.strip()}"
+    selection = st.dataframe(
+        [{
+            "Goal": plan['goal'],
+            "Created": plan['created_at'].strftime('%Y-%m-%d %H:%M'),
+            "Status": plan['status'],
+            **({"Days": plan['day_count'], "Tasks": plan['task_count']} if plan.get('day_count') is not None else {}),
+            **({"Match": plan['snippet']} if plan.get('snippet') else {})
+        } for plan in plans],
+        hide_index=True,
+        width="stretch",
+        on_select="rerun",
+        selection_mode="single-row",
+        key=table_key
+    )
+    selected_rows = selection.selection.rows if selection else []
+    if selected_rows and selected_rows[0] < len(plans):
+        plan_detail_panel(plans[selected_rows[0]]['id'], table_key)
+    else:
+        st.caption("Select a plan to open it.")
+
+    # Pager
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if page_number > 1 and st.button("⬅️ Previous", key="history_prev"):
+            cursors.pop()
+            st.rerun()
+    with col3:
+        if next_cursor is not None and st.button("Next ➡️", key="history_next"):
+            cursors.append(next_cursor)
+            st.rerun()
+
+    export_section(search_term.strip())
+
+def plan_detail_panel(plan_id, table_key):
+    """Full body of the one plan the user opened; nothing else on the page is decoded"""
+    plan = cached_read("get_plan", plan_id)
+    if plan is None:
+        st.warning("This plan no longer exists.")
+        return
+
+    def open_in_planner():
+        st.session_state.current_plan = plan
+        st.session_state.page_selector = "Create New Plan"
+
+    def remove():
+        delete_plan(plan_id)
+        st.session_state.pop(table_key, None)
+        st.toast("Plan deleted!")
+
+    st.markdown(f"### 📋 {plan['goal']}")
+    col1, col2 = st.columns([3,1])
+    with col1:
+        st.markdown(f"**Created:** {plan['created_at'].strftime('%Y-%m-%d %H:%M:%S')}")
+        st.markdown(f"**Status:** {plan['status']}")
+        st.text(plan.get('full_result') or 'No AI output available')
+        enriched_info = plan.get('enriched_info', {})
+        for key, label in (('weather_considerations', 'Weather'), ('recommendations', 'Recommendations'), ('budget_tips', 'Budget Tips')):
+            if enriched_info.get(key):
+                st.markdown(f"**{label}:** {enriched_info[key]}")
+    with col2:
+        st.button("👁️ View", key=f"view_{plan_id}", on_click=open_in_planner)
+        st.button("🗑️ Delete", key=f"delete_{plan_id}", on_click=remove)
+
+def export_section(goal_filter):
+    """Download the whole history (optionally filtered); rows are encoded only when the button is clicked"""
+    with st.expander("📤 Export plans"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            fmt = st.selectbox("Format:", EXPORT_FORMATS, key="export_format")
+        with col2:
+            since = st.date_input("From:", value=None, key="export_since")
+        with col3:
+            until = st.date_input("Until:", value=None, key="export_until")
+        if goal_filter:
+            st.caption(f"Only plans whose goal contains “{goal_filter}”")
+
+        def build_export():
+            # Spools to disk past 8 MB so large histories never sit in memory twice
+            sink = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+            export_plans(
+                sink, fmt,
+                since=datetime.combine(since, day_start.min) if since else None,
+                until=datetime.combine(until, day_start.max) if until else None,
+                goal_contains=goal_filter or None
+            )
+            sink.seek(0)
+            return sink
+
+        st.download_button(
+            "⬇️ Download",
+            data=build_export,
+            file_name=f"plans_{datetime.now():%Y%m%d_%H%M}.{fmt}",
+            mime={"jsonl": "application/x-ndjson", "csv": "text/csv", "parquet": "application/vnd.apache.parquet"}[fmt],
+            key="export_download"
+        )
+
+
+# ----------------- PERFORMANCE ----------------- #
+PERFORMANCE_WINDOWS = {"Last hour": 1, "Last 24 hours": 24, "Last 7 days": 24 * 7}
+
+def performance_page():
+    st.markdown("## ⏱️ Performance")
+    window = st.selectbox("Time window:", list(PERFORMANCE_WINDOWS), index=1)
+    hours = PERFORMANCE_WINDOWS[window]
+
+    # Latency per stage
+    st.markdown("### Stage latency")
+    stages = metrics.stage_latency_summary(hours)
+    if stages:
+        st.dataframe(
+            [{
+                "Stage": row["stage"],
+                "Calls": row["count"],
+                "Errors": row["errors"],
+                "p50 (ms)": round(row["p50_ms"], 1),
+                "p95 (ms)": round(row["p95_ms"], 1),
+                "p99 (ms)": round(row["p99_ms"], 1)
+            } for row in stages],
+            hide_index=True,
+            width="stretch"
+        )
+    else:
+        st.info("No timings recorded in this window yet.")
+
+    # LLM tokens and cost
+    st.markdown("### LLM usage")
+    usage = metrics.token_usage_summary(hours)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Plans", usage["plans"])
+    col2.metric("Tokens / plan (p50)", f"{usage['p50_tokens_per_plan']:,}")
+    col3.metric("Tokens / plan (p95)", f"{usage['p95_tokens_per_plan']:,}")
+    col4.metric("Estimated cost", f"${usage['cost_usd']:.2f}", help=f"{usage['prompt_tokens']:,} prompt + {usage['completion_tokens']:,} completion tokens")
+
+    # Cache hit rates
+    st.markdown("### Cache hit rate")
+    rates = metrics.cache_hit_rates(hours)
+    if rates:
+        import pandas as pd
+        chart = pd.DataFrame(rates).pivot(index="hour", columns="stage", values="hit_rate")
+        st.line_chart(chart)
+    else:
+        st.info("No cached lookups recorded in this window yet.")
+    tool_stats = tool_cache.stats()
+    plan_stats = plan_cache.stats()
+    st.caption(
+        f"Since this server started: tool cache {tool_stats['hit_rate']:.0%} ({tool_stats['memory_entries']} entries in memory), "
+        f"plan cache {plan_stats['hit_rate']:.0%}"
+    )
+
+    # Circuit breakers and adaptive concurrency, live for this server process
+    st.markdown("### Upstreams")
+    upstreams = upstream_guards.snapshot()
+    if upstreams:
+        breaker_icons = {"closed": "🟢 closed", "half_open": "🟡 half-open", "open": "🔴 open"}
+        st.dataframe(
+            [{
+                "Upstream": name,
+                "Breaker": breaker_icons[row["state"]],
+                "Trips": row["trips"],
+                "Rejected": row["rejected"],
+                "Concurrency limit": row["limit"],
+                "In flight": row["inflight"],
+                "Baseline (ms)": row["baseline_ms"],
+                "Hedged": f"{row['hedges']} ({row['hedge_wins']} won)"
+            } for name, row in upstreams.items()],
+            hide_index=True,
+            width="stretch"
+        )
+    else:
+        st.info("Circuit breakers are off (RESILIENCE_ENABLED=false).")
 
 
 if __name__ == "__main__":
@@ -1,8 +1,15 @@
 # test_agent.py
 import os
 import sys
+import tempfile
 from dotenv import load_dotenv
 
+# Tests write plans, jobs and cached lookups; keep them out of the real task_planner.db and
+# tool_cache.db. Set before anything imports database.database or agents.tool_cache.
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="task_planner_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DATA_DIR, 'task_planner.db')}"
+os.environ["TOOL_CACHE_DB"] = os.path.join(TEST_DATA_DIR, "tool_cache.db")
+
 load_dotenv()
 
 def test_basic_imports():
@@ -59,6 +66,1042 @@ def test_agent():
         print(f"❌ Agent error: {e}")
         return False
 
+def test_enrichment_deadlines():
+    """Test that a slow enrichment lookup degrades instead of blocking the plan"""
+    try:
+        import time
+        from agents import planner_agent as planner_module
+
+        agent = planner_module.TaskPlannerAgent()
+        agent._get_weather = lambda goal: time.sleep(2) or "Sunny"
+        agent._get_recommendations = lambda goal: time.sleep(0.3) or "Museums"
+        agent._get_budget_tips = lambda goal: time.sleep(0.3) or "Walk"
+
+        original_deadline = planner_module.ENRICHMENT_DEADLINES["weather_considerations"]
+        planner_module.ENRICHMENT_DEADLINES["weather_considerations"] = 0.5
+        try:
+            started = time.monotonic()
+            enriched_info = agent._enrich("3-day trip to Paris")
+            elapsed = time.monotonic() - started
+        finally:
+            planner_module.ENRICHMENT_DEADLINES["weather_considerations"] = original_deadline
+
+        if enriched_info["weather_considerations"] == "Weather unavailable" and enriched_info["recommendations"] == "Museums" and elapsed < 1:
+            print(f"✅ Enrichment finished in {elapsed:.2f}s with partial weather result")
+            return True
+        print(f"❌ Unexpected enrichment result after {elapsed:.2f}s: {enriched_info}")
+        return False
+    except Exception as e:
+        print(f"❌ Enrichment error: {e}")
+        return False
+
+def test_incremental_parser():
+    """Test that streamed chunks yield each day as soon as its block closes"""
+    try:
+        from agents.planner_agent import IncrementalPlanParser
+
+        parser = IncrementalPlanParser()
+        chunks = ["Day 1: Arri", "val\n1. Check in\n2. Walk the Sei", "ne\nDay 2\n1. Lou", "vre\n"]
+        emitted = [parser.feed(chunk) for chunk in chunks]
+        emitted.append(parser.close())
+
+        expected = [[], [], [("Day 1", ["Check in", "Walk the Seine"])], [], [("Day 2", ["Louvre"])]]
+        if emitted == expected:
+            print("✅ Days emitted incrementally")
+            return True
+        print(f"❌ Unexpected parser output: {emitted}")
+        return False
+    except Exception as e:
+        print(f"❌ Parser error: {e}")
+        return False
+
+
+def test_structured_output():
+    """Test that structured plan output maps to day-wise steps without regex parsing"""
+    try:
+        from agents.planner_agent import planner_agent, PlanOutput
+
+        plan_output = PlanOutput.model_validate({"days": [
+            {"day": 2, "title": "Museums", "tasks": [{"time": "10:00", "activity": "Louvre"}]},
+            {"day": 1, "tasks": [{"activity": "Check in"}]}
+        ]})
+        original_enrich = planner_agent._enrich
+        planner_agent._enrich = lambda goal: {}
+        try:
+            result = planner_agent._structured_result(plan_output, "2 days in Paris")
+        finally:
+            planner_agent._enrich = original_enrich
+
+        expected = [{"day": "Day 1", "tasks": ["Check in"]}, {"day": "Day 2", "tasks": ["10:00 - Louvre"]}]
+        if result["steps"] == expected and "Day 2: Museums" in result["full_result"]:
+            print("✅ Structured output mapped to steps")
+            return True
+        print(f"❌ Unexpected steps: {result['steps']}")
+        return False
+    except Exception as e:
+        print(f"❌ Structured output error: {e}")
+        return False
+
+
+def test_normalized_storage():
+    """Test that older plans are backfilled into plan_days/plan_tasks and list queries leave plan documents unloaded"""
+    try:
+        import json
+        from sqlalchemy import inspect
+        from database.database import create_tables, backfill_plan_days, SessionLocal
+        from database.models import TaskPlan, plan_document_options
+        from database.crud import get_plan_days, get_plan_day, delete_plan
+
+        create_tables()
+        db = SessionLocal()
+        try:
+            # Written the way plans were saved before the normalized tables: steps JSON only
+            legacy = [
+                TaskPlan(goal="Backfill day plan", plan_steps=json.dumps([{"day": "Day 1", "tasks": ["Louvre", "Seine"]}, {"day": "Day 2", "tasks": ["Versailles"]}])),
+                TaskPlan(goal="Backfill flat plan", plan_steps=json.dumps([{"step": 1, "description": "Book hotel"}, {"step": 2, "description": "Pack"}]))
+            ]
+            db.add_all(legacy)
+            db.commit()
+            plan_ids = [plan.id for plan in legacy]
+        finally:
+            db.close()
+
+        try:
+            before = [get_plan_days(plan_id) for plan_id in plan_ids]
+            backfill_plan_days(batch_size=1)
+            after = [get_plan_days(plan_id) for plan_id in plan_ids]
+            day_two = get_plan_day(plan_ids[0], "Day 2")
+
+            db = SessionLocal()
+            try:
+                listed = db.query(TaskPlan).filter(TaskPlan.id == plan_ids[0]).one()
+                unloaded = inspect(listed).unloaded
+                full = db.query(TaskPlan).options(*plan_document_options()).filter(TaskPlan.id == plan_ids[1]).one()
+                loaded = "plan_steps" not in inspect(full).unloaded
+            finally:
+                db.close()
+        finally:
+            for plan_id in plan_ids:
+                delete_plan(plan_id)
+
+        if (before == [[], []] and after == [[{"day": "Day 1", "task_count": 2}, {"day": "Day 2", "task_count": 1}], [{"day": "Steps", "task_count": 2}]]
+                and day_two["tasks"] == ["Versailles"] and {"plan_steps", "enriched_info"} <= unloaded and loaded):
+            print("✅ Older plans were backfilled into days and tasks; plan documents load only when asked for")
+            return True
+        print(f"❌ Unexpected storage result: before {before}, after {after}, day {day_two}, unloaded {unloaded}, loaded {loaded}")
+        return False
+    except Exception as e:
+        print(f"❌ Normalized storage error: {e}")
+        return False
+
+def test_blob_store():
+    """Test that plan output and enrichment round-trip through the blob store, stored once per content"""
+    try:
+        from sqlalchemy import func
+        from database.database import create_tables, SessionLocal
+        from database.crud import save_plans_bulk, get_plan, delete_plan
+        from database.models import PlanEnrichment, PlanBlob, plan_blob_hashes
+
+        def stored(hashes):
+            db = SessionLocal()
+            try:
+                return db.query(func.count(PlanBlob.hash)).filter(PlanBlob.hash.in_(hashes)).scalar()
+            finally:
+                db.close()
+
+        create_tables()
+        enriched_info = {"recommendations": "Title: Louvre\nSnippet: The world's most visited museum.\n" * 5, "rating": 4.5}
+        plan_data = {"goal": "2 days in Paris", "steps": [{"day": "Day 1", "tasks": ["Louvre"]}],
+                     "enriched_info": enriched_info, "full_result": "Day 1: Museums\n1. Louvre"}
+        plan_ids = save_plans_bulk([plan_data, plan_data])
+        db = SessionLocal()
+        try:
+            distinct_blobs = db.query(func.count(func.distinct(PlanEnrichment.blob_hash))).filter(PlanEnrichment.plan_id.in_(plan_ids)).scalar()
+            hashes = plan_blob_hashes(db, plan_ids[0])
+        finally:
+            db.close()
+        plan = get_plan(plan_ids[1])
+        # Blobs are shared, so they outlive the first plan and go with the last one
+        delete_plan(plan_ids[0])
+        shared = stored(hashes)
+        delete_plan(plan_ids[1])
+        left = stored(hashes)
+
+        if (plan["enriched_info"] == enriched_info and plan["full_result"] == plan_data["full_result"] and distinct_blobs == 2
+                and shared == len(hashes) == 3 and left == 0):
+            print("✅ Blob store round trip and deduplication; blobs were pruned with the last plan using them")
+            return True
+        print(f"❌ Unexpected blob store result: {distinct_blobs} distinct blobs, {shared}/{len(hashes)} kept, {left} left, {plan}")
+        return False
+    except Exception as e:
+        print(f"❌ Blob store error: {e}")
+        return False
+
+
+def test_http_session():
+    """Test that lookups share one keep-alive connection and retry a 503 with the configured policy"""
+    try:
+        import threading
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        from agents import http_client
+
+        seen = []  # (client port, path) per request
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                seen.append((self.client_address[1], self.path))
+                flaky_first = self.path == "/flaky" and sum(1 for _, path in seen if path == "/flaky") == 1
+                body = b"busy" if flaky_first else b"ok"
+                self.send_response(503 if flaky_first else 200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+        try:
+            http_client.close()
+            session = http_client.get_session()
+            statuses = [http_client.get(f"{base}/weather").status_code for _ in range(3)]
+            flaky = http_client.get(f"{base}/flaky")
+            reused = http_client.get_session() is session
+            retry = session.get_adapter(base).max_retries
+        finally:
+            http_client.close()
+            server.shutdown()
+            server.server_close()
+
+        ports = {port for port, _ in seen}
+        if (statuses == [200] * 3 and flaky.status_code == 200 and reused and len(ports) == 1
+                and [path for _, path in seen].count("/flaky") == 2
+                and retry.total == http_client.HTTP_MAX_RETRIES and 503 in retry.status_forcelist and "POST" not in retry.allowed_methods):
+            print(f"✅ {len(seen)} requests over one pooled connection; the 503 was retried")
+            return True
+        print(f"❌ Unexpected session behaviour: statuses {statuses}, flaky {flaky.status_code}, {len(ports)} connections, requests {seen}")
+        return False
+    except Exception as e:
+        print(f"❌ HTTP session error: {e}")
+        return False
+
+def test_async_lookups():
+    """Test that concurrent async lookups share one upstream call and still honour deadlines"""
+    try:
+        import asyncio
+        import time
+        from agents import planner_agent as planner_module
+        from agents.single_flight import AsyncSingleFlight
+
+        calls = []
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.2)
+            return "Sunny"
+
+        async def scenario():
+            flight = AsyncSingleFlight()
+            waiters = [asyncio.ensure_future(flight.do("paris", fetch)) for _ in range(5)]
+            await asyncio.sleep(0.05)
+            waiters[0].cancel()  # one caller leaving must not fail the others
+            shared = await asyncio.gather(*waiters[1:])
+
+            agent = planner_module.TaskPlannerAgent()
+            agent._aget_weather = lambda goal: asyncio.sleep(2, "Sunny")
+            agent._aget_recommendations = lambda goal: asyncio.sleep(0.1, "Museums")
+            agent._aget_budget_tips = lambda goal: asyncio.sleep(0.1, "Walk")
+            original_deadline = planner_module.ENRICHMENT_DEADLINES["weather_considerations"]
+            planner_module.ENRICHMENT_DEADLINES["weather_considerations"] = 0.5
+            try:
+                started = time.monotonic()
+                enriched_info = await agent._arun_enrichment("3-day trip to Paris")
+                return shared, enriched_info, time.monotonic() - started
+            finally:
+                planner_module.ENRICHMENT_DEADLINES["weather_considerations"] = original_deadline
+
+        shared, enriched_info, elapsed = asyncio.run(scenario())
+        if (len(calls) == 1 and shared == ["Sunny"] * 4 and elapsed < 1
+                and enriched_info["weather_considerations"] == "Weather unavailable" and enriched_info["budget_tips"] == "Walk"):
+            print(f"✅ Async lookups coalesced into one call; enrichment finished in {elapsed:.2f}s")
+            return True
+        print(f"❌ Unexpected async result: {len(calls)} upstream calls, {shared}, {enriched_info} after {elapsed:.2f}s")
+        return False
+    except Exception as e:
+        print(f"❌ Async lookup error: {e}")
+        return False
+
+def test_tool_cache():
+    """Test TTL expiry, LRU eviction, promotion from the SQLite tier and the stale fallback"""
+    try:
+        from agents.tool_cache import ToolResultCache, normalize_key
+
+        db_path = os.path.join(TEST_DATA_DIR, "tool_cache_tiers.db")
+        cache = ToolResultCache(max_entries=2, db_path=db_path)
+        cache.clear()
+        cache.set("weather", normalize_key(" Paris "), "18°C", ttl=60)
+        cache.set("weather", "rome", "24°C", ttl=60)
+        cache.get("weather", "paris")               # Paris is now the most recently used
+        cache.set("weather", "oslo", "6°C", ttl=60)  # evicts Rome from memory
+        in_memory = {key for _, key in cache._entries}
+
+        # A fresh process has an empty memory tier; disk hits are promoted into it
+        restarted = ToolResultCache(max_entries=2, db_path=db_path)
+        promoted = restarted.get("weather", "rome")
+        promoted_again = restarted.get("weather", "rome")
+
+        cache.set("weather", "lisbon", "21°C", ttl=-1)  # already expired
+        expired = cache.get("weather", "lisbon")
+        stale = cache.get_stale("weather", "lisbon")
+        stats = restarted.stats()["namespaces"]["weather"]
+
+        if (in_memory == {"paris", "oslo"} and cache.stats()["namespaces"]["weather"]["evictions"] >= 1
+                and promoted == promoted_again == "24°C" and stats["disk_hits"] == 1 and stats["memory_hits"] == 1
+                and expired is None and stale == "21°C"):
+            print("✅ Tool cache expired, evicted, promoted and served stale entries as expected")
+            return True
+        print(f"❌ Unexpected tool cache result: memory {in_memory}, promoted {promoted!r}/{promoted_again!r}, stats {stats}, expired {expired!r}, stale {stale!r}")
+        return False
+    except Exception as e:
+        print(f"❌ Tool cache error: {e}")
+        return False
+
+def test_plan_service():
+    """Test that the HTTP API coalesces equivalent goals and answers 429 when saturated"""
+    try:
+        import asyncio
+        import httpx
+        from database.database import create_tables
+        from database.crud import delete_plan
+        from agents.plan_service import PlanService
+        from agents.single_flight import AsyncSingleFlight
+        from api_server import create_app
+
+        class StubPlanner:
+            calls = 0
+
+            async def acreate_plan(self, goal):
+                StubPlanner.calls += 1
+                await asyncio.sleep(0.3)
+                return {"goal": goal, "steps": [{"day": "Day 1", "tasks": ["Tram 28"]}],
+                        "enriched_info": {}, "full_result": "Day 1\n1. Tram 28", "status": "completed"}
+
+        async def scenario():
+            app = create_app(PlanService(planner=StubPlanner(), max_inflight=1, max_queue=0))
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://planner") as client:
+                shared = await asyncio.gather(*[
+                    client.post("/plans", json={"goal": goal})
+                    for goal in ("2 days in Lisbon test", "Two days in Lisbon test", "lisbon 2 day test")
+                ])
+                first = asyncio.ensure_future(client.post("/plans", json={"goal": "3 days in Porto test", "force_refresh": True}))
+                await asyncio.sleep(0.1)
+                rejected = await client.post("/plans", json={"goal": "4 days in Rome test", "force_refresh": True})
+            # Opposite routes read alike but are different trips, so they must not share a generation
+            routes = await asyncio.gather(*[
+                PlanService(planner=StubPlanner(), max_inflight=2).create_plan(goal)
+                for goal in ("Fly from London to Paris test", "Fly from Paris to London test")
+            ])
+            return shared, await first, rejected, routes
+
+        async def cancellations():
+            # A generation cancelled before its first step must still give back its admission
+            service = PlanService(planner=StubPlanner(), max_inflight=1, max_queue=0)
+            service._admit()
+            service._start_generation("cancelled early test").cancel()
+            await asyncio.sleep(0.01)
+            released = service.stats()["queued"] == 0 and service._admitted == 0
+
+            # A caller arriving while the abandoned call is still winding down starts a fresh one
+            flights = AsyncSingleFlight()
+
+            async def fetch(value):
+                await asyncio.sleep(0.05)
+                return value
+
+            abandoned = asyncio.ensure_future(flights.do("key", lambda: fetch("old")))
+            await asyncio.sleep(0)
+            abandoned.cancel()
+            await asyncio.sleep(0)
+            fresh = await flights.do("key", lambda: fetch("new"))
+            return released, fresh
+
+        create_tables()
+        shared, first, rejected, routes = asyncio.run(scenario())
+        released, fresh = asyncio.run(cancellations())
+        plan_ids = {response.json()["id"] for response in shared + [first] if response.status_code == 201}
+        for plan_id in plan_ids | {plan["id"] for plan in routes}:
+            delete_plan(plan_id)
+
+        if (StubPlanner.calls == 4 and len(plan_ids) == 2 and [r.status_code for r in shared] == [201] * 3
+                and rejected.status_code == 429 and rejected.headers.get("Retry-After")
+                and [plan["goal"] for plan in routes] == ["Fly from London to Paris test", "Fly from Paris to London test"]
+                and not any(plan["coalesced"] for plan in routes) and released and fresh == "new"):
+            print("✅ Equivalent goals shared one generation, opposite routes did not, the saturated service answered 429 and cancelled generations were released")
+            return True
+        print(f"❌ Unexpected API result: {StubPlanner.calls} generations, {[r.status_code for r in shared]}, {rejected.status_code}, routes {routes}, released {released}, fresh {fresh!r}")
+        return False
+    except Exception as e:
+        print(f"❌ Plan service error: {e}")
+        return False
+
+def test_circuit_breaker():
+    """Test that only upstream errors trip the breaker, which then fails fast while the tool serves its last known result"""
+    try:
+        from agents.resilience import upstream_guards, CircuitBreaker, UpstreamUnavailable
+        from agents.planner_agent import web_search_tool
+        from agents.tool_cache import tool_cache, normalize_key
+
+        class ProviderError(Exception):
+            def __init__(self, status_code):
+                super().__init__(f"HTTP {status_code}")
+                self.status_code = status_code
+
+        calls = []
+        guard = upstream_guards.get("serpapi")
+        original_breaker, original_key = guard.breaker, os.environ.get("SERPAPI_KEY")
+        guard.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        os.environ["SERPAPI_KEY"] = "test"
+        try:
+            # Local errors (bad output, bad request) must not count against the upstream
+            for error in (ValueError("output failed validation"), KeyError("goal"), ProviderError(400)):
+                try:
+                    with guard.call():
+                        raise error
+                except Exception:
+                    pass
+            local_failures = guard.breaker.failures
+            for error in (ProviderError(503), ConnectionError("refused")):
+                try:
+                    with guard.call():
+                        raise error
+                except Exception:
+                    pass
+            try:
+                with guard.call():
+                    calls.append("sent")
+            except UpstreamUnavailable:
+                pass
+
+            query = "breaker test museums in Oslo"
+            tool_cache.set(web_search_tool.name, normalize_key(query), "Title: Munch Museum", ttl=-1)  # already expired
+            result = web_search_tool._run(query)
+            state = guard.snapshot()["state"]
+        finally:
+            guard.breaker = original_breaker
+            if original_key is None:
+                os.environ.pop("SERPAPI_KEY", None)
+            else:
+                os.environ["SERPAPI_KEY"] = original_key
+
+        if local_failures == 0 and not calls and state == "open" and result == "Title: Munch Museum":
+            print("✅ Local errors were not counted; the open breaker rejected the call and the stale result was served")
+            return True
+        print(f"❌ Unexpected breaker result: {local_failures} local failures counted, state {state}, calls {calls}, result {result!r}")
+        return False
+    except Exception as e:
+        print(f"❌ Circuit breaker error: {e}")
+        return False
+
+def test_sync_hedging():
+    """Test that a blocking lookup slower than usual is hedged and the faster answer wins"""
+    try:
+        import time
+        from agents.resilience import UpstreamGuard, CircuitBreaker, AdaptiveLimit
+
+        guard = UpstreamGuard("test", CircuitBreaker(), AdaptiveLimit(8), slot_timeout=1.0)
+        guard.calls = 100
+        guard._latencies.extend([0.01] * 20)
+        started = []
+
+        def lookup():
+            with guard.call():
+                started.append(time.monotonic())
+                if len(started) == 1:
+                    time.sleep(0.5)  # the first request stalls
+                    return "slow"
+                return "fast"
+
+        began = time.monotonic()
+        result = guard.hedged(lookup)
+        elapsed = time.monotonic() - began
+        if result == "fast" and len(started) == 2 and guard.hedges == 1 and guard.hedge_wins == 1 and elapsed < 0.4:
+            print(f"✅ Stalled lookup was hedged; the second request answered in {elapsed * 1000:.0f} ms")
+            return True
+        print(f"❌ Unexpected hedging result: {result!r}, {len(started)} requests, {guard.hedges} hedges, {elapsed:.2f}s")
+        return False
+    except Exception as e:
+        print(f"❌ Hedging error: {e}")
+        return False
+
+def test_destination_extraction():
+    """Test that every destination is found in one pass and their weather fetched once each"""
+    try:
+        import asyncio
+        from agents.planner_agent import TaskPlannerAgent, WeatherTool
+
+        calls = []
+
+        class CountingWeatherTool(WeatherTool):
+            async def _arun(self, city):
+                calls.append(city)
+                return "21°C, Clear Sky"
+
+        planner = TaskPlannerAgent()
+        single = planner._goal_cities("Plan a 3-day trip to Paris focusing on art museums")
+        cities = planner._goal_cities("Rome, then Florence and Venice, ending back in Roma")
+        # Place names that are also ordinary words only match as written
+        words = planner._goal_cities("Solo male traveller, 4 days in Rome with a nice split of museums")
+        # Capitalised only because they open a sentence, with no place context after them
+        openers = [planner._goal_cities(goal) for goal in ("Nice weekend in Rome", "Male traveller, 4 days in Rome. Split the time")]
+        destinations = planner._goal_cities("Nice, then Split for 5 days")
+        weather = asyncio.run(CountingWeatherTool()._arun_many(cities + ["rome,it"]))
+
+        if (single == ["Paris,FR"] and words == ["Rome,IT"] and openers == [["Rome,IT"], ["Rome,IT"]]
+                and destinations == ["Nice,FR", "Split,HR"] and calls == ["Rome,IT", "Florence,IT", "Venice,IT"]
+                and weather.startswith("Rome: 21°C")):
+            print(f"✅ Destinations extracted and batched: {weather}")
+            return True
+        print(f"❌ Unexpected destinations: {single}, {words}, {openers}, {destinations}, lookups {calls}, weather {weather!r}")
+        return False
+    except Exception as e:
+        print(f"❌ Destination extraction error: {e}")
+        return False
+
+def test_goal_canonicalization():
+    """Test that rephrased goals share a cache key and different trips never do"""
+    try:
+        from agents.plan_cache import canonical_goal
+
+        same = [
+            ("Plan a 3-day trip to Paris focusing on art museums", "Paris trip for three days, focusing on art museums"),
+            ("2 weeks in Japan", "14 days in Japan"),
+            ("A week in Lisbon", "7 days in Lisbon"),
+            ("Weekend in Rome", "2 days in Rome"),
+        ]
+        different = [
+            ("Fly from London to Paris", "Fly from Paris to London"),
+            ("3 days in Paris, then 2 days in Rome", "2 days in Paris, then 3 days in Rome"),
+            ("Fly from Timbuktu to Bamako", "Fly from Bamako to Timbuktu"),
+            ("2 days in Paris for 4 people", "4 days in Paris for 2 people"),
+        ]
+        collisions = [pair for pair in different if canonical_goal(pair[0]) == canonical_goal(pair[1])]
+        misses = [pair for pair in same if canonical_goal(pair[0]) != canonical_goal(pair[1])]
+
+        if not collisions and not misses:
+            print("✅ Equivalent goals share a key and different trips stay apart")
+            return True
+        print(f"❌ Unexpected keys: collisions {collisions}, misses {misses}")
+        return False
+    except Exception as e:
+        print(f"❌ Goal canonicalization error: {e}")
+        return False
+
+def test_job_queue():
+    """Test that streamed jobs publish days while running and only stale jobs of other processes are reclaimed"""
+    try:
+        import time
+        import asyncio
+        from datetime import datetime, timedelta
+        from database.database import create_tables, SessionLocal
+        from database.models import PlanJob
+        from database.crud import delete_plan
+        from agents import job_queue
+
+        plan = {"goal": "2 days in Oslo", "steps": [{"day": "Day 1", "tasks": ["Opera House"]}, {"day": "Day 2", "tasks": ["Munch"]}],
+                "enriched_info": {}, "full_result": "Day 1\n1. Opera House\nDay 2\n1. Munch", "status": "completed"}
+
+        class StubPlanner:
+            goals = []
+
+            def stream_plan(self, goal):
+                for step in plan["steps"]:
+                    time.sleep(0.3)
+                    yield "day", step
+                yield "plan", dict(plan)
+
+            async def acreate_plan(self, goal):
+                if goal == "never finishes":
+                    await asyncio.sleep(30)
+                StubPlanner.goals.append(goal)
+                return dict(plan)
+
+        create_tables()
+        stale_seen = datetime.utcnow() - timedelta(seconds=job_queue.JOB_STALE_SEC + 5)
+        db = SessionLocal()
+        try:
+            live = PlanJob(goal="live elsewhere", status="running", owner="other:1", heartbeat_at=datetime.utcnow())
+            dead = PlanJob(goal="dead elsewhere", status="running", owner="other:2", heartbeat_at=stale_seen)
+            db.add_all([live, dead])
+            db.commit()
+            live_id, dead_id = live.id, dead.id
+        finally:
+            db.close()
+
+        queue = job_queue.PlanJobQueue(planner=StubPlanner())
+        job_id = queue.submit("2 days in Oslo", stream=True)
+        days_while_running = []
+        for _ in range(50):
+            job = queue.get(job_id)
+            if job["status"] == "done":
+                break
+            days_while_running = job["days"] or days_while_running
+            time.sleep(0.1)
+        for _ in range(20):
+            if queue.get(dead_id)["status"] == "done":
+                break
+            time.sleep(0.1)
+        live_status, dead_job = queue.get(live_id)["status"], queue.get(dead_id)
+
+        # Cancelling a running job records it as cancelled
+        cancelled_id = queue.submit("never finishes")
+        for _ in range(20):
+            if queue.get(cancelled_id)["status"] == "running":
+                break
+            time.sleep(0.05)
+        queue.cancel(cancelled_id)
+        for _ in range(20):
+            if queue.get(cancelled_id)["status"] == "cancelled":
+                break
+            time.sleep(0.05)
+        cancelled_status = queue.get(cancelled_id)["status"]
+        for plan_id in (job["plan_id"], dead_job["plan_id"]):
+            if plan_id:
+                delete_plan(plan_id)
+
+        if (job["status"] == "done" and job["plan"]["steps"] == plan["steps"] and days_while_running
+                and live_status == "running" and dead_job["status"] == "done" and StubPlanner.goals == ["dead elsewhere"]
+                and cancelled_status == "cancelled"):
+            print(f"✅ Streamed {len(days_while_running)} day(s) before completion; only the stale job was reclaimed; the cancelled job was recorded")
+            return True
+        print(f"❌ Unexpected job result: {job['status']}, days {days_while_running}, live {live_status}, dead {dead_job['status']}, reran {StubPlanner.goals}, cancelled {cancelled_status}")
+        return False
+    except Exception as e:
+        print(f"❌ Job queue error: {e}")
+        return False
+
+def test_cached_reads():
+    """Test that the app serves reads from its cache until a plan write bumps the data version"""
+    try:
+        from streamlit.testing.v1 import AppTest
+        from database.database import create_tables, SessionLocal
+        from database.models import TaskPlan
+        from database.crud import save_plan_to_db, delete_plan
+
+        def total_plans(app):
+            return int(next(metric.value for metric in app.run().metric if metric.label == "Total Plans"))
+
+        create_tables()
+        app = AppTest.from_file("streamlit_app.py", default_timeout=60)
+        initial = total_plans(app)
+        plan_id = save_plan_to_db({"goal": "Cached read test", "steps": [{"day": "Day 1", "tasks": ["Walk"]}],
+                                   "enriched_info": {}, "full_result": "Day 1\n1. Walk"})
+        after_save = total_plans(app)
+
+        # A row written behind crud's back leaves the version alone, so the cached count stands
+        db = SessionLocal()
+        try:
+            hidden = TaskPlan(goal="Cached read hidden test", plan_steps="[]")
+            db.add(hidden)
+            db.commit()
+            hidden_id = hidden.id
+        finally:
+            db.close()
+        cached = total_plans(app)
+        delete_plan(plan_id)
+        after_delete = total_plans(app)
+        delete_plan(hidden_id)
+
+        if after_save == initial + 1 and cached == after_save and after_delete == initial + 1:
+            print("✅ Cached reads were reused until a save or delete bumped the data version")
+            return True
+        print(f"❌ Unexpected plan counts: {initial} → saved {after_save} → cached {cached} → deleted {after_delete}")
+        return False
+    except Exception as e:
+        print(f"❌ Cached read error: {e}")
+        return False
+
+def test_plan_search():
+    """Test that full-text search finds plans by task text and by enrichment text"""
+    try:
+        from database.database import create_tables
+        import json
+        import subprocess
+        from database.crud import delete_plan
+        from database.search import search_plans
+
+        create_tables()
+        plan_data = {
+            "goal": "2 days in Oslo",
+            "steps": [{"day": "Day 1", "tasks": ["Stroll through Vigeland sculpture park"]}],
+            "enriched_info": {"recommendations": "Breakfast at the kingfisher market", "rating": 4.5},
+            "full_result": "Day 1\n1. Stroll through Vigeland sculpture park"
+        }
+        # Saved by a fresh process that never calls create_tables(), like a batch worker
+        saved = subprocess.run(
+            [sys.executable, "-c", "import json, sys; from database.crud import save_plan_to_db; print(save_plan_to_db(json.loads(sys.argv[1])))", json.dumps(plan_data)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        )
+        plan_id = int(saved.stdout.split()[-1])
+        found = {term: [row["id"] for row in search_plans(term)[0]] for term in ("vigeland", "kingfisher", "oslo")}
+        delete_plan(plan_id)
+        gone = search_plans("vigeland")[0]
+
+        if all(ids == [plan_id] for ids in found.values()) and not gone:
+            print("✅ Plans found by goal, task and enrichment text, and dropped from the index on delete")
+            return True
+        print(f"❌ Unexpected search results for plan {plan_id}: {found}, after delete {gone}")
+        return False
+    except Exception as e:
+        print(f"❌ Plan search error: {e}")
+        return False
+
+def test_keyset_paging():
+    """Test that every history sort pages through all plans once, in order, with ties broken by id"""
+    try:
+        from datetime import datetime
+        from database.database import create_tables, SessionLocal
+        from database.models import TaskPlan
+        from database.crud import list_plans_page, get_plan_day, delete_plan, SORT_KEYS
+
+        create_tables()
+        tied_at = datetime(2030, 1, 1)
+        long_label = "Day 1: " + "a very long day title " * 6
+        db = SessionLocal()
+        try:
+            tied = [TaskPlan(goal="Keyset tie test", created_at=tied_at) for _ in range(5)]
+            for plan in tied:
+                plan.set_plan_steps_list([{"day": long_label, "tasks": ["Walk"]}])
+            db.add_all(tied)
+            db.commit()
+            tied_ids = [plan.id for plan in tied]
+        finally:
+            db.close()
+
+        try:
+            orders, tie_orders = {}, {}
+            for sort_by, (column, descending) in SORT_KEYS.items():
+                db = SessionLocal()
+                try:
+                    rows = db.query(column, TaskPlan.id).all()
+                finally:
+                    db.close()
+                expected = [plan_id for _, plan_id in sorted(rows, reverse=descending)]
+                paged, cursor = [], None
+                while True:
+                    rows, cursor = list_plans_page(sort_by, cursor=cursor, page_size=2)
+                    paged.extend(row["id"] for row in rows)
+                    if cursor is None or len(paged) > len(expected):
+                        break
+                orders[sort_by] = paged == expected
+                # The tied plans come out by id, in the sort's direction
+                tie_orders[sort_by] = [plan_id for plan_id in paged if plan_id in tied_ids] == sorted(tied_ids, reverse=descending)
+            day = get_plan_day(tied_ids[0], long_label)
+        finally:
+            for plan_id in tied_ids:
+                delete_plan(plan_id)
+
+        if all(orders.values()) and all(tie_orders.values()) and day["tasks"] == ["Walk"]:
+            print(f"✅ {len(orders)} sorts paged every plan once, ties by id; long day labels still resolve")
+            return True
+        print(f"❌ Unexpected paging: order {orders}, ties {tie_orders}, day {day}")
+        return False
+    except Exception as e:
+        print(f"❌ Keyset paging error: {e}")
+        return False
+
+def test_replan_day():
+    """Test that replanning a day rewrites its steps, its plan_tasks rows, its stored output and the search index only"""
+    try:
+        from database.database import create_tables, SessionLocal
+        from database.models import TaskPlan
+        from database.crud import save_plan_to_db, get_plan, get_plan_day, delete_plan
+        from database.search import search_plans
+        from agents.planner_agent import TaskPlannerAgent
+
+        create_tables()
+        plan_id = save_plan_to_db({
+            "goal": "2 days in Bergen",
+            "steps": [{"day": "Day 1", "tasks": ["Funicular up Floyen"]}, {"day": "Day 2", "tasks": ["Bryggen wharf walk", "Fish market"]}],
+            "enriched_info": {"recommendations": "Rain gear from the puffin outfitters"},
+            "full_result": "Day 1\n1. Funicular up Floyen\nDay 2\n1. Bryggen wharf walk\n2. Fish market"
+        })
+        planner = TaskPlannerAgent()
+        planner._revise_day = lambda goal, steps, index, instruction: ["Fjord cruise to Mostraumen", "Hanseatic museum"]
+        plan = planner.replan_day(plan_id, "Day 2", "something on the water")
+        day = get_plan_day(plan_id, "Day 2")
+        found = {term: [row["id"] for row in search_plans(term)[0]] for term in ("mostraumen", "bryggen", "floyen", "puffin")}
+        stored = get_plan(plan_id)
+        db = SessionLocal()
+        try:
+            body = db.query(TaskPlan).filter(TaskPlan.id == plan_id).one().body
+            body_text = body.text if body is not None else None
+        finally:
+            db.close()
+        delete_plan(plan_id)
+
+        expected_steps = [{"day": "Day 1", "tasks": ["Funicular up Floyen"]}, {"day": "Day 2", "tasks": ["Fjord cruise to Mostraumen", "Hanseatic museum"]}]
+        if (plan["steps"] == expected_steps and stored["steps"] == expected_steps
+                and day == {"day": "Day 2", "tasks": ["Fjord cruise to Mostraumen", "Hanseatic museum"]}
+                and "Mostraumen" in stored["full_result"] and "Bryggen" not in stored["full_result"] and body_text == stored["full_result"]
+                and found == {"mostraumen": [plan_id], "bryggen": [], "floyen": [plan_id], "puffin": [plan_id]}):
+            print("✅ Replanned day saved in place; other days, enrichment and search stayed consistent")
+            return True
+        print(f"❌ Unexpected replan result: steps {stored['steps']}, day {day}, search {found}, body {body_text!r}")
+        return False
+    except Exception as e:
+        print(f"❌ Replan day error: {e}")
+        return False
+
+def test_metrics_summary():
+    """Test that percentiles computed in SQL match nearest rank over every sample, and old samples are pruned"""
+    try:
+        import random
+        from datetime import datetime, timedelta
+        from database.database import create_tables, SessionLocal
+        from database.models import PerfSpan, LLMUsage
+        from agents import metrics
+
+        create_tables()
+        rng = random.Random(3)
+        now, expired = datetime.utcnow(), datetime.utcnow() - timedelta(days=metrics.METRICS_RETENTION_DAYS + 1)
+        db = SessionLocal()
+        try:
+            for stage, samples in (("test.lookup", 37), ("test.save", 5), ("test.single", 1)):
+                db.add_all(PerfSpan(stage=stage, duration_ms=round(rng.uniform(1, 500), 2), status=rng.choice(["ok", "ok", "error"]), created_at=now)
+                           for _ in range(samples))
+            db.add_all(LLMUsage(trace_id=f"test{i}", model="gpt-4o", prompt_tokens=rng.randint(100, 900), completion_tokens=rng.randint(50, 400), created_at=now)
+                       for i in range(11))
+            db.add_all([PerfSpan(stage="test.lookup", duration_ms=9999.0, created_at=expired),
+                        LLMUsage(trace_id="test-old", prompt_tokens=99999, completion_tokens=0, created_at=expired)])
+            db.commit()
+        finally:
+            db.close()
+
+        def nearest_rank(values, fraction):
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+        removed = metrics.prune_expired()
+        db = SessionLocal()
+        try:
+            spans = db.query(PerfSpan.stage, PerfSpan.duration_ms, PerfSpan.status).filter(PerfSpan.created_at >= now - timedelta(hours=24)).all()
+            traces = {}
+            for trace_id, prompt, completion in db.query(LLMUsage.trace_id, LLMUsage.prompt_tokens, LLMUsage.completion_tokens).filter(LLMUsage.created_at >= now - timedelta(hours=24)):
+                traces[trace_id] = traces.get(trace_id, 0) + (prompt or 0) + (completion or 0)
+        finally:
+            db.close()
+
+        expected = {}
+        for stage in {stage for stage, _, _ in spans}:
+            durations = [duration for name, duration, _ in spans if name == stage]
+            expected[stage] = {"count": len(durations), "errors": sum(1 for name, _, status in spans if name == stage and status == "error"),
+                               "p50_ms": nearest_rank(durations, 0.50), "p95_ms": nearest_rank(durations, 0.95), "p99_ms": nearest_rank(durations, 0.99)}
+        stages = {row.pop("stage"): row for row in metrics.stage_latency_summary()}
+        usage = metrics.token_usage_summary()
+
+        if (removed >= 2 and stages == expected and usage["plans"] == len(traces)
+                and usage["p50_tokens_per_plan"] == nearest_rank(traces.values(), 0.50)
+                and usage["p95_tokens_per_plan"] == nearest_rank(traces.values(), 0.95)):
+            print(f"✅ SQL percentiles matched for {len(stages)} stage(s) and {len(traces)} plan(s); {removed} expired sample(s) pruned")
+            return True
+        print(f"❌ Unexpected metrics: removed {removed}, stages {stages} vs {expected}, usage {usage}")
+        return False
+    except Exception as e:
+        print(f"❌ Metrics error: {e}")
+        return False
+
+def test_export_round_trip():
+    """Test that JSONL, CSV and Parquet exports read back to the stored plans"""
+    try:
+        import io
+        import csv
+        import json
+        import pyarrow.parquet as pq
+        from database.database import create_tables
+        from database.crud import save_plans_bulk, delete_plan
+        from database.export import export_plans
+
+        create_tables()
+        plans = [
+            {"goal": f"Export round trip {number}: Zürich, \"old town\"", "steps": [{"day": "Day 1", "tasks": ["Café, then lake", "Grossmünster"]}],
+             "enriched_info": {"weather": f"{number}°C", "tips": ["Tram", "Boat"]}, "full_result": "Day 1"}
+            for number in range(3)
+        ] + [{"goal": "Export round trip 3: flat", "steps": [{"step": 1, "description": "Pack"}], "enriched_info": {}, "full_result": None}]
+        plan_ids = save_plans_bulk(plans)
+        try:
+            jsonl, csv_out, parquet_path = io.BytesIO(), io.BytesIO(), os.path.join(TEST_DATA_DIR, "export.parquet")
+            counts = [export_plans(sink, fmt, goal_contains="export round trip", batch_size=3)
+                      for sink, fmt in ((jsonl, "jsonl"), (csv_out, "csv"), (parquet_path, "parquet"))]
+            from_jsonl = [json.loads(line) for line in jsonl.getvalue().decode("utf-8").splitlines()]
+            from_csv = list(csv.DictReader(io.StringIO(csv_out.getvalue().decode("utf-8"))))
+            from_parquet = pq.read_table(parquet_path).to_pylist()
+        finally:
+            for plan_id in plan_ids:
+                delete_plan(plan_id)
+
+        expected = [(plan_id, plan["goal"], plan["enriched_info"]) for plan_id, plan in zip(plan_ids, plans)]
+        jsonl_ok = [(row["id"], row["goal"], row["enriched_info"]) for row in from_jsonl] == expected and [row["steps"] for row in from_jsonl] == [plan["steps"] for plan in plans]
+        csv_ok = [(int(row["id"]), row["goal"], json.loads(row["enriched_info"])) for row in from_csv] == expected and [json.loads(row["steps"]) for row in from_csv] == [plan["steps"] for plan in plans]
+        parquet_ok = ([(row["id"], row["goal"], json.loads(row["enriched_info"])) for row in from_parquet] == expected
+                      and from_parquet[0]["days"] == [{"day": "Day 1", "tasks": ["Café, then lake", "Grossmünster"]}]
+                      and from_parquet[3]["days"] == [{"day": "Steps", "tasks": ["Pack"]}] and from_parquet[0]["task_count"] == 2)
+
+        if counts == [4, 4, 4] and jsonl_ok and csv_ok and parquet_ok:
+            print("✅ JSONL, CSV and Parquet exports round-tripped 4 plans")
+            return True
+        print(f"❌ Unexpected export: counts {counts}, jsonl {jsonl_ok}, csv {csv_ok}, parquet {parquet_ok}")
+        return False
+    except Exception as e:
+        print(f"❌ Export error: {e}")
+        return False
+
+def test_batch_resume():
+    """Test that run_batch skips goals already saved in its checkpoint and retries the failed ones"""
+    try:
+        import io
+        import json
+        import contextlib
+        import run_batch
+        from agents.planner_agent import planner_agent
+        from database.crud import get_plan, delete_plan
+
+        goals_path = os.path.join(TEST_DATA_DIR, "resume_goals.jsonl")
+        checkpoint_path = goals_path + ".checkpoint.jsonl"
+        with open(goals_path, "w", encoding="utf-8") as f:
+            for key in "abcd":
+                f.write(json.dumps({"id": key, "goal": f"Batch resume {key}"}) + "\n")
+        with open(checkpoint_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"key": "a", "goal": "Batch resume a", "plan_id": -1}) + "\n")
+            f.write(json.dumps({"key": "b", "goal": "Batch resume b", "error": "LLM timed out"}) + "\n")
+
+        generated = []
+
+        def create_plan(goal):
+            generated.append(goal)
+            return {"goal": goal, "steps": [{"day": "Day 1", "tasks": ["Walk"]}], "enriched_info": {}, "full_result": "Day 1\n1. Walk"}
+
+        original_argv = sys.argv
+        planner_agent.create_plan = create_plan
+        sys.argv = ["run_batch.py", goals_path, "--workers", "2", "--chunk-size", "2"]
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_batch.main()
+        finally:
+            sys.argv = original_argv
+            del planner_agent.create_plan
+        saved = {}
+        with open(checkpoint_path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("plan_id", -1) > 0:
+                    saved[record["key"]] = record["plan_id"]
+        stored = {key: (get_plan(plan_id) or {}).get("goal") for key, plan_id in saved.items()}
+        for plan_id in saved.values():
+            delete_plan(plan_id)
+
+        if sorted(generated) == ["Batch resume b", "Batch resume c", "Batch resume d"] and stored == {key: f"Batch resume {key}" for key in "bcd"}:
+            print("✅ Resumed batch generated only the unfinished goals and checkpointed them")
+            return True
+        print(f"❌ Unexpected resume: generated {generated}, stored {stored}")
+        return False
+    except Exception as e:
+        print(f"❌ Batch resume error: {e}")
+        return False
+
+def test_streaming_llm_isolation():
+    """Test that a streamed plan leaves later non-streamed plans on a non-streaming LLM"""
+    try:
+        from crewai.llms.base_llm import BaseLLM
+        from agents.planner_agent import TaskPlannerAgent
+
+        streamed_calls = []
+
+        class StubLLM(BaseLLM):
+            def call(self, messages, tools=None, callbacks=None, available_functions=None,
+                     from_task=None, from_agent=None, response_model=None):
+                streamed_calls.append(bool(self.stream))
+                if response_model is not None:
+                    return response_model.model_validate({"days": [{"day": 1, "tasks": [{"activity": "Louvre"}]}]})
+                return "Day 1\n1. Louvre"
+
+        planner = TaskPlannerAgent()
+        planner.llm = StubLLM(model="stub")
+        planner._enrich = lambda goal: {}
+        list(planner.stream_plan("1 day in Paris"))
+        plan = planner.create_plan("1 day in Paris")
+
+        if streamed_calls == [True, False] and not planner.llm.stream and plan["steps"] == [{"day": "Day 1", "tasks": ["Louvre"]}]:
+            print("✅ Streamed plan ran on its own LLM; the next plan did not stream")
+            return True
+        print(f"❌ Unexpected streaming flags per call: {streamed_calls}, llm.stream {planner.llm.stream}")
+        return False
+    except Exception as e:
+        print(f"❌ Streaming LLM isolation error: {e}")
+        return False
+
+def test_crew_llm_cache():
+    """Test that cached crews never hand a streaming or replaced LLM to other requests"""
+    try:
+        from agents.planner_agent import TaskPlannerAgent
+
+        planner = TaskPlannerAgent()
+        plain = planner._get_crew(structured=True)
+        streaming = planner._get_crew(stream=True)
+        planner.llm = planner.llm.model_copy()
+        rebuilt = planner._get_crew(structured=True)
+
+        if (streaming.agents[0].llm is not plain.agents[0].llm and streaming.agents[0].llm.stream
+                and not plain.agents[0].llm.stream and rebuilt is not plain and rebuilt.agents[0].llm is planner.llm):
+            print("✅ Streaming crews use their own LLM and a replaced LLM gets fresh crews")
+            return True
+        print("❌ Cached crews share or keep a stale LLM")
+        return False
+    except Exception as e:
+        print(f"❌ Crew cache error: {e}")
+        return False
+
+def test_structured_streaming():
+    """Test that a streamed plan reports days from the JSON as it arrives and is built from validated output"""
+    try:
+        import json
+        from crewai.llms.base_llm import BaseLLM
+        from agents.planner_agent import TaskPlannerAgent, PLAN_OUTPUT_MODE
+
+        document = json.dumps({"days": [
+            {"day": 1, "title": "Museums {and} \"more\"", "tasks": [{"time": "09:00", "activity": "Louvre"}]},
+            {"day": 2, "title": "River", "tasks": [{"activity": "Seine cruise"}]}
+        ]})
+
+        class StreamingStubLLM(BaseLLM):
+            def call(self, messages, tools=None, callbacks=None, available_functions=None,
+                     from_task=None, from_agent=None, response_model=None):
+                self._emit_call_started_event(messages=messages, from_task=from_task, from_agent=from_agent)
+                for start in range(0, len(document), 9):
+                    self._emit_stream_chunk_event(document[start:start + 9], from_task=from_task, from_agent=from_agent)
+                return response_model.model_validate_json(document) if response_model is not None else document
+
+        planner = TaskPlannerAgent()
+        planner.llm = StreamingStubLLM(model="stub")
+        planner._enrich = lambda goal: {}
+        events = list(planner.stream_plan("2 days in Paris"))
+        days = [payload for event, payload in events if event == "day"]
+        plan = events[-1][1]
+
+        expected = [{"day": "Day 1", "tasks": ["09:00 - Louvre"]}, {"day": "Day 2", "tasks": ["Seine cruise"]}]
+        if PLAN_OUTPUT_MODE != "structured":
+            print("✅ Skipped: PLAN_OUTPUT_MODE is not structured")
+            return True
+        if days == expected and plan["steps"] == expected and "Day 1: Museums" in plan["full_result"]:
+            print("✅ Streamed days decoded from JSON; plan built from validated output")
+            return True
+        print(f"❌ Unexpected streamed plan: days {days}, steps {plan['steps']}")
+        return False
+    except Exception as e:
+        print(f"❌ Structured streaming error: {e}")
+        return False
 
 def run_tests():
     """Run all tests"""
@@ -67,7 +1110,31 @@ def run_tests():
     tests = [
         ("Basic Imports", test_basic_imports),
         ("Database Connection", test_database),
-        ("Agent Functionality", test_agent)
+        ("Agent Functionality", test_agent),
+        ("Enrichment Deadlines", test_enrichment_deadlines),
+        ("Incremental Parser", test_incremental_parser),
+        ("Structured Output", test_structured_output),
+        ("Normalized Storage", test_normalized_storage),
+        ("Blob Store", test_blob_store),
+        ("HTTP Session", test_http_session),
+        ("Async Lookups", test_async_lookups),
+        ("Tool Cache", test_tool_cache),
+        ("Plan Service", test_plan_service),
+        ("Circuit Breaker", test_circuit_breaker),
+        ("Sync Hedging", test_sync_hedging),
+        ("Destination Extraction", test_destination_extraction),
+        ("Goal Canonicalization", test_goal_canonicalization),
+        ("Job Queue", test_job_queue),
+        ("Cached Reads", test_cached_reads),
+        ("Plan Search", test_plan_search),
+        ("Keyset Paging", test_keyset_paging),
+        ("Replan Day", test_replan_day),
+        ("Metrics Summary", test_metrics_summary),
+        ("Export Round Trip", test_export_round_trip),
+        ("Batch Resume", test_batch_resume),
+        ("Streaming LLM Isolation", test_streaming_llm_isolation),
+        ("Crew LLM Cache", test_crew_llm_cache),
+        ("Structured Streaming", test_structured_streaming)
     ]
     
     results = []